@@ -1,6 +1,6 @@
 from agents.base_agent import BaseAgent
 from core.llm_client import llm_client
-from typing import List, Dict
+from typing import Iterator, List, Dict
 
 class CustomerAgent(BaseAgent):
     def __init__(self):
@@ -8,7 +8,14 @@ class CustomerAgent(BaseAgent):
 
     def generate_response(self, customer_message: str, tone: str = "Empático") -> str:
         """Generates a reply to a customer message."""
-        prompt = f"""
+        return llm_client.generate_content(self._build_response_prompt(customer_message, tone))
+
+    def stream_response(self, customer_message: str, tone: str = "Empático") -> Iterator[str]:
+        """Same reply as generate_response, yielded chunk by chunk (st.write_stream)."""
+        yield from llm_client.generate_stream(self._build_response_prompt(customer_message, tone))
+
+    def _build_response_prompt(self, customer_message: str, tone: str) -> str:
+        return f"""
         Você é um atendente de suporte da Shopee nota 10.
         Responda à seguinte mensagem de um cliente:
         "{customer_message}"
@@ -16,7 +23,6 @@ class CustomerAgent(BaseAgent):
         Tom de voz: {tone}.
         Regras: Seja breve, resolutivo e nunca prometa o que não pode cumprir.
         """
-        return llm_client.generate_content(prompt)
 
     def analyze_sentiment(self, reviews: List[str]) -> Dict[str, any]:
         """Analyzes sentiment of multiple reviews."""
@@ -1,25 +1,39 @@
 from agents.base_agent import BaseAgent
 from core.llm_client import llm_client
 from core.database.engine import get_session
-from core.database.models import Transaction, User, Product, ProductComponent, InventoryItem
+from core.database.models import Transaction, User, Product, ProductComponent, InventoryItem, CogsEntry
 from core.sales_service import SalesService
-from sqlmodel import select, Session
-from sqlalchemy.orm import selectinload
+from core.finance_service import FinanceService
+from core.sales_parser import SalesExportParser
+from core.background import background_jobs
+from core import data_version
+from core.product_analytics import base_name
+from core.events import event_bus, SALES_INGESTED, INVENTORY_CHANGED
+from sqlmodel import select, Session, func
+from sqlalchemy import and_, case, delete
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 import json
 import re
 
 class FinanceAgent(BaseAgent):
+    LLM_CHUNK_TOKEN_BUDGET = 6000  # Tokens de entrada por bloco (~4 chars/token)
+    LLM_CHUNK_MAX_ROWS = 40  # Limita o tamanho da resposta JSON (max_tokens do provider)
+    LLM_CHUNK_RETRIES = 2
+    NO_DATA_MESSAGE = "Sem dados suficientes para analise profunda. Por favor, registre vendas ou despesas."
+
     def __init__(self):
         super().__init__("Finance Guardian")
         self.sales_service = SalesService()
+        self.finance_service = FinanceService()
+        self.sales_parser = SalesExportParser()
 
     def process_upload(self, file, user_id: int) -> dict:
         """
-        Phase 1: Reads a CSV/XLSX file and sends it to the LLM for intelligent parsing.
-        Returns structured data for preview (does NOT save yet).
+        Phase 1: Reads a CSV/XLSX file and parses it into sales for preview (does NOT save yet).
+        Known export layouts (Shopee) are parsed deterministically over the whole file;
+        unknown layouts fall back to the LLM.
         """
         try:
             # Read file content
@@ -27,17 +41,36 @@ class FinanceAgent(BaseAgent):
                 df = pd.read_csv(file)
             else:
                 df = pd.read_excel(file)
-            
-            # Convert to string for LLM (limit to 100 rows to avoid token overflow)
-            csv_text = df.head(100).to_csv(index=False)
+
             total_rows = len(df)
+
+            # Fast path: layout reconhecido, sem LLM
+            parsed_data = self.sales_parser.parse(df)
+            if parsed_data is not None:
+                return {
+                    "success": True,
+                    "data": parsed_data,
+                    "total_rows_in_file": total_rows,
+                    "parsed_count": len(parsed_data),
+                    "source": "parser",
+                    "message": f"Layout reconhecido: {len(parsed_data)} vendas concluídas de {total_rows} linhas."
+                }
             
-            # Build LLM prompt
-            prompt = f"""Você é um assistente especializado em processar relatórios de vendas de e-commerce.
+            # Layout desconhecido: extração via LLM em blocos
+            return self._extract_with_llm(df)
+
+        except Exception as e:
+            return {"success": False, "message": f"Erro ao processar arquivo: {str(e)}"}
+
+    # ------------------------------------------------------------------
+    # LLM fallback — chunked extraction
+    # ------------------------------------------------------------------
+    def _build_upload_prompt(self, csv_text: str, first_row: int, last_row: int, total_rows: int) -> str:
+        return f"""Você é um assistente especializado em processar relatórios de vendas de e-commerce.
 
-Analise este arquivo de vendas e extraia as informações relevantes em formato JSON.
+Analise este trecho de um arquivo de vendas e extraia as informações relevantes em formato JSON.
 
-ARQUIVO (primeiras {min(total_rows, 100)} de {total_rows} linhas):
+ARQUIVO (linhas {first_row} a {last_row} de {total_rows}):
 ```
 {csv_text}
 ```
@@ -55,27 +88,108 @@ RETORNE ESTRITAMENTE um JSON array com este formato (sem markdown, sem explicaç
   ...
 ]
 
-Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
+Se o trecho estiver vazio ou não contiver vendas válidas, retorne: []"""
 
-            # Call LLM
-            response = llm_client.generate_content(prompt)
-            
-            # Parse JSON from LLM response
-            parsed_data = self._extract_json_from_response(response)
-            
-            if parsed_data is None:
-                return {"success": False, "message": "Não foi possível interpretar o arquivo. Verifique o formato.", "raw_response": response}
-            
+    def _chunk_dataframe(self, df: pd.DataFrame) -> List[Tuple[int, pd.DataFrame]]:
+        """
+        Splits the sheet into (start_row, slice) chunks bounded by an estimated
+        token budget (~4 chars/token) and a row cap that keeps the JSON answer
+        under the provider's max_tokens.
+        """
+        header_tokens = len(",".join(map(str, df.columns))) / 4
+        row_tokens = (df.astype(str).agg(",".join, axis=1).str.len() / 4).tolist()
+
+        chunks = []
+        start, used = 0, header_tokens
+        for i, tokens in enumerate(row_tokens):
+            full = used + tokens > self.LLM_CHUNK_TOKEN_BUDGET or i - start >= self.LLM_CHUNK_MAX_ROWS
+            if i > start and full:
+                chunks.append((start, df.iloc[start:i]))
+                start, used = i, header_tokens
+            used += tokens
+        if start < len(df):
+            chunks.append((start, df.iloc[start:]))
+        return chunks
+
+    def _extract_with_llm(self, df: pd.DataFrame) -> dict:
+        """
+        Sends the whole sheet to the LLM in token-budgeted chunks, concurrently
+        (llm_client.generate_many), and merges the JSON arrays in file order.
+        """
+        total_rows = len(df)
+        if not llm_client.enabled:
+            return {"success": False, "message": "Formato de planilha não reconhecido e a IA está desativada. Ative a conexão para interpretar este arquivo."}
+
+        chunks = self._chunk_dataframe(df)
+        if not chunks:
+            return {"success": True, "data": [], "total_rows_in_file": 0, "parsed_count": 0,
+                    "source": "llm", "message": "Arquivo vazio."}
+
+        prompts = [
+            self._build_upload_prompt(chunk.to_csv(index=False), start + 1, start + len(chunk), total_rows)
+            for start, chunk in chunks
+        ]
+        results = [
+            {"start": start, "rows": len(chunk), "data": None, "retries": 0, "error": ""}
+            for start, chunk in chunks
+        ]
+
+        # Todos os blocos vão juntos (generate_many: concorrência limitada, backoff em 429/5xx);
+        # só os blocos com resposta inválida entram na rodada seguinte
+        pending = list(range(len(chunks)))
+        for attempt in range(self.LLM_CHUNK_RETRIES + 1):
+            # Retentativas ignoram o cache (a resposta cacheada é a que falhou)
+            answers = llm_client.generate_many([prompts[i] for i in pending], use_cache=(attempt == 0))
+            still_pending = []
+            for i, answer in zip(pending, answers):
+                results[i]["retries"] = attempt
+                parsed = self._extract_json_from_response(answer["text"]) if answer["text"] else None
+                if isinstance(parsed, list):
+                    results[i]["data"] = parsed
+                else:
+                    results[i]["error"] = (answer["error"] or answer["text"] or "")[:300]
+                    still_pending.append(i)
+            pending = still_pending
+            if not pending:
+                break
+
+        parsed_data = []
+        failed_chunks = []
+        for r in results:
+            if r["data"] is None:
+                failed_chunks.append({
+                    "rows": f"{r['start'] + 1}-{r['start'] + r['rows']}",
+                    "error": r["error"]
+                })
+            else:
+                parsed_data.extend(item for item in r["data"] if isinstance(item, dict))
+        total_retries = sum(r["retries"] for r in results)
+
+        if len(failed_chunks) == len(results):
             return {
-                "success": True, 
-                "data": parsed_data,
-                "total_rows_in_file": total_rows,
-                "parsed_count": len(parsed_data),
-                "message": f"LLM extraiu {len(parsed_data)} vendas válidas de {total_rows} linhas."
+                "success": False,
+                "message": "Não foi possível interpretar o arquivo. Verifique o formato.",
+                "raw_response": failed_chunks[0]["error"],
+                "failed_chunks": failed_chunks
             }
 
-        except Exception as e:
-            return {"success": False, "message": f"Erro ao processar arquivo: {str(e)}"}
+        message = f"LLM extraiu {len(parsed_data)} vendas válidas de {total_rows} linhas ({len(results)} blocos)."
+        if failed_chunks:
+            failed_rows = ", ".join(f["rows"] for f in failed_chunks)
+            message += f" ⚠️ {len(failed_chunks)} bloco(s) falharam (linhas {failed_rows})."
+        print(f"📄 Upload via LLM: {len(results)} chunks, {total_retries} retries, {len(failed_chunks)} failed")
+
+        return {
+            "success": True,
+            "data": parsed_data,
+            "total_rows_in_file": total_rows,
+            "parsed_count": len(parsed_data),
+            "source": "llm",
+            "chunks": len(results),
+            "retries": total_retries,
+            "failed_chunks": failed_chunks,
+            "message": message
+        }
 
     def confirm_upload(self, sales_data: List[Dict], user_id: int) -> dict:
         """
@@ -115,30 +229,77 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
         return None
 
     def get_financial_stats(self, user_id: int) -> Dict[str, Any]:
-        """Calculates Revenue, Costs, Profit from DB."""
+        """Calculates Revenue, Costs, Profit from DB (single grouped SQL query).
+        Raw rows are NOT included — use get_transactions() when a view needs them."""
         session = next(get_session())
-        statement = select(Transaction).where(Transaction.user_id == user_id)
-        transactions = session.exec(statement).all()
-        
-        total_revenue = sum(t.amount for t in transactions if t.type == "INCOME")
-        total_expenses = sum(t.amount for t in transactions if t.type == "EXPENSE")
-        profit = total_revenue - total_expenses
-        margin = (profit / total_revenue * 100) if total_revenue > 0 else 0
-        
-        return {
-            "total_revenue": total_revenue,
-            "total_expenses": total_expenses,
-            "net_profit": profit,
-            "margin": margin,
-            "transaction_count": len(transactions),
-            "raw_data": transactions # Useful for displaying table
-        }
+        stats = self.finance_service.get_totals(session, user_id)
+        session.close()
+        return stats
+
+    def get_daily_totals(self, user_id: int,
+                         start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Totals per (day, type, category), used to build the period charts."""
+        session = next(get_session())
+        rows = self.finance_service.get_daily_totals(session, user_id, start_date, end_date)
+        session.close()
+        return rows
+
+    def get_transactions(self, user_id: int, page: int = 0,
+                         page_size: Optional[int] = FinanceService.PAGE_SIZE,
+                         start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> List[Transaction]:
+        """Paginated transaction rows (newest first). page_size=None loads the whole range."""
+        session = next(get_session())
+        offset = page * page_size if page_size else 0
+        rows = self.finance_service.get_transactions(
+            session, user_id, limit=page_size, offset=offset,
+            start_date=start_date, end_date=end_date
+        )
+        session.close()
+        return rows
+
+    def get_cogs(self, user_id: int,
+                 start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None) -> float:
+        """COGS total (ledger SUM), optionally for a date range."""
+        session = next(get_session())
+        cogs = self.finance_service.get_cogs(session, user_id, start_date, end_date)
+        session.close()
+        return cogs
 
     def analyze_health(self, user_id: int):
+        """Stats + advice, synchronously (blocks on the LLM). The dashboard uses
+        get_financial_stats() + get_health_advice() instead."""
         stats = self.get_financial_stats(user_id)
-        
+        return {"stats": stats, "advice": self._generate_health_advice(stats)}
+
+    def get_health_advice(self, user_id: int, stats: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Non-blocking advice: starts the LLM call in the background and returns
+        None until it is ready. Recomputed only when the aggregates change
+        (the stamp is built from the totals, so any new/edited/deleted
+        transaction invalidates it).
+        """
+        if stats is None:
+            stats = self.get_financial_stats(user_id)
+        stamp = self._health_stamp(stats)
+        advice = background_jobs.get("finance_advice", user_id, stamp)
+        if advice is None:
+            background_jobs.submit("finance_advice", user_id, stamp, self._generate_health_advice, stats)
+        return advice
+
+    @staticmethod
+    def _health_stamp(stats: Dict[str, Any]) -> tuple:
+        return (
+            round(stats["total_revenue"], 2),
+            round(stats["total_expenses"], 2),
+            stats["transaction_count"],
+        )
+
+    def _generate_health_advice(self, stats: Dict[str, Any]) -> str:
         if stats["transaction_count"] == 0:
-            return {"stats": stats, "advice": "O cofre está vazio. Suba suas vendas para que eu possa analisar!"}
+            return "O cofre está vazio. Suba suas vendas para que eu possa analisar!"
 
         summary_text = f"""
         Revenue: R$ {stats['total_revenue']:.2f}
@@ -156,8 +317,7 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
         Se a margem for baixa (<10%), alerte o usuário.
         """
         
-        advice = llm_client.generate_content(prompt)
-        return {"stats": stats, "advice": advice}
+        return llm_client.generate_content(prompt)
 
     def add_transaction(self, date: datetime, description: str, amount: float, 
                        category: str, type: str, user_id: int, 
@@ -187,9 +347,17 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
             if type == "INCOME" and product_id:
                 product = session.get(Product, product_id)
                 if product:
-                    stock_result = self.sales_service.process_sale(product, quantity, session)
+                    stock_result = self.sales_service.process_sale(product, quantity, session, txn=txn)
             
             session.commit()
+
+            if type == "INCOME":
+                event_bus.publish(SALES_INGESTED, user_id=user_id, product_ids=[product_id] if product_id else [])
+            if stock_result and stock_result["inventory_updates"]:
+                event_bus.publish(
+                    INVENTORY_CHANGED, user_id=user_id,
+                    item_ids=[u["item_id"] for u in stock_result["inventory_updates"]],
+                )
             
             return {
                 "success": True, 
@@ -217,11 +385,11 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
         """Removes all transactions for the user."""
         try:
             session = next(get_session())
-            statement = select(Transaction).where(Transaction.user_id == user_id)
-            transactions = session.exec(statement).all()
-            for t in transactions:
-                session.delete(t)
+            # Bulk DELETE (ledger primeiro) em vez de carregar cada linha
+            session.execute(delete(CogsEntry).where(CogsEntry.user_id == user_id))
+            session.execute(delete(Transaction).where(Transaction.user_id == user_id))
             session.commit()
+            data_version.bump("sales")
             return {"success": True, "message": "Historico financeiro zerado!"}
         except Exception as e:
             return {"success": False, "message": f"Erro ao zerar: {str(e)}"}
@@ -233,10 +401,12 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
             session = next(get_session())
             statement = select(InventoryItem).where(InventoryItem.user_id == user_id)
             items = session.exec(statement).all()
+            item_ids = [item.id for item in items]
             for item in items:
                 item.stock = initial_stock
                 session.add(item)
             session.commit()
+            event_bus.publish(INVENTORY_CHANGED, user_id=user_id, item_ids=item_ids)
             return {"success": True, "message": f"Estoque fisico resetado para {initial_stock} unidades!"}
         except Exception as e:
             return {"success": False, "message": f"Erro ao resetar estoque: {str(e)}"}
@@ -250,6 +420,8 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
                 for key, value in updates.items():
                     setattr(txn, key, value)
                 session.add(txn)
+                if "date" in updates or "type" in updates:
+                    self.sales_service.sync_cogs_entries(txn, session)
                 session.commit()
                 return {"success": True, "message": "Transacao atualizada."}
             return {"success": False, "message": "Transacao nao encontrada."}
@@ -258,19 +430,31 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
 
     def generate_deep_analysis(self, user_id: int, context_cogs: dict = None) -> str:
         """Generates a comprehensive financial report using LLM."""
+        prompt = self._build_deep_analysis_prompt(user_id, context_cogs)
+        if prompt is None:
+            return self.NO_DATA_MESSAGE
+        return llm_client.generate_content(prompt)
+
+    def stream_deep_analysis(self, user_id: int, context_cogs: dict = None) -> Iterator[str]:
+        """Same report as generate_deep_analysis, yielded chunk by chunk (st.write_stream)."""
+        prompt = self._build_deep_analysis_prompt(user_id, context_cogs)
+        if prompt is None:
+            yield self.NO_DATA_MESSAGE
+            return
+        yield from llm_client.generate_stream(prompt)
+
+    def _build_deep_analysis_prompt(self, user_id: int, context_cogs: dict = None) -> Optional[str]:
+        """CFO prompt for the deep analysis, or None when there is no data yet."""
         stats = self.get_financial_stats(user_id)
         if stats["transaction_count"] == 0:
-            return "Sem dados suficientes para analise profunda. Por favor, registre vendas ou despesas."
+            return None
 
-        # Aggregate Product Sales
-        transactions = stats["raw_data"]
-        sales_data = {} # {description: amount}
-        for t in transactions:
-            if t.type == "INCOME" and t.description:
-                sales_data[t.description] = sales_data.get(t.description, 0) + t.amount
+        # Aggregate Product Sales (GROUP BY description, already sorted desc)
+        session = next(get_session())
+        sorted_sales = self.finance_service.get_revenue_by_description(session, user_id)
+        session.close()
 
         # Sort Top/Bottom
-        sorted_sales = sorted(sales_data.items(), key=lambda x: x[1], reverse=True)
         top_selling = sorted_sales[:3]
         least_selling = sorted_sales[-3:] if len(sorted_sales) > 3 else []
 
@@ -316,8 +500,7 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
         
         Seja direto, profissional mas motivador. Use emojis para facilitar a leitura.
         """
-        
-        return llm_client.generate_content(prompt)
+        return prompt
 
     def calculate_order_profit(
         self,
@@ -366,12 +549,10 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
             "roi": (net_profit / custo_produto * 100.0) if custo_produto > 0 else 0.0
         }
 
-    def get_top_products(self, user_id: int, limit: int = 5,
-                         start_date: Optional[datetime] = None,
-                         end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Returns top-selling products by revenue from transactions.
-        Optionally filtered by date range (inclusive)."""
-        session = next(get_session())
+    def _income_filters(self, user_id: int,
+                        start_date: Optional[datetime] = None,
+                        end_date: Optional[datetime] = None) -> list:
+        """WHERE clause for sales with a product; served by ix_transaction_user_type_date."""
         filters = [
             Transaction.user_id == user_id,
             Transaction.type == "INCOME",
@@ -379,85 +560,98 @@ Se o arquivo estiver vazio ou não contiver vendas válidas, retorne: []"""
         ]
         if start_date and end_date:
             filters.append(Transaction.date.between(start_date, end_date))
-        statement = select(Transaction).where(*filters).order_by(Transaction.amount.desc())
-        transactions = session.exec(statement).all()
-
-        product_sales: Dict[int, Dict] = {}
-        for t in transactions:
-            pid = t.product_id
-            if pid not in product_sales:
-                product_sales[pid] = {
-                    "product_id": pid,
-                    "product_title": t.description,
-                    "total_revenue": 0.0,
-                    "total_quantity": 0,
-                    "transaction_count": 0
-                }
-            product_sales[pid]["total_revenue"] += t.amount
-            product_sales[pid]["total_quantity"] += t.quantity or 1
-            product_sales[pid]["transaction_count"] += 1
-
-        # Fetch product titles for proper names
-        sorted_products = sorted(product_sales.values(), key=lambda x: x["total_revenue"], reverse=True)
-        for p in sorted_products:
-            prod = session.get(Product, p["product_id"])
-            if prod:
-                p["product_title"] = prod.title
+        return filters
 
-        return sorted_products[:limit]
+    def get_top_products(self, user_id: int, limit: int = 5,
+                         start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Returns top-selling products by revenue from transactions.
+        Optionally filtered by date range (inclusive).
+
+        One grouped query (SUM/COUNT per product, ORDER BY revenue, LIMIT)."""
+        total_revenue = func.sum(Transaction.amount)
+        statement = (
+            select(
+                Transaction.product_id,
+                # Produto apagado: cai para a descrição da venda
+                func.coalesce(Product.title, func.max(Transaction.description)),
+                total_revenue,
+                func.sum(func.coalesce(Transaction.quantity, 1)),
+                func.count(Transaction.id),
+            )
+            .select_from(Transaction)
+            .outerjoin(Product, Product.id == Transaction.product_id)
+            .where(*self._income_filters(user_id, start_date, end_date))
+            .group_by(Transaction.product_id, Product.title)
+            .order_by(total_revenue.desc())
+            .limit(limit)
+        )
+        session = next(get_session())
+        try:
+            rows = session.exec(statement).all()
+        finally:
+            session.close()
+        return [
+            {
+                "product_id": product_id,
+                "product_title": title,
+                "total_revenue": revenue or 0.0,
+                "total_quantity": int(quantity or 0),
+                "transaction_count": count,
+            }
+            for product_id, title, revenue, quantity, count in rows
+        ]
 
     def get_top_products_by_potes(self, user_id: int, limit: int = 10,
                                    start_date: Optional[datetime] = None,
                                    end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """Returns top products grouped by base name, ranked by potes sold.
-        Optionally filtered by date range (inclusive)."""
+        Optionally filtered by date range (inclusive).
+
+        Potes per product = kits sold x units per kit (sum of the component
+        quantities, 1 for products without components), in one grouped query;
+        only the base-name fold ("X - 3x" -> "X") runs in Python, over one
+        row per product sold."""
+        kit_size = (
+            select(
+                ProductComponent.product_id.label("product_id"),
+                func.sum(case(
+                    (InventoryItem.id.isnot(None), func.coalesce(func.nullif(ProductComponent.quantity, 0), 1)),
+                    else_=0,
+                )).label("units"),
+            )
+            .outerjoin(InventoryItem, and_(
+                InventoryItem.id == ProductComponent.inventory_item_id,
+                InventoryItem.user_id == user_id,
+            ))
+            .group_by(ProductComponent.product_id)
+            .subquery()
+        )
+        potes = (func.sum(func.coalesce(Transaction.quantity, 1)) * func.coalesce(kit_size.c.units, 1)).label("potes")
+        statement = (
+            select(Product.title, potes)
+            .select_from(Transaction)
+            .join(Product, Product.id == Transaction.product_id)
+            .outerjoin(kit_size, kit_size.c.product_id == Product.id)
+            .where(*self._income_filters(user_id, start_date, end_date), Product.user_id == user_id)
+            .group_by(Product.id, Product.title, kit_size.c.units)
+            .having(potes > 0)
+        )
         session = next(get_session())
-        filters = [
-            Transaction.user_id == user_id,
-            Transaction.type == "INCOME",
-            Transaction.product_id.isnot(None)
-        ]
-        if start_date and end_date:
-            filters.append(Transaction.date.between(start_date, end_date))
-        transactions = session.exec(select(Transaction).where(*filters)).all()
-
-        kits_por_produto: Dict[int, int] = {}
-        for t in transactions:
-            pid = t.product_id
-            kits_por_produto[pid] = kits_por_produto.get(pid, 0) + (t.quantity or 1)
-
-        produtos = session.exec(
-            select(Product).options(selectinload(Product.components)).where(Product.user_id == user_id)
-        ).all()
-
-        inventory_items = session.exec(
-            select(InventoryItem).where(InventoryItem.user_id == user_id)
-        ).all()
+        try:
+            rows = session.exec(statement).all()
+        finally:
+            session.close()
 
         grupos: Dict[str, int] = {}
-        for p in produtos:
-            kits = kits_por_produto.get(p.id, 0)
-            if kits == 0:
-                continue
-
-            base_name = re.sub(r' - \d+x$', '', p.title.strip()).strip()
-
-            potes = 0
-            if hasattr(p, 'components') and p.components:
-                for comp in p.components:
-                    inv_item = next((i for i in inventory_items if i.id == comp.inventory_item_id), None)
-                    if inv_item:
-                        potes += kits * (comp.quantity or 1)
-            else:
-                potes = kits
-
-            grupos[base_name] = grupos.get(base_name, 0) + potes
+        for title, product_potes in rows:
+            name = base_name(title)
+            grupos[name] = grupos.get(name, 0) + int(product_potes)
 
         result = sorted(grupos.items(), key=lambda x: x[1], reverse=True)
-        session.close()
         return [
-            {"product_title": name, "total_potes": potes}
-            for name, potes in result[:limit]
+            {"product_title": name, "total_potes": total}
+            for name, total in result[:limit]
         ]
 
     def run(self, user_id: int):
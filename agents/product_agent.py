@@ -1,7 +1,8 @@
 from agents.base_agent import BaseAgent
 from core.llm_client import llm_client
+from core.events import event_bus, INVENTORY_CHANGED, PRODUCTS_ADDED
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any
 from core.database.engine import get_session, engine
 from core.database.models import Product, ProductVariation, InventoryItem, ProductComponent
 from sqlalchemy.orm import selectinload
@@ -16,7 +17,24 @@ class ProductAgent(BaseAgent):
         """
         Generates a Title, Description and Keywords optimized for Shopee 2025 & Nutri Active.
         """
-        prompt = f"""
+        prompt = self._build_listing_prompt(product_name, key_benefits, ingredients)
+        response = llm_client.generate_content(prompt)
+        
+        return self._parse_llm_response(response)
+
+    def stream_listing(self, product_name: str, key_benefits: str, ingredients: str) -> Iterator[str]:
+        """
+        Raw listing text chunk by chunk (st.write_stream). Parse the joined text with parse_listing().
+        """
+        prompt = self._build_listing_prompt(product_name, key_benefits, ingredients)
+        yield from llm_client.generate_stream(prompt)
+
+    def parse_listing(self, response: str) -> Dict[str, str]:
+        """Splits a TÍTULO/DESCRIÇÃO/KEYWORDS answer (e.g. the text returned by st.write_stream)."""
+        return self._parse_llm_response(response)
+
+    def _build_listing_prompt(self, product_name: str, key_benefits: str, ingredients: str) -> str:
+        return f"""
         Você é um Redator Especialista em Suplementos (Alta Conversão + Rigor Técnico).
         Crie um kit de cadastro para o produto: '{product_name}' da marca 'Nutri Active'.
         
@@ -48,10 +66,6 @@ class ProductAgent(BaseAgent):
         DESCRIÇÃO: [O texto completo da descrição aqui]
         KEYWORDS: [Lista de 15 palavras-chave separadas por vírgula]
         """
-        
-        response = llm_client.generate_content(prompt)
-        
-        return self._parse_llm_response(response)
 
     def generate_mass_upload_csv(self, products_data: List[Dict[str, str]]) -> str:
         """
@@ -185,6 +199,7 @@ class ProductAgent(BaseAgent):
                 session.add(new_product)
                 session.commit()
                 session.refresh(new_product)
+                event_bus.publish(PRODUCTS_ADDED, user_id=user_id, product_ids=[new_product.id])
                 return {"success": True, "product_id": new_product.id}
 
         except Exception as e:
@@ -301,6 +316,7 @@ class ProductAgent(BaseAgent):
             }
             
             imported_count = 0
+            new_products = []
             session = next(get_session())
             
             for _, row in df.iterrows():
@@ -316,9 +332,12 @@ class ProductAgent(BaseAgent):
                 if 'title' in product_data:
                     new_prod = Product(**product_data, user_id=user_id)
                     session.add(new_prod)
+                    new_products.append(new_prod)
                     imported_count += 1
             
             session.commit()
+            if new_products:
+                event_bus.publish(PRODUCTS_ADDED, user_id=user_id, product_ids=[p.id for p in new_products])
             return {"success": True, "count": imported_count}
         except Exception as e:
             return {"success": False, "message": str(e)}
@@ -330,6 +349,27 @@ class ProductAgent(BaseAgent):
             return session.exec(statement).all()
 
 
+    def add_inventory_item(self, name: str, supplier_price: float, min_stock: int, user_id: int,
+                           initial_stock: int = 600) -> Dict[str, Any]:
+        """Creates a physical inventory item."""
+        try:
+            with Session(engine) as session:
+                item = InventoryItem(
+                    name=name,
+                    supplier_price=supplier_price,
+                    stock=initial_stock,
+                    initial_stock=initial_stock,
+                    min_stock=min_stock,
+                    user_id=user_id
+                )
+                session.add(item)
+                session.commit()
+                session.refresh(item)
+                event_bus.publish(INVENTORY_CHANGED, user_id=user_id, item_ids=[item.id])
+                return {"success": True, "item_id": item.id}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
     def update_inventory_item(self, item_id: int, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Updates a physical inventory item."""
         try:
@@ -344,6 +384,7 @@ class ProductAgent(BaseAgent):
                 
                 session.add(item)
                 session.commit()
+                event_bus.publish(INVENTORY_CHANGED, user_id=item.user_id, item_ids=[item.id])
                 return {"success": True}
         except Exception as e:
             return {"success": False, "message": str(e)}
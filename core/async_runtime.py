@@ -0,0 +1,61 @@
+"""
+AsyncRuntime — One long-lived event loop (background thread) for the process.
+
+Loop-bound objects (AsyncOpenAI / genai .aio clients, httpx.AsyncClient,
+asyncio.Semaphore) only work on the loop they were first used on. Running
+each batch in its own asyncio.run() loop rebuilt them per call — and leaked
+them, since a contended semaphore keeps its loop alive. Instead:
+1. The loop starts lazily on first use and lives until the process exits
+2. run()      — sync code (Streamlit reruns, worker threads) blocks on a
+   coroutine scheduled on that loop
+3. on_loop()  — awaits a coroutine on that loop from any other event loop
+So per-provider / per-host state is created once and shared process-wide.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Coroutine, Optional
+
+
+class AsyncRuntime:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-runtime", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def is_current(self) -> bool:
+        """True when called from inside the runtime loop."""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Blocks the calling thread until coro finishes on the runtime loop."""
+        if self.is_current():
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run() chamado de dentro do próprio loop — use await")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Ctrl+C / timeout: não deixa a corrotina rodando sozinha no loop
+            future.cancel()
+            raise
+
+    async def on_loop(self, coro: Awaitable[Any]) -> Any:
+        """Awaits coro on the runtime loop (directly when already on it)."""
+        if self.is_current():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+
+# Singleton — um loop por processo
+async_runtime = AsyncRuntime()
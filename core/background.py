@@ -0,0 +1,58 @@
+"""
+BackgroundJobs — Keyed, deduplicated background computations for the dashboard.
+
+Streamlit reruns the whole script on every interaction, so slow work (LLM
+advice, reports) must not run inline. A job is identified by (name, owner)
+plus a `stamp` describing the inputs it was computed from:
+1. submit() starts the job once per (name, owner, stamp) — reruns just poll
+2. A new stamp (e.g. the aggregates changed) replaces the previous job
+3. get() returns the result when ready, None while pending
+Jobs live in this process only (thread pool), which is fine for a local app.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class BackgroundJobs:
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background")
+        self._jobs: Dict[Tuple[str, Hashable], Tuple[Hashable, Future]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, owner: Hashable, stamp: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Starts fn(*args) unless a job with the same stamp exists (running or succeeded)."""
+        with self._lock:
+            current = self._jobs.get((name, owner))
+            if current is not None:
+                current_stamp, future = current
+                failed = future.done() and future.exception() is not None
+                if current_stamp == stamp and not failed:
+                    return future
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._jobs[(name, owner)] = (stamp, future)
+            return future
+
+    def get(self, name: str, owner: Hashable, stamp: Hashable) -> Optional[Any]:
+        """Result for this exact stamp, or None if missing/pending/failed."""
+        with self._lock:
+            current = self._jobs.get((name, owner))
+        if current is None or current[0] != stamp:
+            return None
+        future = current[1]
+        if not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def is_pending(self, name: str, owner: Hashable, stamp: Hashable) -> bool:
+        with self._lock:
+            current = self._jobs.get((name, owner))
+        return current is not None and current[0] == stamp and not current[1].done()
+
+    def invalidate(self, name: str, owner: Hashable):
+        with self._lock:
+            self._jobs.pop((name, owner), None)
+
+
+# Singleton — compartilhado entre as sessões do Streamlit (mesmo processo)
+background_jobs = BackgroundJobs()
@@ -0,0 +1,129 @@
+"""
+BillOfMaterials — Listing x inventory-item kit matrix (NumPy).
+
+A Shopee listing ("Melatonina - 3x") is a kit of physical inventory items
+(ProductComponent rows). The matrix is stored in COO form — three parallel
+arrays (row = listing, col = item, qty per kit) — so the usual questions are
+single vectorized operations instead of per-component Python loops:
+
+- Kit capacity:   min over each row of item_stock[col] // qty
+- Units per item: scatter-add of kits_sold[row] * qty into the item columns
+- Kit cost:       scatter-add of qty * item_cost[col] into the listing rows
+
+Listings without components fall back to their own Product.stock /
+supplier_price and count one unit per kit sold. Components pointing to an
+item the user does not own are dropped (same as the old loops did).
+Built by ProductAnalyticsService and cached per data version.
+"""
+from typing import Dict, List, Mapping, Tuple
+import numpy as np
+from sqlmodel import Session, select
+from core.database.models import Product, ProductComponent, InventoryItem
+
+
+class BillOfMaterials:
+    def __init__(
+        self,
+        products: List[Tuple[int, str, float, float, int]],
+        items: List[Tuple[int, float, int]],
+        components: List[Tuple[int, int, int]],
+    ):
+        """
+        products:   (id, title, price, supplier_price, stock), in display order
+        items:      (id, supplier_price, stock)
+        components: (product_id, inventory_item_id, quantity)
+        """
+        self.product_ids = np.array([p[0] for p in products], dtype=np.int64)
+        self.titles = [p[1] for p in products]
+        self.prices = np.array([p[2] or 0.0 for p in products], dtype=np.float64)
+        self.item_ids = np.array([i[0] for i in items], dtype=np.int64)
+        self.item_cost = np.array([i[1] or 0.0 for i in items], dtype=np.float64)
+        self.item_stock = np.array([i[2] or 0 for i in items], dtype=np.int64)
+
+        self._row_of: Dict[int, int] = {pid: n for n, pid in enumerate(self.product_ids.tolist())}
+        col_of = {iid: n for n, iid in enumerate(self.item_ids.tolist())}
+
+        n_products = len(products)
+        self.has_components = np.zeros(n_products, dtype=bool)
+        rows, cols, qty = [], [], []
+        for product_id, item_id, quantity in components:
+            row = self._row_of.get(product_id)
+            if row is None:
+                continue
+            self.has_components[row] = True
+            col = col_of.get(item_id)
+            if col is None:
+                continue
+            rows.append(row)
+            cols.append(col)
+            qty.append(quantity or 1)
+        self.rows = np.array(rows, dtype=np.int64)
+        self.cols = np.array(cols, dtype=np.int64)
+        self.qty = np.array(qty, dtype=np.int64)
+
+        own_cost = np.array([p[3] or 0.0 for p in products], dtype=np.float64)
+        own_stock = np.array([p[4] or 0 for p in products], dtype=np.int64)
+
+        # Custo de um kit
+        kit_cost = np.bincount(self.rows, weights=self.qty * self.item_cost[self.cols], minlength=n_products)
+        self.unit_cogs = np.where(self.has_components, kit_cost, own_cost)
+
+        # Kits montáveis: limitado pelo item com menor disponibilidade proporcional
+        capacity = np.full(n_products, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(capacity, self.rows, self.item_stock[self.cols] // self.qty)
+        capacity[capacity == np.iinfo(np.int64).max] = 0
+        self.capacity = np.where(self.has_components, capacity, own_stock)
+
+        # Unidades físicas por kit (fallback: 1)
+        kit_size = np.zeros(n_products, dtype=np.int64)
+        np.add.at(kit_size, self.rows, self.qty)
+        self.kit_size = np.where(self.has_components, kit_size, 1)
+
+    @classmethod
+    def load(cls, session: Session, user_id: int) -> "BillOfMaterials":
+        """Three column queries (products, items, components) for one user."""
+        products = session.exec(
+            select(Product.id, Product.title, Product.price, Product.supplier_price, Product.stock)
+            .where(Product.user_id == user_id)
+            .order_by(Product.id)
+        ).all()
+        items = session.exec(
+            select(InventoryItem.id, InventoryItem.supplier_price, InventoryItem.stock)
+            .where(InventoryItem.user_id == user_id)
+        ).all()
+        components = session.exec(
+            select(ProductComponent.product_id, ProductComponent.inventory_item_id, ProductComponent.quantity)
+            .join(Product, Product.id == ProductComponent.product_id)
+            .where(Product.user_id == user_id)
+        ).all()
+        return cls(products, items, components)
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def vector(self, by_product: Mapping[int, float], dtype=np.int64) -> np.ndarray:
+        """Dense per-listing vector from {product_id: value} (unknown ids are ignored)."""
+        out = np.zeros(len(self), dtype=dtype)
+        for product_id, value in by_product.items():
+            row = self._row_of.get(product_id)
+            if row is not None:
+                out[row] = value
+        return out
+
+    def units_per_product(self, kits: np.ndarray) -> np.ndarray:
+        """Physical units sold per listing."""
+        return kits * self.kit_size
+
+    def units_per_item(self, kits: np.ndarray) -> np.ndarray:
+        """Physical units sold per inventory item (aligned with item_ids)."""
+        out = np.zeros(len(self.item_ids), dtype=np.int64)
+        np.add.at(out, self.cols, kits[self.rows] * self.qty)
+        return out
+
+    def cogs_per_product(self, kits: np.ndarray) -> np.ndarray:
+        return kits * self.unit_cogs
+
+    def item_dict(self, per_item: np.ndarray) -> Dict[int, int]:
+        """{inventory_item_id: value} for the non-zero entries."""
+        nz = np.flatnonzero(per_item)
+        return dict(zip(self.item_ids[nz].tolist(), per_item[nz].tolist()))
@@ -0,0 +1,184 @@
+"""
+DiskCache — Persistent key/value cache backed by a local SQLite file.
+
+Used to avoid paying (in seconds and API credits) for the same remote call
+twice, e.g. Tavily/Firecrawl searches for a keyword searched minutes ago.
+1. Keys are hashes of (namespace, parts..., params) — see make_key()
+2. Every entry has a TTL; expired entries count as misses and are purged
+3. Size-bounded LRU: past `max_entries`, the least recently READ entries go
+4. Hit/miss/eviction counters per process (stats())
+Values must be JSON-serializable. A separate file from database.db so it can
+be deleted at any time.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from core.config import Config
+
+
+class DiskCache:
+    def __init__(self, path: str, max_entries: int = 2000, default_ttl: float = 6 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+        self._initialized = False
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        # Uma conexão por operação: seguro entre threads (buscas em paralelo)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS cache_entry ("
+                        " key TEXT PRIMARY KEY,"
+                        " namespace TEXT NOT NULL,"
+                        " value TEXT NOT NULL,"
+                        " created_at REAL NOT NULL,"
+                        " expires_at REAL NOT NULL,"
+                        " accessed_at REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache_entry (accessed_at)")
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self._stats[stat] += n
+
+    @staticmethod
+    def make_key(namespace: str, *parts: Any, **params: Any) -> str:
+        """Stable hash of the call identity. Params are sorted, so order does not matter."""
+        payload = json.dumps([namespace, parts, params], sort_keys=True, default=str, ensure_ascii=False)
+        return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value, expires_at FROM cache_entry WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return default
+            value, expires_at = row
+            if expires_at < now:
+                conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+                conn.commit()
+                self._count("expired")
+                self._count("misses")
+                return default
+            conn.execute("UPDATE cache_entry SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        finally:
+            conn.close()
+        self._count("hits")
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        namespace = key.split(":", 1)[0]
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, namespace, value, created_at, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value, default=str, ensure_ascii=False), now, now + ttl, now)
+            )
+            evicted = self._evict(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+        self._count("sets")
+        if evicted:
+            self._count("evictions", evicted)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        """Purges expired entries, then the least recently used beyond max_entries."""
+        conn.execute("DELETE FROM cache_entry WHERE expires_at < ?", (now,))
+        total = conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        excess = total - self.max_entries
+        if excess <= 0:
+            return 0
+        conn.execute(
+            "DELETE FROM cache_entry WHERE key IN ("
+            " SELECT key FROM cache_entry ORDER BY accessed_at ASC LIMIT ?)",
+            (excess,)
+        )
+        return excess
+
+    def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+        bypass: bool = False
+    ) -> Any:
+        """
+        Returns the cached value or computes and stores it.
+        bypass=True always computes (and refreshes the entry).
+        Exceptions from compute() propagate and nothing is cached.
+        """
+        if not bypass:
+            cached = self.get(key, default=_MISSING)
+            if cached is not _MISSING:
+                return cached
+        value = compute()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def clear(self, namespace: Optional[str] = None):
+        conn = self._connect()
+        try:
+            if namespace:
+                conn.execute("DELETE FROM cache_entry WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM cache_entry")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            entries = conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["entries"] = entries
+        stats["hit_rate"] = (stats["hits"] / lookups * 100) if lookups else 0.0
+        return stats
+
+
+_MISSING = object()
+
+# Singleton — resultados de busca (Tavily / Firecrawl)
+search_cache = DiskCache(
+    Config.CACHE_PATH,
+    max_entries=Config.SEARCH_CACHE_MAX_ENTRIES,
+    default_ttl=Config.SEARCH_CACHE_TTL,
+)
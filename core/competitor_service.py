@@ -1,10 +1,19 @@
 import json
-from typing import List, Dict, Optional
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import List, Dict, Optional, Callable, Iterator, Set, Tuple
 from datetime import datetime
 from sqlmodel import select, Session
+from sqlalchemy import case, delete, func, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from core.database.engine import get_session
-from core.database.models import Product, CompetitorListing
+from core.database.models import (
+    Product, CompetitorListing, CompetitorMatchVerdict, CompetitorPriceObservation, CompetitorPriceRollup
+)
+from core.events import event_bus, COMPETITORS_SAVED
 from core.llm_client import llm_client
+from core.price_history import price_history
 from scrapers import SCRAPER_MAP
 
 
@@ -20,9 +29,105 @@ MARKETPLACE_LABELS = {
 }
 
 
+def listing_key(result: Dict) -> Optional[str]:
+    """Stable identity of a competitor listing: marketplace + marketplace_id, else its URL (else its title)."""
+    marketplace = (result.get("marketplace") or "").strip().lower()
+    marketplace_id = result.get("marketplace_id")
+    if marketplace_id:
+        return f"{marketplace}:{str(marketplace_id).strip()}"
+    url = (result.get("product_url") or "").strip()
+    if url:
+        return f"{marketplace}:{url.split('#', 1)[0].rstrip('/')}"
+    title = _normalize_title(result.get("competitor_title"))
+    if title:
+        return f"{marketplace}:title:{title}"
+    return None
+
+
+# ----------------------------------------------------------------------
+# Pré-filtro local (antes da IA)
+# ----------------------------------------------------------------------
+_TITLE_STOPWORDS = {
+    "de", "da", "do", "das", "dos", "com", "sem", "para", "por", "e", "em", "a", "o", "as", "os",
+    "kit", "un", "und", "unid", "unidade", "unidades", "pote", "original", "novo", "nova",
+    "frete", "gratis", "promocao", "oferta", "envio", "imediato",
+}
+
+# unidade -> (dimensão, fator para a unidade base da dimensão)
+_UNIT_DIMENSIONS = {
+    "mg": ("mg", 1.0), "mcg": ("mcg", 1.0), "ug": ("mcg", 1.0), "ui": ("ui", 1.0),
+    "g": ("g", 1.0), "gr": ("g", 1.0), "grs": ("g", 1.0), "gramas": ("g", 1.0), "kg": ("g", 1000.0),
+    "ml": ("ml", 1.0), "l": ("ml", 1000.0), "litro": ("ml", 1000.0), "litros": ("ml", 1000.0),
+    "caps": ("caps", 1.0), "capsulas": ("caps", 1.0), "capsula": ("caps", 1.0),
+    "comprimidos": ("caps", 1.0), "comp": ("caps", 1.0), "tabletes": ("caps", 1.0),
+    "tabs": ("caps", 1.0), "softgels": ("caps", 1.0), "gomas": ("caps", 1.0),
+}
+# Número no formato BR: "." só como separador de milhar (1.000mg), "," como decimal (0,5kg).
+# "1.5l" (ponto decimal) não vira medida — sem medida não há descarte.
+_MEASURE_RE = re.compile(
+    r"(?<![\d.,])(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?\s*("
+    + "|".join(sorted(_UNIT_DIMENSIONS, key=len, reverse=True)) + r")\b"
+)
+_PACK_RE = re.compile(r"\bkit\s*(?:c/|com)?\s*(\d+)\b|\b(\d+)\s*x\b")
+
+
+def _normalize_title(text: Optional[str]) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def title_profile(title: Optional[str]) -> Tuple[Set[str], Dict[str, Set[float]], Optional[int]]:
+    """
+    (tokens, medidas, kit) de um título.
+    medidas: dimensão -> valores na unidade base ("300g" e "0,3kg" -> {"g": {300.0}}).
+    kit: quantidade do "Kit 3" / "2x" (None se não houver).
+    """
+    clean = _normalize_title(title)
+    measures: Dict[str, Set[float]] = {}
+    for integer, decimals, unit in _MEASURE_RE.findall(clean):
+        dimension, factor = _UNIT_DIMENSIONS[unit]
+        number = float(f"{integer.replace('.', '')}.{decimals or 0}")
+        measures.setdefault(dimension, set()).add(round(number * factor, 3))
+    pack = None
+    for kit, times in _PACK_RE.findall(clean):
+        pack = int(kit or times)
+        break
+    words = re.sub(r"[^a-z0-9]+", " ", _MEASURE_RE.sub(" ", _PACK_RE.sub(" ", clean))).split()
+    tokens = {w for w in words if len(w) > 1 and not w.isdigit() and w not in _TITLE_STOPWORDS}
+    return tokens, measures, pack
+
+
+def _pack_variants(values: Set[float], pack: Optional[int]) -> Set[float]:
+    """Medidas como escritas, por unidade (/ kit) e total do kit (x kit)."""
+    if not pack or pack < 2:
+        return set(values)
+    return values | {round(v / pack, 3) for v in values} | {round(v * pack, 3) for v in values}
+
+
 class CompetitorService:
 
-    def search_competitors(self, product_id: int, marketplaces: List[str] = None, keyword: str = None) -> List[Dict]:
+    SEARCH_DEADLINE = 90  # Segundos para a busca inteira (todas as lojas)
+    MATCH_BATCH_SIZE = 15  # Anúncios por prompt de matching
+    PREFILTER_MIN_OVERLAP = 0.2  # Abaixo disso (tokens em comum / menor título) é outro produto
+
+    def search_competitors(
+        self,
+        product_id: int,
+        marketplaces: List[str] = None,
+        keyword: str = None,
+        on_progress: Optional[Callable[[str, str, int], None]] = None,
+        deadline: Optional[float] = None,
+        use_cache: bool = True
+    ) -> List[Dict]:
+        """
+        Busca o produto em todas as lojas em paralelo (uma thread por marketplace).
+
+        on_progress(marketplace, status, count) é chamado na thread de quem chamou
+        assim que cada loja termina — status: "ok", "erro" ou "timeout".
+        Lojas que estouram o deadline são descartadas; o resto segue normalmente.
+        use_cache=False ignora o cache de buscas (Tavily/Firecrawl) e o atualiza.
+        """
         session = next(get_session())
         product = session.get(Product, product_id)
         if not product:
@@ -34,29 +139,76 @@ class CompetitorService:
         if keyword is None:
             keyword = self._build_search_keyword(product)
         our_price = product.price
-        all_results = []
 
-        for mp in marketplaces:
-            scraper_cls = SCRAPER_MAP.get(mp)
-            if not scraper_cls:
-                continue
-            try:
-                scraper = scraper_cls()
-                results = scraper.search(keyword, limit=20)
-                for r in results:
-                    r["our_price_at_time"] = our_price
-                all_results.extend(results)
-                print(f"✅ [{mp}] {len(results)} resultados para '{keyword}'")
-            except Exception as e:
-                print(f"❌ [{mp}] Erro na busca: {e}")
+        all_results = []
+        for mp, results in self.iter_search(marketplaces, keyword, deadline, on_progress, use_cache):
+            for r in results:
+                r["our_price_at_time"] = our_price
+            all_results.extend(results)
 
         if all_results and llm_client:
-            all_results = self._match_with_ai(product, all_results)
+            all_results = self._match_with_ai(product, all_results, session)
 
         saved = self._save_results(product_id, all_results, session)
+        # Marca a busca mesmo sem resultados: a fila de staleness ordena por isso.
+        # UPDATE direto (sem eventos do ORM) para não invalidar os caches do catálogo.
+        session.execute(
+            update(Product).where(Product.id == product_id).values(competitors_searched_at=datetime.utcnow())
+        )
+        session.commit()
+        user_id = product.user_id
         session.close()
+        event_bus.publish(COMPETITORS_SAVED, user_id=user_id, product_id=product_id)
         return saved
 
+    def iter_search(
+        self,
+        marketplaces: List[str],
+        keyword: str,
+        deadline: Optional[float] = None,
+        on_progress: Optional[Callable[[str, str, int], None]] = None,
+        use_cache: bool = True
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Fan-out concorrente: yield (marketplace, resultados) na ordem em que as
+        lojas respondem. O rate limit é um token bucket por domínio
+        (scrapers/rate_limiter.py), então lojas diferentes não se esperam.
+        """
+        jobs = [mp for mp in marketplaces if mp in SCRAPER_MAP]
+        if not jobs:
+            return
+
+        deadline = deadline or self.SEARCH_DEADLINE
+        pool = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="competitor-search")
+        futures = {pool.submit(self._search_marketplace, mp, keyword, use_cache): mp for mp in jobs}
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                mp = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"❌ [{mp}] Erro na busca: {e}")
+                    if on_progress:
+                        on_progress(mp, "erro", 0)
+                    continue
+                print(f"✅ [{mp}] {len(results)} resultados para '{keyword}'")
+                if on_progress:
+                    on_progress(mp, "ok", len(results))
+                yield mp, results
+        except FuturesTimeout:
+            for future, mp in futures.items():
+                if not future.done():
+                    print(f"⏱️ [{mp}] Deadline de {deadline}s atingido — resultados descartados")
+                    if on_progress:
+                        on_progress(mp, "timeout", 0)
+        finally:
+            # Não bloqueia esperando lojas lentas
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _search_marketplace(self, marketplace: str, keyword: str, use_cache: bool = True) -> List[Dict]:
+        scraper = SCRAPER_MAP[marketplace](use_cache=use_cache)
+        return scraper.search(keyword, limit=20)
+
     def _build_search_keyword(self, product: Product) -> str:
         parts = []
         if product.title:
@@ -68,15 +220,109 @@ class CompetitorService:
             combined = combined[:100]
         return combined.strip()
 
-    def _match_with_ai(self, product: Product, results: List[Dict]) -> List[Dict]:
+    def _match_with_ai(self, product: Product, results: List[Dict], session: Session) -> List[Dict]:
+        """
+        Classifica TODOS os resultados (não só os 15 primeiros):
+        1. Vereditos já conhecidos (product_id, listing_key) vêm do banco — sem IA
+        2. O resto vai em lotes de MATCH_BATCH_SIZE, todos em paralelo (generate_many)
+        3. Cada lote bem-sucedido vira veredito salvo; lote com erro fica sem classificação
+        """
         if not results:
             return results
 
+        verdicts = self._load_verdicts(product.id, results, session)
+        reference = title_profile(product.title)
+
+        pending: Dict[str, Dict] = {}
+        discarded = 0
+        for r in results:
+            key = listing_key(r)
+            if key and key in verdicts:
+                continue
+            reason = self._prefilter_mismatch(reference, r.get("competitor_title"))
+            if reason:
+                r["confidence_score"] = "nao_match"
+                discarded += 1
+                continue
+            # Mesmo anúncio vindo duas vezes (ex.: Firecrawl + scraper) só vai uma vez
+            pending.setdefault(key or f"#{id(r)}", r)
+
+        pending_items = list(pending.items())
+        batches = [
+            pending_items[i:i + self.MATCH_BATCH_SIZE]
+            for i in range(0, len(pending_items), self.MATCH_BATCH_SIZE)
+        ]
+        if batches:
+            prompts = [self._build_match_prompt(product, [r for _, r in batch]) for batch in batches]
+            # Sem cache de resposta: um JSON inválido/truncado em cache travaria o lote até o TTL;
+            # o que se reaproveita são os vereditos por (product_id, listing_key)
+            outputs = llm_client.generate_many(prompts, use_cache=False)
+
+            new_verdicts = []
+            for batch, output in zip(batches, outputs):
+                if output["error"]:
+                    print(f"⚠️ Erro no matching IA (lote de {len(batch)}): {output['error']}")
+                    continue
+                try:
+                    matches = self._parse_matches(output["text"])
+                except Exception as e:
+                    print(f"⚠️ Resposta inválida no matching IA: {e}")
+                    continue
+                for i, (key, _) in enumerate(batch):
+                    match_info = matches.get(i + 1)
+                    if not match_info:
+                        continue
+                    verdict = {
+                        "is_match": bool(match_info.get("is_match")),
+                        "confidence": match_info.get("confidence", "baixo"),
+                        "reason": match_info.get("reason"),
+                    }
+                    verdicts[key] = verdict
+                    if not key.startswith("#"):
+                        new_verdicts.append({"listing_key": key, **verdict})
+            self._save_verdicts(product.id, new_verdicts, session)
+
+        for r in results:
+            verdict = verdicts.get(listing_key(r)) or verdicts.get(f"#{id(r)}")
+            if verdict:
+                r["confidence_score"] = verdict["confidence"] if verdict["is_match"] else "nao_match"
+        print(
+            f"🤖 Matching IA: {len(results)} resultados, {discarded} descartados no pré-filtro, "
+            f"{len(pending_items)} enviados em {len(batches)} lote(s)"
+        )
+        return results
+
+    def _prefilter_mismatch(self, reference, competitor_title: Optional[str]) -> Optional[str]:
+        """
+        Descarta localmente só os casos ÓBVIOS (retorna o motivo); o resto vai à IA.
+        - Medida da mesma dimensão nos dois títulos e nenhum valor em comum
+          (500mg x 1000mg, 60 caps x 120 caps, 300g x 1kg)
+        - Quase nenhuma palavra em comum (outro tipo de produto)
+        Quantidade de kit diferente NÃO descarta: a IA pode aceitar com confiança "médio".
+        """
+        ref_tokens, ref_measures, ref_pack = reference
+        tokens, measures, pack = title_profile(competitor_title)
+
+        for dimension, values in ref_measures.items():
+            if dimension not in measures:
+                continue
+            # "Kit 2 60 caps" pode vir escrito como "120 caps" (e vice-versa):
+            # basta concordar por unidade OU pelo total do kit
+            if not (_pack_variants(values, ref_pack) & _pack_variants(measures[dimension], pack)):
+                return f"{dimension} diferente"
+
+        if ref_tokens and tokens:
+            overlap = len(ref_tokens & tokens) / min(len(ref_tokens), len(tokens))
+            if overlap < self.PREFILTER_MIN_OVERLAP:
+                return "tipo de produto diferente"
+        return None
+
+    def _build_match_prompt(self, product: Product, batch: List[Dict]) -> str:
         items_text = ""
-        for i, r in enumerate(results[:15]):
+        for i, r in enumerate(batch):
             items_text += f"\n[{i+1}] Título: {r['competitor_title']} | Preço: R${r['competitor_price']:.2f} | Marketplace: {r['marketplace']}"
 
-        prompt = f"""Você é um analista de mercado e-commerce. Analise se os resultados de busca são o MESMO PRODUTO ou um produto similar/diferente do produto de referência.
+        return f"""Você é um analista de mercado e-commerce. Analise se os resultados de busca são o MESMO PRODUTO ou um produto similar/diferente do produto de referência.
 
 Produto de referência: "{product.title}"
 Preço do nosso produto: R${product.price:.2f}
@@ -92,51 +338,149 @@ Para cada resultado, responda em JSON válido (sem markdown, sem ```):
 
 Seja rigoroso: só marque como is_match=true se for claramente o mesmo produto ou versão muito similar (mesmo tipo, peso, sabor, marca). Kit com quantidade diferente pode ser match com confiança "médio"."""
 
-        try:
-            response = llm_client.generate_content(prompt)
-            clean = response.strip()
-            if "```" in clean:
-                clean = clean.split("```")[1]
-                if clean.startswith("json"):
-                    clean = clean[4:]
-            parsed = json.loads(clean)
-            matches = {m["index"]: m for m in parsed.get("matches", [])}
-
-            for i, r in enumerate(results[:15]):
-                match_info = matches.get(i + 1)
-                if match_info:
-                    r["confidence_score"] = match_info.get("confidence", "baixo") if match_info.get("is_match") else "nao_match"
-        except Exception as e:
-            print(f"⚠️ Erro no matching IA: {e}")
-
-        return results
+    @staticmethod
+    def _parse_matches(response: str) -> Dict[int, Dict]:
+        clean = response.strip()
+        if "```" in clean:
+            clean = clean.split("```")[1]
+            if clean.startswith("json"):
+                clean = clean[4:]
+        parsed = json.loads(clean)
+        return {int(m["index"]): m for m in parsed.get("matches", []) if "index" in m}
+
+    def _load_verdicts(self, product_id: int, results: List[Dict], session: Session) -> Dict[str, Dict]:
+        keys = {k for k in (listing_key(r) for r in results) if k}
+        if not keys:
+            return {}
+        rows = session.exec(
+            select(CompetitorMatchVerdict).where(
+                CompetitorMatchVerdict.product_id == product_id,
+                CompetitorMatchVerdict.listing_key.in_(keys),
+            )
+        ).all()
+        return {
+            v.listing_key: {"is_match": v.is_match, "confidence": v.confidence, "reason": v.reason}
+            for v in rows
+        }
+
+    def _save_verdicts(self, product_id: int, verdicts: List[Dict], session: Session, source: str = "ia"):
+        """Upsert por (product_id, listing_key). Vereditos da IA nunca sobrescrevem os manuais."""
+        if not verdicts:
+            return
+        now = datetime.utcnow()
+        stmt = sqlite_insert(CompetitorMatchVerdict).values([
+            {"product_id": product_id, "source": source, "updated_at": now, **v} for v in verdicts
+        ])
+        if source == "manual":
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["product_id", "listing_key"],
+                set_={
+                    "is_match": stmt.excluded.is_match,
+                    "confidence": stmt.excluded.confidence,
+                    "reason": stmt.excluded.reason,
+                    "source": stmt.excluded.source,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["product_id", "listing_key"])
+        session.execute(stmt)
+        session.commit()
 
     def _save_results(self, product_id: int, results: List[Dict], session: Session) -> List[Dict]:
+        """
+        Upsert por (product_id, listing_key) num único INSERT ... ON CONFLICT DO UPDATE:
+        re-buscas atualizam a linha existente em vez de empilhar duplicatas.
+        Confirmação manual (is_confirmed_match / confiança) é preservada.
+        Anúncio novo ou com preço diferente ganha uma linha em CompetitorPriceObservation.
+        """
+        now = datetime.utcnow()
+        rows: Dict[str, Dict] = {}
         saved = []
         for r in results:
             if r.get("confidence_score") == "nao_match":
                 continue
-            listing = CompetitorListing(
-                product_id=product_id,
-                marketplace=r.get("marketplace", ""),
-                competitor_title=r.get("competitor_title", ""),
-                competitor_price=r.get("competitor_price", 0.0),
-                competitor_seller=r.get("competitor_seller", ""),
-                our_price_at_time=r.get("our_price_at_time", 0.0),
-                price_before_discount=r.get("price_before_discount"),
-                shipping_cost=r.get("shipping_cost"),
-                product_url=r.get("product_url", ""),
-                marketplace_id=r.get("marketplace_id"),
-                rating=r.get("rating"),
-                sold_count=r.get("sold_count"),
-                seller_location=r.get("seller_location", ""),
-                is_confirmed_match=False,
-                confidence_score=r.get("confidence_score"),
-                last_checked_at=datetime.utcnow(),
-            )
-            session.add(listing)
+            key = listing_key(r)
+            if not key:
+                continue
+            rows[key] = {
+                "product_id": product_id,
+                "listing_key": key,
+                "marketplace": r.get("marketplace", ""),
+                "competitor_title": r.get("competitor_title", ""),
+                "competitor_price": r.get("competitor_price", 0.0),
+                "competitor_seller": r.get("competitor_seller", ""),
+                "our_price_at_time": r.get("our_price_at_time", 0.0),
+                "price_before_discount": r.get("price_before_discount"),
+                "shipping_cost": r.get("shipping_cost"),
+                "product_url": r.get("product_url", ""),
+                "marketplace_id": r.get("marketplace_id"),
+                "rating": r.get("rating"),
+                "sold_count": r.get("sold_count"),
+                "seller_location": r.get("seller_location", ""),
+                "is_confirmed_match": False,
+                "confidence_score": r.get("confidence_score"),
+                "last_checked_at": now,
+                "created_at": now,
+            }
             saved.append(r)
-        session.commit()
+
+        if rows:
+            previous_prices = dict(session.exec(
+                select(CompetitorListing.listing_key, CompetitorListing.competitor_price).where(
+                    CompetitorListing.product_id == product_id,
+                    CompetitorListing.listing_key.in_(rows.keys()),
+                )
+            ).all())
+
+            table = CompetitorListing.__table__
+            stmt = sqlite_insert(CompetitorListing).values(list(rows.values()))
+            refreshed = (
+                "marketplace", "competitor_title", "competitor_price", "competitor_seller",
+                "price_before_discount", "shipping_cost", "product_url",
+                "marketplace_id", "rating", "sold_count", "seller_location", "last_checked_at",
+            )
+            set_ = {col: stmt.excluded[col] for col in refreshed}
+            # Nosso preço de quando ESTE preço do concorrente apareceu: só muda junto com ele
+            set_["our_price_at_time"] = case(
+                (table.c.competitor_price == stmt.excluded.competitor_price, table.c.our_price_at_time),
+                else_=stmt.excluded.our_price_at_time,
+            )
+            set_["confidence_score"] = case(
+                (table.c.is_confirmed_match.is_(True), table.c.confidence_score),
+                else_=stmt.excluded.confidence_score,
+            )
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["product_id", "listing_key"], set_=set_
+            ))
+
+            changed = [
+                key for key, row in rows.items()
+                if key not in previous_prices or previous_prices[key] != row["competitor_price"]
+            ]
+            if changed:
+                listing_ids = dict(session.exec(
+                    select(CompetitorListing.listing_key, CompetitorListing.id).where(
+                        CompetitorListing.product_id == product_id,
+                        CompetitorListing.listing_key.in_(changed),
+                    )
+                ).all())
+                session.execute(insert(CompetitorPriceObservation), [
+                    {
+                        "listing_id": listing_ids[key],
+                        "product_id": product_id,
+                        "marketplace": rows[key]["marketplace"],
+                        "price": rows[key]["competitor_price"],
+                        "price_before_discount": rows[key]["price_before_discount"],
+                        "shipping_cost": rows[key]["shipping_cost"],
+                        "our_price": rows[key]["our_price_at_time"],
+                        "observed_at": now,
+                    }
+                    for key in changed if key in listing_ids
+                ])
+            price_history.record_rollups(session, product_id, rows.values(), now)
+            session.commit()
+            print(f"💾 {len(rows)} anúncios atualizados ({len(changed)} com preço novo/alterado)")
 
         for r in saved:
             if r.get("competitor_price", 0) > 0:
@@ -188,6 +532,16 @@ Seja rigoroso: só marque como is_match=true se for claramente o mesmo produto o
         if not listing:
             session.close()
             return False
+        # Guarda a decisão: a próxima busca não pergunta de novo à IA sobre este anúncio
+        # Mesma chave gravada no upsert (inclui o fallback por título)
+        key = listing.listing_key
+        if key:
+            self._save_verdicts(listing.product_id, [{
+                "listing_key": key,
+                "is_match": is_match,
+                "confidence": "alto" if is_match else None,
+                "reason": "Confirmado manualmente" if is_match else "Rejeitado manualmente",
+            }], session, source="manual")
         if not is_match:
             session.delete(listing)
         else:
@@ -231,8 +585,44 @@ Seja rigoroso: só marque como is_match=true se for claramente o mesmo produto o
         listings = session.exec(statement).all()
         for l in listings:
             session.delete(l)
+        session.execute(delete(CompetitorPriceRollup).where(CompetitorPriceRollup.product_id == product_id))
+        # Volta a "nunca buscado": entra no topo da fila do worker e reabre a tarefa de concorrência
+        session.execute(update(Product).where(Product.id == product_id).values(competitors_searched_at=None))
         session.commit()
+        product = session.get(Product, product_id)
+        user_id = product.user_id if product else None
         session.close()
+        if user_id is not None:
+            event_bus.publish(COMPETITORS_SAVED, user_id=user_id, product_id=product_id)
+
+    @staticmethod
+    def last_searched_expr():
+        """
+        Última busca de concorrentes do produto (para consultas agrupadas por Product.id).
+        Product.competitors_searched_at conta buscas sem nenhum resultado; para produtos
+        buscados antes dessa coluna existir, cai no anúncio verificado mais recente.
+        """
+        return func.coalesce(Product.competitors_searched_at, func.max(CompetitorListing.last_checked_at))
+
+    def get_staleness(self, session: Session, user_id: Optional[int] = None) -> List[Tuple[int, str, Optional[datetime]]]:
+        """
+        (product_id, title, última busca) de todos os produtos, do mais
+        desatualizado ao mais recente (nunca buscados primeiro) —
+        um único LEFT JOIN agrupado, sem uma consulta por produto.
+        """
+        last_checked = self.last_searched_expr()
+        statement = (
+            select(Product.id, Product.title, last_checked)
+            .outerjoin(CompetitorListing, CompetitorListing.product_id == Product.id)
+            .group_by(Product.id, Product.title, Product.competitors_searched_at)
+            .order_by(last_checked, Product.id)  # NULL primeiro no SQLite
+        )
+        if user_id is not None:
+            statement = statement.where(Product.user_id == user_id)
+        return [tuple(row) for row in session.exec(statement).all()]
+
+    def get_price_trend(self, product_id: int, days: Optional[int] = None) -> List[Dict]:
+        return price_history.get_trend(product_id, days)
 
 
 competitor_service = CompetitorService()
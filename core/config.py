@@ -17,10 +17,92 @@ class Config:
     LLM_MODEL = os.getenv("LLM_MODEL", None)
     LLM_ENABLED = os.getenv("LLM_ENABLED", "false")
 
+    # HTTP (scrapers) — pool compartilhado, ver scrapers/http_client.py
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+    HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))
+    HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "5"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+    # Rate limit dos scrapers por domínio — ver scrapers/rate_limiter.py
+    RATE_LIMIT_DEFAULT_RPM = float(os.getenv("RATE_LIMIT_DEFAULT_RPM", "20"))
+    RATE_LIMIT_DEFAULT_BURST = int(os.getenv("RATE_LIMIT_DEFAULT_BURST", "3"))
+    RATE_LIMIT_JITTER = float(os.getenv("RATE_LIMIT_JITTER", "1.0"))
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "")  # "amazon.com.br=12/2,enjoei.com.br=30/5"
+
+    # Cache em disco (buscas Tavily/Firecrawl) — ver core/cache.py
+    CACHE_PATH = os.getenv("CACHE_PATH", "cache.db")
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))
+
+    # Histórico de preços da concorrência (core/price_history.py)
+    PRICE_HISTORY_RAW_DAYS = int(os.getenv("PRICE_HISTORY_RAW_DAYS", "90"))  # Depois disso: 1 ponto por anúncio/semana
+    PRICE_TREND_DAYS = int(os.getenv("PRICE_TREND_DAYS", "90"))
+
+    # Worker de monitoramento de preços — python -m core.price_monitor
+    MONITOR_INTERVAL_MINUTES = float(os.getenv("MONITOR_INTERVAL_MINUTES", "360"))
+    MONITOR_MAX_AGE_HOURS = float(os.getenv("MONITOR_MAX_AGE_HOURS", "24"))  # Só produtos mais velhos que isso
+    MONITOR_CONCURRENCY = int(os.getenv("MONITOR_CONCURRENCY", "2"))  # Produtos em paralelo
+    MONITOR_LEASE_MINUTES = float(os.getenv("MONITOR_LEASE_MINUTES", "15"))  # Sem heartbeat há mais que isso = worker morto
+    MONITOR_MARKETPLACES = os.getenv("MONITOR_MARKETPLACES", "shopee,mercadolivre,amazon")
+    MONITOR_DEFAULT_BUDGET = int(os.getenv("MONITOR_DEFAULT_BUDGET", "50"))  # Buscas por marketplace por rodada
+    MONITOR_BUDGETS = os.getenv("MONITOR_BUDGETS", "")  # "amazon=20,shopee=40"
+
+    # Cache de respostas do LLM (arquivo próprio, mesma engine de core/cache.py)
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+
+    # Chamadas concorrentes ao LLM (generate_many / agenerate_content)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # Por provider
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+
+    # Cadeia de providers + circuit breaker — ver core/llm_providers.py
+    LLM_FALLBACK_ORDER = os.getenv("LLM_FALLBACK_ORDER", "gemini,openrouter,nvidia")
+    LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "3"))  # Falhas seguidas para abrir
+    LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))  # Segundos pulando o provider
+
     # App Settings
     APP_NAME = "Shopee Growth Quest"
     VERSION = "0.1.0"
 
+    @classmethod
+    def rate_limits(cls) -> dict:
+        """Parses RATE_LIMITS into {domain: (rpm, burst)}. Invalid entries (incl. rpm <= 0, burst < 1) are ignored."""
+        limits = {}
+        for entry in cls.RATE_LIMITS.split(","):
+            if "=" not in entry:
+                continue
+            domain, spec = entry.split("=", 1)
+            rpm, _, burst = spec.partition("/")
+            try:
+                rpm, burst = float(rpm), int(burst or cls.RATE_LIMIT_DEFAULT_BURST)
+            except ValueError:
+                print(f"⚠️ Warning: invalid RATE_LIMITS entry '{entry}'")
+                continue
+            if rpm <= 0 or burst < 1:
+                print(f"⚠️ Warning: invalid RATE_LIMITS entry '{entry}' (rpm must be > 0 and burst >= 1)")
+                continue
+            limits[domain.strip().lower()] = (rpm, burst)
+        return limits
+
+    @classmethod
+    def monitor_budgets(cls) -> dict:
+        """Searches allowed per marketplace per monitor run: {marketplace: budget}."""
+        budgets = {mp.strip(): cls.MONITOR_DEFAULT_BUDGET for mp in cls.MONITOR_MARKETPLACES.split(",") if mp.strip()}
+        for entry in cls.MONITOR_BUDGETS.split(","):
+            if "=" not in entry:
+                continue
+            marketplace, value = entry.split("=", 1)
+            try:
+                budgets[marketplace.strip().lower()] = int(value)
+            except ValueError:
+                print(f"⚠️ Warning: invalid MONITOR_BUDGETS entry '{entry}'")
+        return budgets
+
     @staticmethod
     def validate_keys():
         if not Config.GOOGLE_API_KEY:
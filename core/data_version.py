@@ -0,0 +1,60 @@
+"""
+Data versions — in-memory counters bumped by SQLAlchemy ORM events.
+
+Derived in-process caches (e.g. the ProductMatcher index) remember the version
+they were built with and rebuild when it changes. Only writes made by THIS
+process through the ORM are seen; bulk DELETE/UPDATE statements must call
+bump() explicitly.
+"""
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, inspect
+from core.database.models import Product, ProductComponent, InventoryItem, Transaction, CogsEntry
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+
+
+def bump(topic: str):
+    """Invalidate every cache built on top of `topic`."""
+    with _lock:
+        _versions[topic] = _versions.get(topic, 0) + 1
+
+
+def get_version(*topics: str) -> Tuple[int, ...]:
+    """Current version stamp for one or more topics."""
+    with _lock:
+        return tuple(_versions.get(t, 0) for t in topics)
+
+
+def track(model, topic: str, fields: Optional[Iterable[str]] = None):
+    """
+    Bump `topic` whenever rows of `model` are inserted, updated or deleted.
+    If `fields` is given, updates only count when one of those columns changed
+    (so e.g. stock decrements do not invalidate a title index).
+    """
+    fields = tuple(fields) if fields else None
+
+    def _on_write(mapper, connection, target):
+        bump(topic)
+
+    def _on_update(mapper, connection, target):
+        if fields is None:
+            bump(topic)
+            return
+        state = inspect(target)
+        if any(state.attrs[f].history.has_changes() for f in fields):
+            bump(topic)
+
+    event.listen(model, "after_insert", _on_write)
+    event.listen(model, "after_delete", _on_write)
+    event.listen(model, "after_update", _on_update)
+
+
+# ── Tracked topics ─────────────────────────────────────────────────
+track(Product, "product_titles", fields=("title", "user_id"))
+track(Product, "products")
+track(ProductComponent, "products")
+track(InventoryItem, "inventory")
+track(Transaction, "sales")
+track(CogsEntry, "sales")
@@ -0,0 +1,26 @@
+"""
+Migration script to create the CogsEntry ledger and backfill it for the
+sales already registered (INCOME transactions linked to a product).
+Uses the CURRENT supplier prices — older sales have no historical snapshot.
+Safe to run more than once: transactions that already have entries are skipped.
+
+Run from the project root:
+    python -m core.database.migrations.backfill_cogs
+"""
+from sqlmodel import SQLModel, Session
+from core.database.engine import engine
+from core.sales_service import SalesService
+
+
+def backfill():
+    # Cria a tabela cogsentry (e seus índices) se ainda não existir
+    SQLModel.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        count = SalesService().backfill_cogs(session)
+
+    print(f"✅ Backfill complete! {count} transactions added to the COGS ledger.")
+
+
+if __name__ == "__main__":
+    backfill()
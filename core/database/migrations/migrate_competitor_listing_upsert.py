@@ -0,0 +1,104 @@
+"""
+Migration script for competitor listing upserts (one row per product + listing_key).
+
+1. Adds the 'listing_key' column to competitorlisting and backfills it
+2. Creates the competitorpriceobservation table
+3. Collapses duplicate rows (one per search) into the most recent one,
+   keeping manual confirmations, and turns every collapsed row into a
+   price observation so the old history is not lost
+4. Creates the unique index used by INSERT ... ON CONFLICT
+
+Safe to run more than once. Run from the project root:
+    python -m core.database.migrations.migrate_competitor_listing_upsert
+"""
+from collections import defaultdict
+from sqlalchemy import text
+from sqlmodel import SQLModel
+from core.database.engine import engine
+from core.database.models import CompetitorPriceObservation
+from core.competitor_service import listing_key
+
+
+def migrate():
+    SQLModel.metadata.create_all(engine, tables=[CompetitorPriceObservation.__table__])
+
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(competitorlisting)"))]
+        if "listing_key" not in columns:
+            print("Adding 'listing_key' column to competitorlisting table...")
+            conn.execute(text("ALTER TABLE competitorlisting ADD COLUMN listing_key VARCHAR"))
+        else:
+            print("'listing_key' column already exists.")
+
+        rows = conn.execute(text(
+            "SELECT id, product_id, marketplace, marketplace_id, product_url, competitor_title,"
+            " competitor_price, price_before_discount, shipping_cost, is_confirmed_match,"
+            " confidence_score, last_checked_at, listing_key"
+            " FROM competitorlisting ORDER BY last_checked_at, id"
+        )).mappings().all()
+
+        groups = defaultdict(list)
+        for row in rows:
+            key = row["listing_key"] or listing_key(dict(row)) or f"legacy:{row['id']}"
+            if key != row["listing_key"]:
+                conn.execute(
+                    text("UPDATE competitorlisting SET listing_key = :key WHERE id = :id"),
+                    {"key": key, "id": row["id"]},
+                )
+            groups[(row["product_id"], key)].append(row)
+
+        removed = 0
+        observations = 0
+        for (product_id, key), group in groups.items():
+            keep = group[-1]  # Mais recente
+            already_tracked = conn.execute(
+                text("SELECT COUNT(*) FROM competitorpriceobservation WHERE listing_id = :id"),
+                {"id": keep["id"]},
+            ).scalar()
+            if not already_tracked:
+                last_price = None
+                for row in group:
+                    if row["competitor_price"] == last_price:
+                        continue
+                    last_price = row["competitor_price"]
+                    conn.execute(text(
+                        "INSERT INTO competitorpriceobservation"
+                        " (listing_id, product_id, marketplace, price, price_before_discount, shipping_cost, observed_at)"
+                        " VALUES (:listing_id, :product_id, :marketplace, :price, :pbd, :shipping, :observed_at)"
+                    ), {
+                        "listing_id": keep["id"],
+                        "product_id": product_id,
+                        "marketplace": row["marketplace"],
+                        "price": row["competitor_price"],
+                        "pbd": row["price_before_discount"],
+                        "shipping": row["shipping_cost"],
+                        "observed_at": row["last_checked_at"],
+                    })
+                    observations += 1
+
+            if len(group) == 1:
+                continue
+            confirmed = [row for row in group if row["is_confirmed_match"]]
+            if confirmed:
+                conn.execute(
+                    text("UPDATE competitorlisting SET is_confirmed_match = 1, confidence_score = :conf WHERE id = :id"),
+                    {"conf": confirmed[-1]["confidence_score"], "id": keep["id"]},
+                )
+            stale_ids = [row["id"] for row in group[:-1]]
+            conn.execute(
+                text(f"DELETE FROM competitorlisting WHERE id IN ({','.join(str(i) for i in stale_ids)})")
+            )
+            removed += len(stale_ids)
+
+        print(f"Collapsed {removed} duplicate listings, recorded {observations} price observations.")
+
+        print("Creating 'ix_competitorlisting_product_key' unique index...")
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_competitorlisting_product_key "
+            "ON competitorlisting (product_id, listing_key)"
+        ))
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
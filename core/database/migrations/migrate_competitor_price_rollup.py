@@ -0,0 +1,35 @@
+"""
+Migration script for the competitor price rollups (core/price_history.py).
+
+Creates the competitorpricerollup table and backfills it from the price
+observations already recorded. Safe to run more than once: days that already
+have a rollup are left untouched.
+
+Run from the project root:
+    python -m core.database.migrations.migrate_competitor_price_rollup
+"""
+from sqlalchemy import text
+from sqlmodel import SQLModel
+from core.database.engine import engine
+from core.database.models import CompetitorPriceRollup
+
+
+def migrate():
+    print("Creating 'competitorpricerollup' table...")
+    SQLModel.metadata.create_all(engine, tables=[CompetitorPriceRollup.__table__])
+
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "INSERT OR IGNORE INTO competitorpricerollup"
+            " (product_id, marketplace, day, min_price, max_price, sum_price, sample_count, updated_at)"
+            " SELECT product_id, marketplace, date(observed_at), MIN(price), MAX(price), SUM(price), COUNT(*),"
+            "  MAX(observed_at)"
+            " FROM competitorpriceobservation WHERE price > 0"
+            " GROUP BY product_id, marketplace, date(observed_at)"
+        ))
+        print(f"Backfilled {result.rowcount} daily rollups.")
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
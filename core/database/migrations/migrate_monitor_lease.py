@@ -0,0 +1,33 @@
+"""
+Migration script for the price monitor staleness queue and run lease.
+
+1. Adds 'competitors_searched_at' to the product table (searches that find
+   nothing still count as checked)
+2. Adds 'heartbeat_at' to the monitorrun table (lease of the worker that
+   owns a running run)
+
+Safe to run more than once. Run from the project root:
+    python -m core.database.migrations.migrate_monitor_lease
+"""
+from sqlalchemy import text
+from core.database.engine import engine
+
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    columns = [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+    if column not in columns:
+        print(f"Adding '{column}' column to {table} table...")
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    else:
+        print(f"'{column}' column already exists.")
+
+
+def migrate():
+    with engine.begin() as conn:
+        _add_column(conn, "product", "competitors_searched_at", "DATETIME")
+        _add_column(conn, "monitorrun", "heartbeat_at", "DATETIME")
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,24 @@
+"""
+Migration script to add 'our_price' to the competitor price observations.
+
+Older observations keep NULL: our price at that moment was not recorded.
+Safe to run more than once. Run from the project root:
+    python -m core.database.migrations.migrate_observation_our_price
+"""
+from sqlalchemy import text
+from core.database.engine import engine
+
+
+def migrate():
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(competitorpriceobservation)"))]
+        if "our_price" not in columns:
+            print("Adding 'our_price' column to competitorpriceobservation table...")
+            conn.execute(text("ALTER TABLE competitorpriceobservation ADD COLUMN our_price FLOAT"))
+        else:
+            print("'our_price' column already exists.")
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
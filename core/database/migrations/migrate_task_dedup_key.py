@@ -0,0 +1,79 @@
+"""
+Migration script for the indexed task dedup / competitor staleness scan.
+
+1. Adds the 'dedup_key' column to the task table
+2. Backfills it for PENDING auto-generated tasks from their titles, so the
+   next TaskEngine scan does not create duplicates of them
+3. Creates ix_task_user_pending_dedup and ix_competitorlisting_product_checked
+
+Safe to run more than once. Run from the project root:
+    python -m core.database.migrations.migrate_task_dedup_key
+"""
+from sqlalchemy import text
+from core.database.engine import engine
+
+
+def _legacy_key(title: str, created_at, products: dict, items: dict):
+    """Best-effort dedup_key for a task created before the column existed."""
+    if "Upload" in title or "upload" in title:
+        return "sales_upload"
+    if "Repor estoque: " in title:
+        name = title.split("Repor estoque: ", 1)[1]
+        return f"restock:{items[name]}" if name in items else None
+    for prefix, kind in (("Atualizar concorrencia: ", "competitor_stale"), ("Concorrencia: ", "competitor_missing")):
+        if prefix in title:
+            short = title.split(prefix, 1)[1]
+            product_id = products.get(short)
+            return f"{kind}:{product_id}" if product_id else None
+    if "Relatorio mensal" in title:
+        return f"monthly_report:{str(created_at)[:7]}"
+    return None
+
+
+def migrate():
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(task)"))]
+        if "dedup_key" not in columns:
+            print("Adding 'dedup_key' column to task table...")
+            conn.execute(text("ALTER TABLE task ADD COLUMN dedup_key VARCHAR"))
+        else:
+            print("'dedup_key' column already exists.")
+
+        tasks = conn.execute(text(
+            "SELECT id, user_id, title, created_at FROM task"
+            " WHERE is_completed = 0 AND auto_generated = 1 AND dedup_key IS NULL"
+        )).all()
+        lookups = {}
+        backfilled = 0
+        for task_id, user_id, title, created_at in tasks:
+            if user_id not in lookups:
+                # Títulos guardam o nome do produto cortado em 50 caracteres
+                products = {
+                    row[1][:50]: row[0]
+                    for row in conn.execute(text("SELECT id, title FROM product WHERE user_id = :u"), {"u": user_id})
+                }
+                items = {
+                    row[1]: row[0]
+                    for row in conn.execute(text("SELECT id, name FROM inventoryitem WHERE user_id = :u"), {"u": user_id})
+                }
+                lookups[user_id] = (products, items)
+            key = _legacy_key(title, created_at, *lookups[user_id])
+            if key:
+                conn.execute(text("UPDATE task SET dedup_key = :k WHERE id = :id"), {"k": key, "id": task_id})
+                backfilled += 1
+        print(f"Backfilled dedup_key on {backfilled}/{len(tasks)} pending tasks.")
+
+        print("Creating 'ix_task_user_pending_dedup' index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_task_user_pending_dedup ON task (user_id, is_completed, dedup_key)"
+        ))
+        print("Creating 'ix_competitorlisting_product_checked' index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_competitorlisting_product_checked"
+            " ON competitorlisting (product_id, last_checked_at)"
+        ))
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,24 @@
+"""
+Migration script to add the composite dedup index to the Transaction table.
+create_all() only creates indexes together with NEW tables, so existing
+databases need this once. Safe to run more than once.
+
+Run from the project root:
+    python -m core.database.migrations.migrate_transaction_dedup_index
+"""
+from sqlalchemy import text
+from core.database.engine import engine
+
+
+def migrate():
+    with engine.begin() as conn:
+        print("Creating 'ix_transaction_dedup' index on transaction table...")
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_transaction_dedup '
+            'ON "transaction" (user_id, type, date, description, amount)'
+        ))
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
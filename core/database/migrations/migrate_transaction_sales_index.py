@@ -0,0 +1,24 @@
+"""
+Migration script to add the covering sales index to the Transaction table.
+create_all() only creates indexes together with NEW tables, so existing
+databases need this once. Safe to run more than once.
+
+Run from the project root:
+    python -m core.database.migrations.migrate_transaction_sales_index
+"""
+from sqlalchemy import text
+from core.database.engine import engine
+
+
+def migrate():
+    with engine.begin() as conn:
+        print("Creating 'ix_transaction_user_type_date' index on transaction table...")
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_date '
+            'ON "transaction" (user_id, type, date, product_id, quantity, amount)'
+        ))
+    print("✅ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,6 +1,7 @@
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship
-from datetime import datetime
+from sqlalchemy import Index
+from datetime import date, datetime
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -24,6 +25,14 @@ class Mission(SQLModel, table=True):
     user: Optional[User] = Relationship(back_populates="missions")
 
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        # Dedup de uploads: (dia, descrição, valor) por usuário — ver SalesService.load_duplicate_keys
+        Index("ix_transaction_dedup", "user_id", "type", "date", "description", "amount"),
+        # Vendas por produto/período (FinanceAgent.get_top_products*, ProductAnalyticsService):
+        # colunas extras cobrem os SUMs sem ler a tabela
+        Index("ix_transaction_user_type_date", "user_id", "type", "date", "product_id", "quantity", "amount"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.utcnow)
     type: str  # "INCOME" or "EXPENSE"
@@ -34,6 +43,7 @@ class Transaction(SQLModel, table=True):
     quantity: int = Field(default=1)  # Quantidade de unidades vendidas nesta transação
     
     user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    cogs_entries: List["CogsEntry"] = Relationship(back_populates="transaction", cascade_delete=True)
 
 class ProductVariation(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -82,6 +92,7 @@ class Product(SQLModel, table=True):
     shopee_id: Optional[str] = None
     category: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    competitors_searched_at: Optional[datetime] = None  # Última busca de concorrentes, mesmo sem resultados
 
     user_id: Optional[int] = Field(default=None, foreign_key="user.id")
     variations: List[ProductVariation] = Relationship(back_populates="product", cascade_delete=True)
@@ -90,6 +101,17 @@ class Product(SQLModel, table=True):
 
 
 class CompetitorListing(SQLModel, table=True):
+    """Estado ATUAL de um anúncio concorrente — uma linha por (produto, listing_key).
+
+    Re-buscas fazem upsert (CompetitorService._save_results); o histórico de
+    preços fica em CompetitorPriceObservation.
+    """
+    __table_args__ = (
+        Index("ix_competitorlisting_product_key", "product_id", "listing_key", unique=True),
+        # Cobre MAX(last_checked_at) GROUP BY product_id (TaskEngine / worker de preços)
+        Index("ix_competitorlisting_product_checked", "product_id", "last_checked_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     product_id: int = Field(foreign_key="product.id", index=True)
     marketplace: str = Field(index=True)
@@ -101,6 +123,7 @@ class CompetitorListing(SQLModel, table=True):
     shipping_cost: Optional[float] = None
     product_url: str
     marketplace_id: Optional[str] = None
+    listing_key: Optional[str] = None  # marketplace + marketplace_id ou URL — ver competitor_service.listing_key
     rating: Optional[float] = None
     sold_count: Optional[int] = None
     seller_location: Optional[str] = None
@@ -110,10 +133,122 @@ class CompetitorListing(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     product: Optional[Product] = Relationship(back_populates="competitor_listings")
+    price_observations: List["CompetitorPriceObservation"] = Relationship(back_populates="listing", cascade_delete=True)
+
+
+class CompetitorPriceObservation(SQLModel, table=True):
+    """Histórico compacto de preços: uma linha quando o anúncio aparece pela 1ª vez ou muda de preço."""
+    __table_args__ = (
+        Index("ix_competitorpriceobservation_listing_observed", "listing_id", "observed_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    listing_id: int = Field(foreign_key="competitorlisting.id")
+    product_id: int = Field(foreign_key="product.id")
+    marketplace: str
+    price: float
+    price_before_discount: Optional[float] = None
+    shipping_cost: Optional[float] = None
+    our_price: Optional[float] = None  # Nosso preço no momento da observação
+    observed_at: datetime = Field(default_factory=datetime.utcnow)
+
+    listing: Optional[CompetitorListing] = Relationship(back_populates="price_observations")
+
+
+class CompetitorPriceRollup(SQLModel, table=True):
+    """Min/média/máx diário por (produto, marketplace) — mantido a cada busca (core/price_history.py).
+
+    Fonte dos gráficos de tendência: 90 dias = no máximo 90 linhas por marketplace.
+    """
+    __table_args__ = (
+        Index("ix_competitorpricerollup_product_day_mp", "product_id", "day", "marketplace", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int = Field(foreign_key="product.id")
+    marketplace: str
+    day: date
+    min_price: float
+    max_price: float
+    sum_price: float = Field(default=0.0)  # média = sum_price / sample_count
+    sample_count: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MonitorRun(SQLModel, table=True):
+    """Uma execução do worker de monitoramento de preços (core/price_monitor.py).
+
+    queue / done_ids guardam a fila da rodada em JSON: se o processo cair, a
+    próxima execução retoma a mesma rodada a partir do que faltou.
+    heartbeat_at é o lease: só é retomada quando ficou velho (worker morto).
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="running", index=True)  # "running", "done", "failed"
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = Field(default_factory=datetime.utcnow)  # Lease do worker dono da rodada
+    queue: str = Field(default="[]")  # IDs dos produtos, mais desatualizado primeiro
+    done_ids: str = Field(default="[]")
+    products_total: int = Field(default=0)
+    products_done: int = Field(default=0)
+    products_failed: int = Field(default=0)
+    listings_saved: int = Field(default=0)
+    marketplace_stats: str = Field(default="{}")  # {"shopee": {"ok": 3, "erro": 1, "timeout": 0, "buscas": 4}}
+    resumed_count: int = Field(default=0)
+    last_error: Optional[str] = None
+
+
+class CompetitorMatchVerdict(SQLModel, table=True):
+    """Cache de classificação "mesmo produto?" por (nosso produto, anúncio concorrente).
+
+    listing_key = marketplace + marketplace_id (ou a URL) — ver competitor_service.listing_key.
+    Re-buscas só mandam à IA anúncios sem veredito; source="manual" vem do confirm_match.
+    """
+    __table_args__ = (
+        Index("ix_competitormatchverdict_product_key", "product_id", "listing_key", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int = Field(foreign_key="product.id")
+    listing_key: str
+    is_match: bool = Field(default=False)
+    confidence: Optional[str] = None  # "alto" / "médio" / "baixo"
+    reason: Optional[str] = None
+    source: str = Field(default="ia")  # "ia" or "manual"
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CogsEntry(SQLModel, table=True):
+    """Ledger de COGS — snapshot do custo unitário no momento da venda.
+
+    Uma linha por (transação, item físico baixado). Escrito por
+    SalesService.process_sale; totais por período/produto viram um SUM indexado.
+    """
+    __table_args__ = (
+        Index("ix_cogsentry_user_date", "user_id", "date"),
+        Index("ix_cogsentry_user_product", "user_id", "product_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    transaction_id: Optional[int] = Field(default=None, foreign_key="transaction.id", index=True)
+    product_id: Optional[int] = Field(default=None, foreign_key="product.id")
+    inventory_item_id: Optional[int] = Field(default=None, foreign_key="inventoryitem.id")  # None = produto sem componentes
+    units: int = Field(default=0)  # Unidades físicas baixadas (qtd vendida x multiplicador do kit)
+    unit_cost: float = Field(default=0.0)  # supplier_price no momento da venda
+    total_cost: float = Field(default=0.0)
+    date: Optional[datetime] = None  # Copiado da transação para SUM por período
+
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    transaction: Optional[Transaction] = Relationship(back_populates="cogs_entries")
 
 
 class Task(SQLModel, table=True):
     """Practical operations task — replaces the old gamification mission system."""
+    __table_args__ = (
+        # Dedup das tarefas automáticas: um SELECT das chaves pendentes por varredura
+        Index("ix_task_user_pending_dedup", "user_id", "is_completed", "dedup_key"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: str
@@ -122,6 +257,7 @@ class Task(SQLModel, table=True):
     is_completed: bool = Field(default=False)
     auto_generated: bool = Field(default=True)
     target_tab: Optional[str] = None  # ex: "financeiro", "concorrencia" — atalho na UI
+    dedup_key: Optional[str] = None  # ex: "restock:12", "competitor_stale:7" — ver TaskEngine
     created_at: datetime = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = None
 
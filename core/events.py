@@ -0,0 +1,65 @@
+"""
+Domain events — In-process publish/subscribe between services.
+
+Publishers announce WHAT changed, after their commit; subscribers (e.g. the
+task rules in core/tasks/engine.py) react only to the affected entities
+instead of rescanning the whole database on every Streamlit rerun.
+
+Events and payloads:
+- SALES_INGESTED      user_id, product_ids
+- INVENTORY_CHANGED   user_id, item_ids
+- COMPETITORS_SAVED   user_id, product_id    (after every search, even with no listings,
+                                             and after the listings are cleared)
+- PRODUCTS_ADDED      user_id, product_ids
+- DAILY_TICK          user_id                (first render of the day)
+
+Handlers run synchronously in the publisher's thread. A failing handler is
+logged and never breaks the publisher (the write already succeeded).
+"""
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+SALES_INGESTED = "sales.ingested"
+INVENTORY_CHANGED = "inventory.changed"
+COMPETITORS_SAVED = "competitors.saved"
+PRODUCTS_ADDED = "products.added"
+DAILY_TICK = "daily.tick"
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[..., Any]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, event: str, handler: Callable[..., Any]):
+        """Registers handler(**payload) for `event` (idempotent)."""
+        with self._lock:
+            if handler not in self._handlers[event]:
+                self._handlers[event].append(handler)
+
+    def unsubscribe(self, event: str, handler: Callable[..., Any]):
+        with self._lock:
+            if handler in self._handlers[event]:
+                self._handlers[event].remove(handler)
+
+    def handler_count(self, event: str) -> int:
+        with self._lock:
+            return len(self._handlers[event])
+
+    def publish(self, event: str, **payload) -> int:
+        """Calls every handler of `event`. Returns how many ran without error."""
+        with self._lock:
+            handlers = list(self._handlers[event])
+        ok = 0
+        for handler in handlers:
+            try:
+                handler(**payload)
+                ok += 1
+            except Exception as e:
+                print(f"⚠️ Evento '{event}': handler {getattr(handler, '__qualname__', handler)} falhou: {e}")
+        return ok
+
+
+# Singleton — compartilhado pelo processo (Streamlit ou worker)
+event_bus = EventBus()
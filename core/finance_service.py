@@ -0,0 +1,180 @@
+"""
+FinanceService — Aggregated financial queries pushed down to SQLite.
+
+The dashboard reruns on every widget interaction, so the KPI cards must never
+load the whole Transaction table into Python. This service answers:
+1. Revenue / expenses / count / margin with a single grouped SUM/COUNT query
+2. Daily totals (day x type x category) used to build the period charts
+3. COGS totals read from the CogsEntry ledger (one indexed SUM)
+4. Paginated access to raw rows, only when a view actually needs them
+"""
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+from sqlmodel import Session, select, func
+from core.database.models import Transaction, CogsEntry
+
+
+class FinanceService:
+    PAGE_SIZE = 200  # Rows per page for the transaction editor / drilldowns
+
+    def _user_filters(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        type: Optional[str] = None
+    ) -> list:
+        filters = [Transaction.user_id == user_id]
+        if type:
+            filters.append(Transaction.type == type)
+        if start_date is not None:
+            filters.append(Transaction.date >= start_date)
+        if end_date is not None:
+            filters.append(Transaction.date <= end_date)
+        return filters
+
+    def get_totals(
+        self,
+        session: Session,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Revenue, expenses, profit, margin and count in one grouped query:
+            SELECT type, SUM(amount), COUNT(id) ... GROUP BY type
+        """
+        rows = session.exec(
+            select(
+                Transaction.type,
+                func.coalesce(func.sum(Transaction.amount), 0.0),
+                func.count(Transaction.id)
+            )
+            .where(*self._user_filters(user_id, start_date, end_date))
+            .group_by(Transaction.type)
+        ).all()
+
+        total_revenue = 0.0
+        total_expenses = 0.0
+        transaction_count = 0
+        for txn_type, total, count in rows:
+            if txn_type == "INCOME":
+                total_revenue = float(total or 0.0)
+            elif txn_type == "EXPENSE":
+                total_expenses = float(total or 0.0)
+            transaction_count += count or 0
+
+        profit = total_revenue - total_expenses
+        margin = (profit / total_revenue * 100) if total_revenue > 0 else 0
+
+        return {
+            "total_revenue": total_revenue,
+            "total_expenses": total_expenses,
+            "net_profit": profit,
+            "margin": margin,
+            "transaction_count": transaction_count
+        }
+
+    def get_daily_totals(
+        self,
+        session: Session,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Totals grouped by (day, type, category). One row per day/type/category
+        instead of one row per transaction — charts regroup this by period.
+        """
+        day = func.date(Transaction.date)
+        rows = session.exec(
+            select(
+                day,
+                Transaction.type,
+                Transaction.category,
+                func.coalesce(func.sum(Transaction.amount), 0.0),
+                func.count(Transaction.id)
+            )
+            .where(*self._user_filters(user_id, start_date, end_date))
+            .group_by(day, Transaction.type, Transaction.category)
+            .order_by(day)
+        ).all()
+
+        return [
+            {"day": d, "type": t, "category": c, "total": float(total or 0.0), "count": count}
+            for d, t, c, total, count in rows
+        ]
+
+    def get_transactions(
+        self,
+        session: Session,
+        user_id: int,
+        limit: Optional[int] = PAGE_SIZE,
+        offset: int = 0,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        type: Optional[str] = None
+    ) -> List[Transaction]:
+        """Paginated raw rows, newest first. limit=None returns the whole range."""
+        statement = (
+            select(Transaction)
+            .where(*self._user_filters(user_id, start_date, end_date, type))
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+            .offset(offset)
+        )
+        if limit is not None:
+            statement = statement.limit(limit)
+        return list(session.exec(statement).all())
+
+    def get_revenue_by_description(self, session: Session, user_id: int) -> List[Tuple[str, float]]:
+        """INCOME totals grouped by description, highest first."""
+        total = func.sum(Transaction.amount)
+        rows = session.exec(
+            select(Transaction.description, total)
+            .where(
+                *self._user_filters(user_id, type="INCOME"),
+                Transaction.description.isnot(None),
+                Transaction.description != ""
+            )
+            .group_by(Transaction.description)
+            .order_by(total.desc())
+        ).all()
+        return [(desc, float(amount or 0.0)) for desc, amount in rows]
+
+    def get_cogs(
+        self,
+        session: Session,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> float:
+        """Total COGS from the ledger, optionally restricted to a date range."""
+        filters = [CogsEntry.user_id == user_id]
+        if start_date is not None:
+            filters.append(CogsEntry.date >= start_date)
+        if end_date is not None:
+            filters.append(CogsEntry.date <= end_date)
+        result = session.exec(
+            select(func.coalesce(func.sum(CogsEntry.total_cost), 0.0)).where(*filters)
+        ).one()
+        return float(result or 0.0)
+
+    def get_cogs_by_product(
+        self,
+        session: Session,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[int, Dict[str, float]]:
+        """{product_id: {"units": physical units, "cogs": cost}} from the ledger."""
+        filters = [CogsEntry.user_id == user_id, CogsEntry.product_id.isnot(None)]
+        if start_date is not None:
+            filters.append(CogsEntry.date >= start_date)
+        if end_date is not None:
+            filters.append(CogsEntry.date <= end_date)
+        rows = session.exec(
+            select(CogsEntry.product_id, func.sum(CogsEntry.units), func.sum(CogsEntry.total_cost))
+            .where(*filters)
+            .group_by(CogsEntry.product_id)
+        ).all()
+        return {pid: {"units": int(units or 0), "cogs": float(cost or 0.0)} for pid, units, cost in rows}
@@ -1,9 +1,18 @@
 from google import genai
 from google.genai import types as genai_types
-from openai import OpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError
 from core.config import Config
+from core.cache import DiskCache
+from core.llm_providers import ProviderPool, DEFAULT_MODELS
+from core.async_runtime import async_runtime
+import asyncio
+import hashlib
 import os
-from typing import List, Dict
+import random
+import time
+from typing import Any, Dict, Iterator, List
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
 class LLMClient:
@@ -12,7 +21,18 @@ class LLMClient:
         self.model_name = model_name
         self.openai_client = None       # OpenAI-compatible (OpenRouter / NVIDIA)
         self.genai_client = None        # google.genai.Client (Gemini)
+        # Clientes pré-inicializados de TODOS os providers configurados + circuit breaker
+        self.providers = ProviderPool()
+        # Clientes async e semáforos por provider — todos no loop único de core/async_runtime
+        self._async_clients: Dict[str, Any] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
         self.enabled = Config.LLM_ENABLED == "true"
+        # Respostas idênticas (mesmo provider/modelo/prompt/opções) não voltam ao provider
+        self.cache = DiskCache(
+            Config.LLM_CACHE_PATH,
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            default_ttl=Config.LLM_CACHE_TTL,
+        )
         self._setup_provider()
 
     def update_settings(self, provider, model_name):
@@ -38,109 +58,386 @@ class LLMClient:
     # Provider setup
     # ------------------------------------------------------------------
     def _setup_provider(self):
-        """Initialize the selected provider's client."""
-        if self.provider == "gemini":
-            if not Config.GOOGLE_API_KEY:
-                print("⚠️ Warning: GOOGLE_API_KEY missing")
-                return
-            self.genai_client = genai.Client(api_key=Config.GOOGLE_API_KEY)
-            self.model_name = self.model_name or "gemini-2.5-flash"
+        """Initialize clients for every configured provider (primary = self.provider)."""
+        self.providers.setup()
+        self._reset_async_clients()
+
+        client = self.providers.clients.get(self.provider)
+        self.genai_client = client if self.provider == "gemini" else None
+        self.openai_client = client if self.provider in ("openrouter", "nvidia") else None
+
+        if client is None:
+            env_names = {"gemini": "GOOGLE_API_KEY", "openrouter": "OPENROUTER_API_KEY", "nvidia": "NVIDIA_API_KEY"}
+            print(f"⚠️ Warning: {env_names.get(self.provider, self.provider)} missing")
+            return
+        self.model_name = self.model_name or DEFAULT_MODELS.get(self.provider)
+
+    def _model_for(self, provider: str) -> str:
+        """Selected model for the primary; provider defaults for backups."""
+        if provider == self.provider and self.model_name:
+            return self.model_name
+        return DEFAULT_MODELS[provider]
+
+    def get_provider_stats(self) -> List[Dict[str, Any]]:
+        """Per-provider health: breaker state, calls, success rate, latency."""
+        return self.providers.stats()
 
-        elif self.provider == "openrouter":
-            if not Config.OPENROUTER_API_KEY:
-                print("⚠️ Warning: OPENROUTER_API_KEY missing")
-                return
-            self.openai_client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=Config.OPENROUTER_API_KEY,
-            )
-            self.model_name = self.model_name or "google/gemini-2.5-flash"
+    # ------------------------------------------------------------------
+    # Response cache
+    # ------------------------------------------------------------------
+    def _cache_key(self, kind: str, prompt: str, **options) -> str:
+        """Content address: provider + model + prompt hash + call options."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return self.cache.make_key("llm", kind, self.provider, self.model_name, prompt_hash, **options)
 
-        elif self.provider == "nvidia":
-            if not Config.NVIDIA_API_KEY:
-                print("⚠️ Warning: NVIDIA_API_KEY missing")
-                return
-            self.openai_client = OpenAI(
-                base_url=Config.NVIDIA_BASE_URL,
-                api_key=Config.NVIDIA_API_KEY,
-            )
-            self.model_name = self.model_name or "z-ai/glm4.7"
+    def clear_cache(self):
+        self.cache.clear()
 
     # ------------------------------------------------------------------
     # Text generation
     # ------------------------------------------------------------------
-    def generate_content(self, prompt: str, use_search: bool = False) -> str:
-        """Generate text from the selected LLM."""
+    def generate_content(self, prompt: str, use_search: bool = False, use_cache: bool = True) -> str:
+        """Generate text from the selected LLM.
+
+        Walks the provider chain: primary first, then the other configured
+        providers; providers with an open circuit breaker are skipped.
+        Successful primary answers are cached (see Config.LLM_CACHE_*);
+        use_cache=False always calls the provider. Errors and backup-provider
+        answers are never cached.
+        """
         if not self.enabled:
             return ":material/smart_toy: IA desativada. Ative a conexão no botão no topo da página."
 
-        try:
-            if self.provider == "gemini":
-                return self._generate_gemini(prompt, use_search)
-            elif self.provider in ("openrouter", "nvidia"):
-                return self._generate_openai(prompt)
-            return "Provider not implemented."
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Error with {self.provider}: {error_msg}")
+        key = self._cache_key("text", prompt, use_search=use_search)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        errors = []
+        for provider in self.providers.chain(self.provider):
+            if not self.providers.is_configured(provider):
+                errors.append(f"{provider}: not configured")
+                continue
+            health = self.providers.health[provider]
+            if not health.available():
+                errors.append(f"{provider}: circuito aberto")
+                continue
+
+            started = time.monotonic()
+            try:
+                response = self._generate_with(provider, prompt, use_search)
+            except Exception as e:
+                health.record_failure(e, time.monotonic() - started)
+                print(f"❌ Error with {provider}: {e}")
+                errors.append(f"{provider}: {e}")
+                continue
+            health.record_success(time.monotonic() - started)
+
+            if provider == self.provider:
+                if response:
+                    self.cache.set(key, response)
+                return response
+
+            print(f"⚠️ Resposta via backup ({provider})")
+            return (
+                f"{response}\n\n"
+                f"[MENSAGEM DO SISTEMA: O provedor '{self.provider}' falhou. "
+                f"Resposta gerada via Backup ({provider}).]"
+            )
 
-            # Smart fallback → Gemini (only when primary isn't already Gemini)
-            if self.provider != "gemini" and Config.GOOGLE_API_KEY:
-                print("⚠️ Attempting fallback to Gemini...")
-                try:
-                    fallback_client = genai.Client(api_key=Config.GOOGLE_API_KEY)
-                    resp = fallback_client.models.generate_content(
-                        model="gemini-2.5-flash", contents=prompt
-                    )
-                    return (
-                        f"{resp.text}\n\n"
-                        f"[MENSAGEM DO SISTEMA: O provedor '{self.provider}' falhou. "
-                        f"Resposta gerada via Backup (Gemini).]"
-                    )
-                except Exception as fb_err:
-                    return f":material/error: Error (Primary & Backup): {error_msg} | Fallback: {str(fb_err)}"
+        return f":material/error: Error: {' | '.join(errors)}"
 
-            return f":material/error: Error: {error_msg}"
+    def _generate_with(self, provider: str, prompt: str, use_search: bool) -> str:
+        """One sync call to one provider, using its pre-initialized client."""
+        client = self.providers.clients[provider]
+        if provider == "gemini":
+            response = client.models.generate_content(
+                model=self._model_for(provider),
+                contents=prompt,
+                config=self._gemini_config(use_search),
+            )
+            return response.text
 
-    def _generate_gemini(self, prompt: str, use_search: bool) -> str:
-        """Call Gemini via google.genai SDK."""
-        if not self.genai_client:
-            raise Exception("Gemini not configured")
+        response = client.chat.completions.create(
+            model=self._model_for(provider),
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=1500,
+        )
+        return response.choices[0].message.content
 
-        config_kwargs = {}
+    @staticmethod
+    def _gemini_config(use_search: bool):
         if use_search:
-            config_kwargs["tools"] = [{"google_search": {}}]
+            return genai_types.GenerateContentConfig(tools=[{"google_search": {}}])
+        return None
 
-        response = self.genai_client.models.generate_content(
-            model=self.model_name,
-            contents=prompt,
-            config=genai_types.GenerateContentConfig(**config_kwargs) if config_kwargs else None,
+    # ------------------------------------------------------------------
+    # Streaming generation
+    # ------------------------------------------------------------------
+    def generate_stream(self, prompt: str, use_search: bool = False, use_cache: bool = True) -> Iterator[str]:
+        """Yield text chunks as the provider produces them (for st.write_stream).
+
+        Same chain / breakers / cache as generate_content. A cached answer is
+        yielded in one piece. The next provider is tried only if the current one
+        fails BEFORE the first chunk; a failure mid-stream ends the stream with
+        an error notice (the partial text was already shown to the user).
+        """
+        if not self.enabled:
+            yield ":material/smart_toy: IA desativada. Ative a conexão no botão no topo da página."
+            return
+
+        key = self._cache_key("text", prompt, use_search=use_search)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        errors = []
+        for provider in self.providers.chain(self.provider):
+            if not self.providers.is_configured(provider):
+                errors.append(f"{provider}: not configured")
+                continue
+            health = self.providers.health[provider]
+            if not health.available():
+                errors.append(f"{provider}: circuito aberto")
+                continue
+
+            started = time.monotonic()
+            parts: List[str] = []
+            try:
+                for chunk in self._stream_with(provider, prompt, use_search):
+                    parts.append(chunk)
+                    yield chunk
+            except Exception as e:
+                health.record_failure(e, time.monotonic() - started)
+                print(f"❌ Error with {provider} (stream): {e}")
+                if parts:
+                    yield f"\n\n:material/error: Error: resposta interrompida ({provider}: {e})"
+                    return
+                errors.append(f"{provider}: {e}")
+                continue
+            health.record_success(time.monotonic() - started)
+
+            response = "".join(parts)
+            if provider == self.provider:
+                if response:
+                    self.cache.set(key, response)
+                return
+
+            print(f"⚠️ Resposta via backup ({provider})")
+            yield (
+                f"\n\n[MENSAGEM DO SISTEMA: O provedor '{self.provider}' falhou. "
+                f"Resposta gerada via Backup ({provider}).]"
+            )
+            return
+
+        yield f":material/error: Error: {' | '.join(errors)}"
+
+    def _stream_with(self, provider: str, prompt: str, use_search: bool) -> Iterator[str]:
+        """Streaming call to one provider; yields non-empty text deltas."""
+        client = self.providers.clients[provider]
+        if provider == "gemini":
+            stream = client.models.generate_content_stream(
+                model=self._model_for(provider),
+                contents=prompt,
+                config=self._gemini_config(use_search),
+            )
+            for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+            return
+
+        stream = client.chat.completions.create(
+            model=self._model_for(provider),
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=1500,
+            stream=True,
         )
-        return response.text
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-    def _generate_openai(self, prompt: str) -> str:
-        """Call an OpenAI-compatible provider."""
-        if not self.openai_client:
-            raise Exception(f"{self.provider} not configured")
+    # ------------------------------------------------------------------
+    # Async / batch generation
+    # ------------------------------------------------------------------
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Bounded concurrency per provider, shared by every batch in the process."""
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+        return self._semaphores[provider]
+
+    def _async_client(self, provider: str):
+        """AsyncOpenAI / genai .aio client, created once on the runtime loop."""
+        if provider not in self._async_clients:
+            creds = self.providers.credentials(provider)
+            if creds is None:
+                raise Exception(f"{provider} not configured")
+            base_url, api_key = creds
+            if provider == "gemini":
+                self._async_clients[provider] = genai.Client(api_key=api_key).aio
+            else:
+                self._async_clients[provider] = AsyncOpenAI(base_url=base_url, api_key=api_key)
+        return self._async_clients[provider]
+
+    def _reset_async_clients(self):
+        """Drops the async clients (new keys / provider) and closes the old ones on the loop."""
+        old = list(self._async_clients.values())
+        self._async_clients = {}
+        if old:
+            asyncio.run_coroutine_threadsafe(self._aclose_clients(old), async_runtime.loop)
+
+    @staticmethod
+    async def _aclose_clients(clients: List[Any]):
+        for client in clients:
+            close = getattr(client, "aclose", None) or getattr(client, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"⚠️ Erro ao fechar cliente LLM async: {e}")
+
+    async def _agenerate_with(self, provider: str, prompt: str, use_search: bool) -> str:
+        client = self._async_client(provider)
+        if provider == "gemini":
+            response = await client.models.generate_content(
+                model=self._model_for(provider),
+                contents=prompt,
+                config=self._gemini_config(use_search),
+            )
+            return response.text
 
-        response = self.openai_client.chat.completions.create(
-            model=self.model_name,
+        response = await client.chat.completions.create(
+            model=self._model_for(provider),
             messages=[{"role": "user", "content": prompt}],
             max_tokens=1500,
         )
         return response.choices[0].message.content
 
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """429 / 5xx / connection problems — worth another try."""
+        if isinstance(error, (APIConnectionError, APITimeoutError, asyncio.TimeoutError)):
+            return True
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        return status in RETRY_STATUS
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return Config.LLM_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 0.5)
+
+    async def _agenerate_retrying(self, provider: str, prompt: str, use_search: bool) -> str:
+        """One provider, under its semaphore, retrying 429/5xx with exponential backoff."""
+        semaphore = self._semaphore(provider)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            try:
+                async with semaphore:
+                    return await self._agenerate_with(provider, prompt, use_search)
+            except Exception as e:
+                if attempt < Config.LLM_MAX_RETRIES and self._is_retryable(e):
+                    print(f"🔁 {provider}: {e} — tentativa {attempt + 2}/{Config.LLM_MAX_RETRIES + 1}")
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                raise
+
+    async def agenerate_content(self, prompt: str, use_search: bool = False, use_cache: bool = True) -> str:
+        """
+        Async text generation over the same provider chain / circuit breakers
+        as generate_content. Each provider runs under its semaphore and retries
+        429/5xx with backoff before the next one is tried. Returns the raw text
+        (no backup notice); backup answers are not cached. Failures RAISE.
+        Always executes on the shared runtime loop (core/async_runtime).
+        """
+        return await async_runtime.on_loop(self._agenerate_content(prompt, use_search, use_cache))
+
+    async def _agenerate_content(self, prompt: str, use_search: bool, use_cache: bool) -> str:
+        if not self.enabled:
+            raise Exception("IA desativada")
+
+        key = self._cache_key("text", prompt, use_search=use_search)
+        if use_cache:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        errors = []
+        for provider in self.providers.chain(self.provider):
+            health = self.providers.health[provider]
+            if not self.providers.is_configured(provider) or not health.available():
+                continue
+
+            started = time.monotonic()
+            try:
+                response = await self._agenerate_retrying(provider, prompt, use_search)
+            except Exception as e:
+                health.record_failure(e, time.monotonic() - started)
+                errors.append(f"{provider}: {e}")
+                continue
+            health.record_success(time.monotonic() - started)
+
+            if provider == self.provider and response:
+                await asyncio.to_thread(self.cache.set, key, response)
+            return response
+
+        raise Exception(" | ".join(errors) or "Nenhum provedor disponível")
+
+    async def agenerate_many(
+        self, prompts: List[str], use_search: bool = False, use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Ordered results: [{"text": str | None, "error": str | None}, ...]."""
+        async def _one(prompt: str) -> Dict[str, Any]:
+            try:
+                text = await self._agenerate_content(prompt, use_search, use_cache)
+                return {"text": text, "error": None}
+            except Exception as e:
+                return {"text": None, "error": str(e)}
+
+        async def _all() -> List[Dict[str, Any]]:
+            return await asyncio.gather(*(_one(p) for p in prompts))
+
+        return await async_runtime.on_loop(_all())
+
+    def generate_many(
+        self, prompts: List[str], use_search: bool = False, use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Sync facade for batch workloads: runs every prompt concurrently (bounded
+        by Config.LLM_MAX_CONCURRENCY per provider, across all concurrent
+        batches) and returns results in prompt order, each with its own error
+        instead of failing the whole batch.
+        """
+        if not prompts:
+            return []
+        return async_runtime.run(self.agenerate_many(prompts, use_search=use_search, use_cache=use_cache))
+
     # ------------------------------------------------------------------
     # Vision (image-in-prompt)
     # ------------------------------------------------------------------
     def generate_with_image(
-        self, prompt: str, image_bytes: bytes, mime_type: str = "image/jpeg"
+        self, prompt: str, image_bytes: bytes, mime_type: str = "image/jpeg", use_cache: bool = True
     ) -> str:
-        """Generate content based on text prompt and image."""
+        """Generate content based on text prompt and image (cached by prompt + image hash)."""
         if not self.enabled:
             return ":material/smart_toy: IA desativada. Ative a conexão no botão no topo da página."
 
+        key = self._cache_key(
+            "vision", prompt, image=hashlib.sha256(image_bytes).hexdigest(), mime_type=mime_type
+        )
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self._generate_with_image(prompt, image_bytes, mime_type)
+        if response and not response.startswith(":material/error:") and "not implemented" not in response:
+            self.cache.set(key, response)
+        return response
+
+    def _generate_with_image(self, prompt: str, image_bytes: bytes, mime_type: str) -> str:
         try:
             if self.provider == "gemini":
                 if not self.genai_client:
@@ -200,7 +497,8 @@ class LLMClient:
         if not self.enabled:
             return False
         try:
-            res = self.generate_content("Say 'OK' in 1 word.")
+            # Nunca do cache: o objetivo é testar o provider de verdade
+            res = self.generate_content("Say 'OK' in 1 word.", use_cache=False)
             return "OK" in res or len(res) < 20
         except Exception:
             return False
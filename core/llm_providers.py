@@ -0,0 +1,136 @@
+"""
+ProviderPool — Pre-initialized LLM clients + health tracking per provider.
+
+LLMClient walks a provider chain (primary first, then the other configured
+providers in Config.LLM_FALLBACK_ORDER) instead of building a new Gemini
+client inside the except block on every failure.
+1. One sync client per configured provider, created once at setup
+2. Circuit breaker per provider: after LLM_BREAKER_THRESHOLD consecutive
+   failures it is skipped for LLM_BREAKER_COOLDOWN seconds, then one trial
+   call is let through (half-open)
+3. Calls / successes / failures / latency counters per provider (stats())
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from google import genai
+from openai import OpenAI
+from core.config import Config
+
+PROVIDERS = ("gemini", "openrouter", "nvidia")
+
+DEFAULT_MODELS = {
+    "gemini": "gemini-2.5-flash",
+    "openrouter": "google/gemini-2.5-flash",
+    "nvidia": "z-ai/glm4.7",
+}
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+class ProviderHealth:
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """False while the breaker is open (cool-down not over yet)."""
+        with self._lock:
+            return time.monotonic() >= self.open_until
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.successes += 1
+            self.total_latency += latency
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self, error: Exception, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.total_latency += latency
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:200]
+            if self.consecutive_failures >= Config.LLM_BREAKER_THRESHOLD:
+                # Abre (ou reabre, se o teste do meio-aberto falhou) o circuito
+                self.open_until = time.monotonic() + Config.LLM_BREAKER_COOLDOWN
+                print(f"🔌 {self.provider}: circuito aberto por {Config.LLM_BREAKER_COOLDOWN:.0f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                state = "aberto"
+            elif self.consecutive_failures >= Config.LLM_BREAKER_THRESHOLD:
+                state = "meio-aberto"
+            else:
+                state = "ok"
+            return {
+                "provider": self.provider,
+                "state": state,
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "success_rate": (self.successes / self.calls * 100) if self.calls else None,
+                "avg_latency_ms": (self.total_latency / self.calls * 1000) if self.calls else None,
+                "cooldown_left_s": max(0.0, self.open_until - now),
+                "last_error": self.last_error,
+            }
+
+
+class ProviderPool:
+    def __init__(self):
+        self.clients: Dict[str, Any] = {}
+        self.health: Dict[str, ProviderHealth] = {p: ProviderHealth(p) for p in PROVIDERS}
+
+    @staticmethod
+    def credentials(provider: str) -> Optional[Tuple[Optional[str], str]]:
+        """(base_url, api_key) — base_url is None for Gemini. None if not configured."""
+        if provider == "gemini" and Config.GOOGLE_API_KEY:
+            return None, Config.GOOGLE_API_KEY
+        if provider == "openrouter" and Config.OPENROUTER_API_KEY:
+            return OPENROUTER_BASE_URL, Config.OPENROUTER_API_KEY
+        if provider == "nvidia" and Config.NVIDIA_API_KEY:
+            return Config.NVIDIA_BASE_URL, Config.NVIDIA_API_KEY
+        return None
+
+    def setup(self):
+        """(Re)creates one client per configured provider — called on key/provider changes."""
+        self.clients = {}
+        for provider in PROVIDERS:
+            creds = self.credentials(provider)
+            if creds is None:
+                continue
+            base_url, api_key = creds
+            if provider == "gemini":
+                self.clients[provider] = genai.Client(api_key=api_key)
+            else:
+                self.clients[provider] = OpenAI(base_url=base_url, api_key=api_key)
+        # Chaves novas merecem uma chance: zera os circuitos
+        self.health = {p: ProviderHealth(p) for p in PROVIDERS}
+
+    def is_configured(self, provider: str) -> bool:
+        return provider in self.clients
+
+    def chain(self, primary: str) -> List[str]:
+        """Primary first, then the other configured providers in fallback order."""
+        order = [p.strip() for p in Config.LLM_FALLBACK_ORDER.split(",") if p.strip() in PROVIDERS]
+        order += [p for p in PROVIDERS if p not in order]
+        return [primary] + [p for p in order if p != primary and self.is_configured(p)]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        rows = []
+        for provider in PROVIDERS:
+            row = self.health[provider].snapshot()
+            row["configured"] = self.is_configured(provider)
+            rows.append(row)
+        return rows
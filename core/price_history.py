@@ -0,0 +1,138 @@
+"""
+PriceHistory — Competitor price time series (rollups + retention).
+
+Three layers, cheapest to read first:
+1. CompetitorPriceRollup: daily min / avg / max per (product, marketplace),
+   upserted on every search — trend charts read ONLY this table
+2. CompetitorPriceObservation: raw points (new listing / price change),
+   indexed by (listing_id, observed_at) for per-listing history
+3. Retention: raw points older than Config.PRICE_HISTORY_RAW_DAYS are
+   downsampled to the last point per listing per week (rollups are kept).
+   It scans the whole observation table, so it runs at most once a day per
+   process (prune_if_due), on DAILY_TICK and at the end of each worker run
+"""
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import select, Session
+from core.config import Config
+from core.database.engine import get_session
+from core.database.models import CompetitorPriceRollup
+from core.events import event_bus, DAILY_TICK
+
+
+class PriceHistory:
+
+    def __init__(self):
+        self._last_prune: Optional[date] = None  # dia (UTC) da última retenção neste processo
+        self._prune_lock = threading.Lock()
+
+    def record_rollups(self, session: Session, product_id: int, rows: Iterable[Dict], observed_at: datetime):
+        """
+        Folds one search (rows with marketplace / competitor_price) into the
+        daily rollups in a single INSERT ... ON CONFLICT DO UPDATE.
+        Does not commit — runs inside the caller's transaction.
+        """
+        prices: Dict[str, List[float]] = defaultdict(list)
+        for row in rows:
+            price = row.get("competitor_price") or 0
+            if price > 0:
+                prices[row.get("marketplace", "")].append(float(price))
+        if not prices:
+            return
+
+        day = observed_at.date()
+        stmt = sqlite_insert(CompetitorPriceRollup).values([
+            {
+                "product_id": product_id,
+                "marketplace": marketplace,
+                "day": day,
+                "min_price": min(values),
+                "max_price": max(values),
+                "sum_price": sum(values),
+                "sample_count": len(values),
+                "updated_at": observed_at,
+            }
+            for marketplace, values in prices.items()
+        ])
+        table = CompetitorPriceRollup.__table__
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=["product_id", "day", "marketplace"],
+            set_={
+                # MIN/MAX com 2 argumentos = funções escalares no SQLite
+                "min_price": func.min(table.c.min_price, stmt.excluded.min_price),
+                "max_price": func.max(table.c.max_price, stmt.excluded.max_price),
+                "sum_price": table.c.sum_price + stmt.excluded.sum_price,
+                "sample_count": table.c.sample_count + stmt.excluded.sample_count,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ))
+
+    def prune(self, session: Optional[Session] = None, raw_days: Optional[int] = None) -> int:
+        """Downsamples raw points older than raw_days to one per listing per week. Returns rows deleted."""
+        raw_days = Config.PRICE_HISTORY_RAW_DAYS if raw_days is None else raw_days
+        # Mesmo formato texto em que o SQLAlchemy grava DATETIME no SQLite
+        cutoff = (datetime.utcnow() - timedelta(days=raw_days)).strftime("%Y-%m-%d %H:%M:%S")
+        own_session = session is None
+        if own_session:
+            session = next(get_session())
+        try:
+            result = session.execute(text(
+                "DELETE FROM competitorpriceobservation"
+                " WHERE observed_at < :cutoff AND id NOT IN ("
+                "  SELECT MAX(id) FROM competitorpriceobservation"
+                "  WHERE observed_at < :cutoff"
+                "  GROUP BY listing_id, strftime('%Y-%W', observed_at))"
+            ), {"cutoff": cutoff})
+            session.commit()
+            deleted = result.rowcount or 0
+        finally:
+            if own_session:
+                session.close()
+        if deleted:
+            print(f"🧹 Histórico de preços: {deleted} pontos antigos compactados")
+        return deleted
+
+    def prune_if_due(self, **_) -> int:
+        """prune() at most once per UTC day (accepts event payloads, e.g. DAILY_TICK's user_id)."""
+        today = datetime.utcnow().date()
+        with self._prune_lock:
+            if self._last_prune == today:
+                return 0
+            self._last_prune = today
+        return self.prune()
+
+    def get_trend(self, product_id: int, days: Optional[int] = None) -> List[Dict]:
+        """Daily min / avg / max per marketplace for the last `days` days (one indexed range scan)."""
+        days = Config.PRICE_TREND_DAYS if days is None else days
+        since = (datetime.utcnow() - timedelta(days=days)).date()
+        session = next(get_session())
+        try:
+            rollups = session.exec(
+                select(CompetitorPriceRollup)
+                .where(CompetitorPriceRollup.product_id == product_id, CompetitorPriceRollup.day >= since)
+                .order_by(CompetitorPriceRollup.day)
+            ).all()
+            return [
+                {
+                    "day": r.day,
+                    "marketplace": r.marketplace,
+                    "min_price": r.min_price,
+                    "avg_price": r.sum_price / r.sample_count if r.sample_count else r.min_price,
+                    "max_price": r.max_price,
+                    "samples": r.sample_count,
+                }
+                for r in rollups
+            ]
+        finally:
+            session.close()
+
+
+# Singleton
+price_history = PriceHistory()
+
+# Retenção diária ligada ao barramento (primeiro render do dia no dashboard)
+event_bus.subscribe(DAILY_TICK, price_history.prune_if_due)
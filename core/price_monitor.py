@@ -0,0 +1,258 @@
+"""
+PriceMonitor — Standalone worker that keeps competitor prices fresh.
+
+Runs outside Streamlit, so the dashboard only READS the results:
+    python -m core.price_monitor              # loop every MONITOR_INTERVAL_MINUTES
+    python -m core.price_monitor --once       # one run, then exit (cron / Task Scheduler)
+
+Each run:
+1. Ranks products by staleness (one grouped LEFT JOIN) and queues those
+   not checked in the last MONITOR_MAX_AGE_HOURS, most stale first
+2. Searches MONITOR_CONCURRENCY products at a time via
+   CompetitorService.search_competitors (which fans out per marketplace)
+3. Spends at most MONITOR_BUDGETS searches per marketplace per run; a
+   marketplace out of budget is skipped for the remaining products
+4. Records metrics in MonitorRun after every product, so a crashed run is
+   resumed (same queue, minus what was done) by the next start
+5. Holds the run through a lease (MonitorRun.heartbeat_at, refreshed after
+   every product): a second worker only resumes a "running" row whose
+   heartbeat is older than MONITOR_LEASE_MINUTES, otherwise it exits
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import or_, update
+from sqlmodel import select
+from core.config import Config
+from core.database.engine import create_db_and_tables, get_session
+from core.database.models import MonitorRun
+from core.competitor_service import competitor_service
+from core.price_history import price_history
+import core.tasks.engine  # Liga as regras de tarefas (TaskEngine) aos eventos deste processo
+
+
+class PriceMonitor:
+    def __init__(
+        self,
+        max_age_hours: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        budgets: Optional[Dict[str, int]] = None,
+    ):
+        self.max_age_hours = Config.MONITOR_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+        self.concurrency = concurrency or Config.MONITOR_CONCURRENCY
+        self.budgets = budgets if budgets is not None else Config.monitor_budgets()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Run bookkeeping
+    # ------------------------------------------------------------------
+    def _start_or_resume(self, session) -> Optional[MonitorRun]:
+        """
+        Resumes the last run left 'running' by a crash, or queues a new one.
+        Returns None when another worker still holds the running row's lease.
+        """
+        run = session.exec(
+            select(MonitorRun).where(MonitorRun.status == "running").order_by(MonitorRun.started_at.desc())
+        ).first()
+        if run is not None:
+            now = datetime.utcnow()
+            lease_cutoff = now - timedelta(minutes=Config.MONITOR_LEASE_MINUTES)
+            # UPDATE condicional = só um worker ganha a rodada, mesmo se dois iniciarem juntos
+            claimed = session.execute(
+                update(MonitorRun)
+                .where(
+                    MonitorRun.id == run.id,
+                    or_(MonitorRun.heartbeat_at.is_(None), MonitorRun.heartbeat_at < lease_cutoff),
+                )
+                .values(heartbeat_at=now, resumed_count=MonitorRun.resumed_count + 1)
+            ).rowcount
+            session.commit()
+            if not claimed:
+                print(f"🔒 Rodada #{run.id} em andamento em outro worker — saindo")
+                return None
+            session.refresh(run)
+            print(f"♻️ Retomando rodada #{run.id} ({run.products_done}/{run.products_total} produtos feitos)")
+            return run
+
+        cutoff = datetime.utcnow() - timedelta(hours=self.max_age_hours)
+        queue = [
+            product_id
+            for product_id, _, last_checked in competitor_service.get_staleness(session)
+            if last_checked is None or last_checked < cutoff
+        ]
+        run = MonitorRun(queue=json.dumps(queue), products_total=len(queue))
+        session.add(run)
+        session.commit()
+        session.refresh(run)
+        print(f"🛰️ Rodada #{run.id}: {len(queue)} produtos na fila")
+        return run
+
+    def _record_product(self, run_id: int, product_id: int, saved: int, error: Optional[str], mp_stats: Dict):
+        """Persists progress after each product (this is what makes the run resumable)."""
+        with self._lock:
+            session = next(get_session())
+            try:
+                run = session.get(MonitorRun, run_id)
+                done = json.loads(run.done_ids)
+                done.append(product_id)
+                run.done_ids = json.dumps(done)
+                run.products_done = len(done)
+                run.listings_saved += saved
+                if error:
+                    run.products_failed += 1
+                    run.last_error = error[:500]
+                totals = json.loads(run.marketplace_stats)
+                for mp, counts in mp_stats.items():
+                    bucket = totals.setdefault(mp, {"buscas": 0, "ok": 0, "erro": 0, "timeout": 0})
+                    for status, count in counts.items():
+                        bucket[status] = bucket.get(status, 0) + count
+                run.marketplace_stats = json.dumps(totals)
+                if run.heartbeat_at is not None:  # None = lease liberado por um Ctrl+C
+                    run.heartbeat_at = datetime.utcnow()
+                session.add(run)
+                session.commit()
+            finally:
+                session.close()
+
+    def _release(self, run_id: int):
+        """Gives up the lease so the next start resumes this run right away."""
+        with self._lock:
+            session = next(get_session())
+            try:
+                session.execute(update(MonitorRun).where(MonitorRun.id == run_id).values(heartbeat_at=None))
+                session.commit()
+            finally:
+                session.close()
+
+    def _finish(self, run_id: int, status: str, error: Optional[str] = None):
+        session = next(get_session())
+        try:
+            run = session.get(MonitorRun, run_id)
+            run.status = status
+            run.finished_at = datetime.utcnow()
+            if error:
+                run.last_error = error[:500]
+            session.add(run)
+            session.commit()
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------
+    # Budgets
+    # ------------------------------------------------------------------
+    def _take_budget(self, remaining: Dict[str, int]) -> List[str]:
+        """Reserves one search on every marketplace that still has budget."""
+        with self._lock:
+            marketplaces = [mp for mp, left in remaining.items() if left > 0]
+            for mp in marketplaces:
+                remaining[mp] -= 1
+            return marketplaces
+
+    # ------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------
+    def _monitor_product(self, run_id: int, product_id: int, remaining: Dict[str, int]) -> bool:
+        """Searches one product. Returns False when no marketplace has budget left."""
+        marketplaces = self._take_budget(remaining)
+        if not marketplaces:
+            return False
+
+        mp_stats: Dict[str, Dict[str, int]] = {mp: {"buscas": 1} for mp in marketplaces}
+
+        def _on_progress(mp, status, count):
+            mp_stats[mp][status] = mp_stats[mp].get(status, 0) + 1
+
+        saved, error = 0, None
+        started = time.monotonic()
+        try:
+            saved = len(competitor_service.search_competitors(
+                product_id, marketplaces, on_progress=_on_progress
+            ))
+        except Exception as e:
+            error = f"produto {product_id}: {e}"
+            print(f"❌ {error}")
+        else:
+            print(f"✅ Produto {product_id}: {saved} anúncios em {time.monotonic() - started:.1f}s")
+        self._record_product(run_id, product_id, saved, error, mp_stats)
+        return True
+
+    def run_once(self) -> Optional[int]:
+        """One full run (new or resumed). Returns the MonitorRun id (None if another worker holds it)."""
+        create_db_and_tables()
+        session = next(get_session())
+        try:
+            run = self._start_or_resume(session)
+            if run is None:
+                return None
+            run_id = run.id
+            done = set(json.loads(run.done_ids))
+            pending = [pid for pid in json.loads(run.queue) if pid not in done]
+        finally:
+            session.close()
+
+        remaining = dict(self.budgets)
+        started = time.monotonic()
+        # Sem "with": o __exit__ do executor esperaria (e rodaria) toda a fila após um Ctrl+C
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="price-monitor")
+        try:
+            futures = [pool.submit(self._monitor_product, run_id, pid, remaining) for pid in pending]
+            skipped = sum(1 for f in as_completed(futures) if not f.result())
+        except KeyboardInterrupt:
+            # Cancela as buscas (pagas) ainda na fila; as que já estão em andamento terminam.
+            # Fica "running": a próxima execução retoma do ponto onde parou
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._release(run_id)
+            print(f"⏸️ Rodada #{run_id} interrompida — será retomada no próximo início")
+            raise
+        except Exception as e:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._finish(run_id, "failed", str(e))
+            print(f"❌ Rodada #{run_id} falhou: {e}")
+            return run_id
+        pool.shutdown()
+
+        if skipped:
+            print(f"💸 Orçamento por marketplace esgotado: {skipped} produtos ficam para a próxima rodada")
+        self._finish(run_id, "done")
+        price_history.prune_if_due()
+        print(f"🏁 Rodada #{run_id} concluída em {time.monotonic() - started:.0f}s")
+        return run_id
+
+    def run_forever(self, interval_minutes: Optional[float] = None):
+        interval = (interval_minutes or Config.MONITOR_INTERVAL_MINUTES) * 60
+        while True:
+            self.run_once()
+            print(f"😴 Próxima rodada em {interval / 60:.0f} min")
+            time.sleep(interval)
+
+
+def get_last_run() -> Optional[MonitorRun]:
+    """Most recent MonitorRun (for the dashboard, read-only)."""
+    session = next(get_session())
+    try:
+        return session.exec(select(MonitorRun).order_by(MonitorRun.started_at.desc())).first()
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitoramento de preços da concorrência")
+    parser.add_argument("--once", action="store_true", help="Executa uma rodada e sai")
+    parser.add_argument("--interval", type=float, default=None, help="Minutos entre rodadas")
+    parser.add_argument("--max-age-hours", type=float, default=None, help="Só produtos verificados há mais tempo que isso")
+    parser.add_argument("--concurrency", type=int, default=None, help="Produtos buscados em paralelo")
+    args = parser.parse_args()
+
+    monitor = PriceMonitor(max_age_hours=args.max_age_hours, concurrency=args.concurrency)
+    if args.once:
+        monitor.run_once()
+    else:
+        monitor.run_forever(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+ProductAnalyticsService — Sales / COGS / margin per listing and per base product.
+
+Backs the "Meus Anúncios" tab. Everything is computed in one pass instead of
+nested scans on every rerun:
+1. Bill of materials (core/bom.py: listings x inventory items, NumPy) —
+   3 queries, rebuilt only when products / components / inventory change
+2. Sales per product — one grouped SUM over INCOME transactions
+3. COGS per product from the CogsEntry ledger (unit cost snapshotted at
+   sale time — the same source as the Financeiro tab), so a later
+   supplier_price change does not rewrite past margins
+4. Units / kit capacity as vector operations over the BOM, folded
+   into per-base-name groups ("Melatonina - 3x" and "Melatonina - 1x" ->
+   "Melatonina") and per-inventory-item units
+
+Results are immutable dataclasses cached per user and invalidated through
+core/data_version (topics "products", "inventory", "sales").
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlmodel import Session, select, func
+from core.database.engine import get_session
+from core.database.models import Transaction
+from core.bom import BillOfMaterials
+from core.finance_service import FinanceService
+from core import data_version
+
+_KIT_SUFFIX_RE = re.compile(r' - \d+x$')
+
+
+def base_name(title: str) -> str:
+    """Listing title without the kit suffix (" - 3x")."""
+    return _KIT_SUFFIX_RE.sub('', title.strip()).strip()
+
+
+@dataclass(frozen=True)
+class ListingStats:
+    id: int
+    title: str
+    pkgs: int              # kits vendidos
+    stock: int             # kits disponíveis
+    units: int             # potes vendidos (kits x quantidade por kit)
+    cogs: float
+    receita: float
+    lucro: float
+    margem: float          # margem real (%)
+    preco_tabela: float
+    unit_cogs: float
+    potential_margin: float  # margem estimada pelo preço de tabela (%)
+
+
+@dataclass(frozen=True)
+class ProductGroupStats:
+    base_name: str
+    units: int
+    cogs: float
+    receita: float
+    lucro: float
+    variations: Tuple[ListingStats, ...]
+
+    @property
+    def margem(self) -> float:
+        return (self.lucro / self.receita * 100) if self.receita > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class ProductAnalytics:
+    groups: Tuple[ProductGroupStats, ...]
+    units_sold: int = 0    # potes vendidos
+    kits_sold: int = 0     # variantes/kits vendidos
+    cogs: float = 0.0
+    receita: float = 0.0
+    units_by_item: Dict[int, int] = field(default_factory=dict)  # inventory_item_id -> potes vendidos
+
+    @property
+    def lucro(self) -> float:
+        return self.receita - self.cogs
+
+
+@dataclass(frozen=True)
+class PeriodStats:
+    units_sold: int = 0
+    cogs: float = 0.0
+    units_by_item: Dict[int, int] = field(default_factory=dict)
+
+
+class ProductAnalyticsService:
+    _boms: Dict[int, Tuple[tuple, BillOfMaterials]] = {}          # user_id -> (version, bom)
+    _results: Dict[int, Tuple[tuple, ProductAnalytics]] = {}      # user_id -> (version, analytics)
+    _periods: Dict[tuple, Tuple[tuple, PeriodStats]] = {}         # (user_id, start, end) -> (version, stats)
+    MAX_CACHED_PERIODS = 32
+
+    def __init__(self):
+        self.finance_service = FinanceService()
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+    def get_bom(self, user_id: int, session: Optional[Session] = None) -> BillOfMaterials:
+        """Listing x inventory-item matrix, rebuilt only when the catalog changes."""
+        version = data_version.get_version("products", "inventory")
+        cached = ProductAnalyticsService._boms.get(user_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        own_session = session is None
+        if own_session:
+            session = next(get_session())
+        try:
+            bom = BillOfMaterials.load(session, user_id)
+        finally:
+            if own_session:
+                session.close()
+        ProductAnalyticsService._boms[user_id] = (version, bom)
+        return bom
+
+    def _sales_by_product(
+        self,
+        session: Session,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Dict[int, Tuple[float, int]]:
+        """product_id -> (receita, kits vendidos) in one grouped query."""
+        stmt = (
+            select(
+                Transaction.product_id,
+                func.sum(Transaction.amount),
+                func.sum(func.coalesce(Transaction.quantity, 1)),
+            )
+            .where(
+                Transaction.user_id == user_id,
+                Transaction.type == "INCOME",
+                Transaction.product_id.is_not(None),
+            )
+            .group_by(Transaction.product_id)
+        )
+        if start_date:
+            stmt = stmt.where(Transaction.date >= start_date)
+        if end_date:
+            stmt = stmt.where(Transaction.date < end_date)
+        return {
+            product_id: (amount or 0.0, int(quantity or 0))
+            for product_id, amount, quantity in session.exec(stmt).all()
+        }
+
+    def _cogs(
+        self,
+        session: Session,
+        bom: BillOfMaterials,
+        kits: np.ndarray,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """
+        Per-listing COGS from the ledger. Listings with sales but no ledger rows
+        (sold before the ledger existed and not backfilled) fall back to the
+        current kit cost.
+        """
+        ledger = self.finance_service.get_cogs_by_product(session, user_id, start_date, end_date)
+        in_ledger = bom.vector({pid: True for pid in ledger}, dtype=bool)
+        ledger_cogs = bom.vector({pid: row["cogs"] for pid, row in ledger.items()}, dtype=float)
+        return np.where(in_ledger, ledger_cogs, bom.cogs_per_product(kits))
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get_analytics(self, user_id: int) -> ProductAnalytics:
+        """All-time stats per listing, per base name and per inventory item (cached)."""
+        version = data_version.get_version("products", "inventory", "sales")
+        cached = ProductAnalyticsService._results.get(user_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        session = next(get_session())
+        try:
+            bom = self.get_bom(user_id, session)
+            sales = self._sales_by_product(session, user_id)
+            kits = bom.vector({pid: qty for pid, (_, qty) in sales.items()})
+            cogs = self._cogs(session, bom, kits, user_id)
+        finally:
+            session.close()
+
+        receita = bom.vector({pid: amount for pid, (amount, _) in sales.items()}, dtype=float)
+        units = bom.units_per_product(kits)
+        lucro = receita - cogs
+        margem = np.divide(lucro * 100, receita, out=np.zeros(len(bom)), where=receita > 0)
+        potential_margin = np.divide(
+            (bom.prices - bom.unit_cogs) * 100, bom.prices, out=np.zeros(len(bom)), where=bom.prices > 0
+        )
+
+        groups: Dict[str, List[ListingStats]] = {}
+        for n, title in enumerate(bom.titles):
+            groups.setdefault(base_name(title), []).append(ListingStats(
+                id=int(bom.product_ids[n]), title=title, pkgs=int(kits[n]), stock=int(bom.capacity[n]),
+                units=int(units[n]), cogs=float(cogs[n]), receita=float(receita[n]), lucro=float(lucro[n]),
+                margem=float(margem[n]), preco_tabela=float(bom.prices[n]),
+                unit_cogs=float(bom.unit_cogs[n]), potential_margin=float(potential_margin[n]),
+            ))
+
+        group_stats = tuple(
+            ProductGroupStats(
+                base_name=name,
+                units=sum(v.units for v in variations),
+                cogs=sum(v.cogs for v in variations),
+                receita=sum(v.receita for v in variations),
+                lucro=sum(v.lucro for v in variations),
+                variations=tuple(variations),
+            )
+            for name, variations in groups.items()
+        )
+        result = ProductAnalytics(
+            groups=group_stats,
+            units_sold=int(units.sum()),
+            kits_sold=int(kits.sum()),
+            cogs=float(cogs.sum()),
+            receita=float(receita.sum()),
+            units_by_item=bom.item_dict(bom.units_per_item(kits)),
+        )
+        ProductAnalyticsService._results[user_id] = (version, result)
+        return result
+
+    def get_period(self, user_id: int, start_date: datetime, end_date: datetime) -> PeriodStats:
+        """Units / COGS sold in [start_date, end_date), total and per inventory item (cached)."""
+        version = data_version.get_version("products", "inventory", "sales")
+        key = (user_id, start_date, end_date)
+        cached = ProductAnalyticsService._periods.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        session = next(get_session())
+        try:
+            bom = self.get_bom(user_id, session)
+            sales = self._sales_by_product(session, user_id, start_date, end_date)
+            kits = bom.vector({pid: qty for pid, (_, qty) in sales.items()})
+            cogs = self._cogs(session, bom, kits, user_id, start_date, end_date)
+        finally:
+            session.close()
+
+        result = PeriodStats(
+            units_sold=int(bom.units_per_product(kits).sum()),
+            cogs=float(cogs.sum()),
+            units_by_item=bom.item_dict(bom.units_per_item(kits)),
+        )
+        if len(ProductAnalyticsService._periods) >= self.MAX_CACHED_PERIODS:
+            ProductAnalyticsService._periods.clear()
+        ProductAnalyticsService._periods[key] = (version, result)
+        return result
+
+
+# Singleton
+product_analytics = ProductAnalyticsService()
@@ -0,0 +1,124 @@
+"""
+ProductMatcher — In-memory fuzzy index over a user's product titles.
+
+Built once per upload batch (and cached until product titles change), so a
+sales export with thousands of lines no longer re-queries every Product and
+runs SequenceMatcher against every title for each line.
+
+Matching pipeline (same semantics as the old linear scan):
+1. Exact hash on the normalized title
+2. Trigram inverted index -> candidates sharing at least one trigram
+3. Containment (one title inside the other) scores CONTAINMENT_SCORE
+4. SequenceMatcher only on the top-k candidates ranked by trigram overlap
+"""
+import heapq
+import threading
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class ProductMatcher:
+    CONTAINMENT_SCORE = 0.85  # High score for containment
+    TOP_K = 15  # Candidates that get a full SequenceMatcher ratio
+
+    def __init__(self, products: Iterable[Tuple[int, str]], threshold: float = 0.55, top_k: int = TOP_K):
+        """products: (product_id, title) pairs, in the order ties should be resolved."""
+        self.threshold = threshold
+        self.top_k = top_k
+        self._ids: List[int] = []
+        self._titles: List[str] = []
+        self._grams: List[Set[str]] = []
+        self._matchers: List[SequenceMatcher] = []
+        self._exact: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._short: List[int] = []  # Titles too short to have trigrams
+        self._lock = threading.Lock()
+
+        for pid, title in products:
+            idx = len(self._ids)
+            clean = self.normalize(title)
+            grams = self._trigrams(clean)
+            self._ids.append(pid)
+            self._titles.append(clean)
+            self._grams.append(grams)
+            # seq2 = título: o SequenceMatcher cacheia a análise de seq2 (b2j)
+            self._matchers.append(SequenceMatcher(None, "", clean))
+            self._exact.setdefault(clean, idx)
+            if grams:
+                for g in grams:
+                    self._postings[g].append(idx)
+            else:
+                self._short.append(idx)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def normalize(text: Optional[str]) -> str:
+        return text.strip().lower() if text else ""
+
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def match(self, product_name: str) -> Optional[int]:
+        """Returns the best matching product_id, or None below the threshold."""
+        clean = self.normalize(product_name)
+        if not clean or not self._ids:
+            return None
+
+        # 1. Exact match first
+        exact = self._exact.get(clean)
+        if exact is not None:
+            return self._ids[exact]
+
+        q_grams = self._trigrams(clean)
+        if q_grams:
+            shared = Counter()
+            for g in q_grams:
+                for idx in self._postings.get(g, ()):
+                    shared[idx] += 1
+            candidates = list(shared.keys()) + self._short
+        else:
+            # Nome curto demais para trigramas: varredura linear (rara e barata)
+            shared = Counter()
+            candidates = range(len(self._ids))
+
+        # 2. Containment — q ⊂ título implica todos os trigramas de q no título
+        #    (e vice-versa), então só esses candidatos precisam do teste `in`
+        scores: Dict[int, float] = {}
+        for idx in candidates:
+            n_shared = shared.get(idx, 0)
+            if q_grams and self._grams[idx] and n_shared != len(q_grams) and n_shared != len(self._grams[idx]):
+                continue
+            title = self._titles[idx]
+            if clean in title or title in clean:
+                scores[idx] = self.CONTAINMENT_SCORE
+
+        # 3. Top-k by trigram overlap (Dice) for the full ratio
+        def _overlap(idx: int) -> Tuple[float, int]:
+            denom = len(q_grams) + len(self._grams[idx])
+            return (2.0 * shared.get(idx, 0) / denom if denom else 0.0, -idx)
+
+        ranked = heapq.nlargest(self.top_k, (i for i in candidates if i not in scores), key=_overlap)
+
+        best_idx, best_ratio = None, 0.0
+        for idx, score in scores.items():
+            if score > best_ratio or (score == best_ratio and idx < best_idx):
+                best_idx, best_ratio = idx, score
+
+        with self._lock:
+            for idx in ranked:
+                sm = self._matchers[idx]
+                sm.set_seq1(clean)
+                # Upper bounds baratos antes do ratio() completo
+                if sm.real_quick_ratio() < best_ratio or sm.quick_ratio() < best_ratio:
+                    continue
+                ratio = sm.ratio()
+                if ratio > best_ratio or (ratio == best_ratio and best_idx is not None and idx < best_idx):
+                    best_idx, best_ratio = idx, ratio
+
+        if best_idx is not None and best_ratio >= self.threshold:
+            return self._ids[best_idx]
+        return None
@@ -0,0 +1,131 @@
+"""
+SalesExportParser — Deterministic parser for marketplace order exports.
+
+Recognizes the Shopee Seller Center order export (PT/EN headers) by its column
+names and parses the WHOLE file with vectorized pandas operations:
+1. Header detection (accent/case-insensitive aliases)
+2. Status filter — keeps completed orders, drops cancelled/returned
+3. BR money cleaning ("R$ 1.234,56" -> 1234.56) and date parsing
+4. Output in the same format the LLM path produces:
+   {"date", "product", "amount", "quantity", "status"}
+
+Unknown layouts — including any file without a status column — return None
+so the caller can fall back to the LLM.
+"""
+import re
+import unicodedata
+from typing import Optional, List, Dict, Any
+import pandas as pd
+
+
+class SalesExportParser:
+    # Aliases in priority order (normalized: lowercase, no accents)
+    COLUMN_ALIASES = {
+        "status": ["status do pedido", "order status", "status"],
+        "date": [
+            "data de criacao do pedido", "order creation date", "data do pedido",
+            "order date", "data da venda", "data", "date",
+        ],
+        "product": ["nome do produto", "product name", "produto", "product"],
+        "quantity": ["quantidade", "quantity", "qtd", "qty"],
+        # Valor da linha (sem frete/taxas)
+        "amount": [
+            "subtotal do produto", "product subtotal", "valor total", "total amount",
+            "valor da venda", "valor", "amount", "total",
+        ],
+        # Preço unitário — usado só quando não há coluna de valor da linha
+        "unit_price": ["preco acordado", "deal price", "preco de venda", "preco unitario", "unit price"],
+    }
+    # Status é obrigatório: sem ele não dá para separar vendas concluídas de
+    # canceladas, e um CSV genérico com "data"/"valor" cai no caminho do LLM
+    REQUIRED = ("date", "product", "status")
+
+    COMPLETED_PATTERN = r"conclu|complet|deliver|entregue"
+    EXCLUDED_PATTERN = r"cancel|devol|reembols|return|refund"
+
+    @staticmethod
+    def _normalize(text: Any) -> str:
+        text = unicodedata.normalize("NFKD", str(text))
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    def detect_columns(self, df: pd.DataFrame) -> Optional[Dict[str, str]]:
+        """Maps field -> column name, or None if the layout is not recognized."""
+        headers = {self._normalize(col): col for col in df.columns}
+        mapping = {}
+        for field, aliases in self.COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in headers and headers[alias] not in mapping.values():
+                    mapping[field] = headers[alias]
+                    break
+
+        if any(field not in mapping for field in self.REQUIRED):
+            return None
+        if "amount" not in mapping and "unit_price" not in mapping:
+            return None
+        return mapping
+
+    @staticmethod
+    def _parse_money(series: pd.Series) -> pd.Series:
+        """Vectorized BR/US money cleaning. Numeric columns pass through."""
+        if pd.api.types.is_numeric_dtype(series):
+            return series.astype(float)
+        text = series.astype(str).str.replace(r"[^\d,.\-]", "", regex=True)
+        # "1.234,56" -> "1234.56" (vírgula decimal); "1234.56" fica como está
+        has_comma = text.str.contains(",", regex=False)
+        # Sem vírgula, ponto seguido de exatamente 3 dígitos é milhar: "1.234" -> "1234"
+        thousands_only = ~has_comma & text.str.fullmatch(r"-?\d{1,3}(?:\.\d{3})+")
+        text = text.where(
+            ~(has_comma | thousands_only),
+            text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        )
+        return pd.to_numeric(text, errors="coerce")
+
+    @staticmethod
+    def _parse_dates(series: pd.Series) -> pd.Series:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        text = series.astype(str).str.strip()
+        iso = text.str.match(r"^\d{4}-\d{2}-\d{2}")
+        parsed = pd.to_datetime(text.where(iso), errors="coerce")
+        # Demais formatos no padrão brasileiro (dd/mm/aaaa)
+        parsed = parsed.fillna(pd.to_datetime(text.where(~iso), errors="coerce", dayfirst=True))
+        return parsed
+
+    def parse(self, df: pd.DataFrame) -> Optional[List[Dict[str, Any]]]:
+        """
+        Parses every row of a recognized export. Returns None for unknown
+        layouts (caller falls back to the LLM).
+        """
+        mapping = self.detect_columns(df)
+        if mapping is None:
+            return None
+
+        out = pd.DataFrame(index=df.index)
+        out["product"] = df[mapping["product"]].astype(str).str.strip()
+        out["date"] = self._parse_dates(df[mapping["date"]])
+
+        if "quantity" in mapping:
+            quantity = pd.to_numeric(df[mapping["quantity"]], errors="coerce").fillna(1)
+            out["quantity"] = quantity.clip(lower=1).astype(int)
+        else:
+            out["quantity"] = 1
+
+        if "amount" in mapping:
+            out["amount"] = self._parse_money(df[mapping["amount"]])
+        else:
+            out["amount"] = self._parse_money(df[mapping["unit_price"]]) * out["quantity"]
+
+        out["status"] = df[mapping["status"]].fillna("").astype(str).str.strip()
+        status = out["status"].map(self._normalize)
+        keep = status.str.contains(self.COMPLETED_PATTERN) & ~status.str.contains(self.EXCLUDED_PATTERN)
+        out = out[keep]
+
+        out = out[
+            out["product"].ne("") & out["product"].str.lower().ne("nan")
+            & out["date"].notna() & out["amount"].notna()
+        ]
+
+        out["date"] = out["date"].dt.strftime("%Y-%m-%d")
+        out["amount"] = out["amount"].round(2)
+        return out[["date", "product", "amount", "quantity", "status"]].to_dict(orient="records")
@@ -2,67 +2,81 @@
 SalesService — Central service that links financial transactions to product inventory.
 
 When a sale (INCOME transaction) is registered, this service:
-1. Matches the product name to existing Products (fuzzy match)
+1. Matches the product name to existing Products (indexed fuzzy match, see ProductMatcher)
 2. Decrements Product.stock
 3. Decrements InventoryItem.stock via ProductComponent multipliers
+4. Writes the COGS ledger (CogsEntry) with a unit-cost snapshot per item
 """
-from difflib import SequenceMatcher
-from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, time
+from typing import Optional, List, Dict, Any, Tuple, Set
+import pandas as pd
 from sqlmodel import Session, select
-from core.database.models import Product, InventoryItem, ProductComponent, Transaction
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
+from core.database.models import Product, InventoryItem, ProductComponent, Transaction, CogsEntry
 from core.database.engine import get_session
+from core.product_matcher import ProductMatcher
+from core import data_version
+from core.events import event_bus, SALES_INGESTED, INVENTORY_CHANGED
 
 
 class SalesService:
     MATCH_THRESHOLD = 0.55  # 55% similarity minimum
+    _matchers: Dict[int, Tuple[tuple, ProductMatcher]] = {}  # user_id -> (version, matcher)
 
-    def match_product(self, product_name: str, user_id: int, session: Session) -> Optional[Product]:
+    def get_matcher(self, user_id: int, session: Session) -> ProductMatcher:
+        """
+        In-memory title index for the user's products, cached per user and
+        rebuilt only when a product title is added, changed or deleted.
+        """
+        version = data_version.get_version("product_titles")
+        cached = SalesService._matchers.get(user_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        rows = session.exec(
+            select(Product.id, Product.title)
+            .where(Product.user_id == user_id)
+            .order_by(Product.id)
+        ).all()
+        matcher = ProductMatcher(rows, threshold=self.MATCH_THRESHOLD)
+        SalesService._matchers[user_id] = (version, matcher)
+        return matcher
+
+    def match_product(
+        self,
+        product_name: str,
+        user_id: int,
+        session: Session,
+        matcher: Optional[ProductMatcher] = None
+    ) -> Optional[Product]:
         """
         Fuzzy-match a product name against all Products in the database.
         Returns the best matching Product or None.
+
+        Pass a prebuilt `matcher` when matching many lines (see process_income_batch).
         """
         if not product_name or not product_name.strip():
             return None
-            
-        products = session.exec(select(Product).where(Product.user_id == user_id)).all()
-        if not products:
+
+        if matcher is None:
+            matcher = self.get_matcher(user_id, session)
+
+        product_id = matcher.match(product_name)
+        if product_id is None:
             return None
-        
-        best_match = None
-        best_ratio = 0.0
-        
-        clean_name = product_name.strip().lower()
-        
-        for product in products:
-            product_title = product.title.strip().lower()
-            
-            # Exact match first
-            if clean_name == product_title:
-                return product
-            
-            # Check if one contains the other
-            if clean_name in product_title or product_title in clean_name:
-                ratio = 0.85  # High score for containment
-            else:
-                ratio = SequenceMatcher(None, clean_name, product_title).ratio()
-            
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_match = product
-        
-        if best_ratio >= self.MATCH_THRESHOLD:
-            return best_match
-        
-        return None
+        return session.get(Product, product_id)
 
     def process_sale(
         self, 
         product: Product, 
         quantity: int, 
-        session: Session
+        session: Session,
+        txn: Optional[Transaction] = None
     ) -> Dict[str, Any]:
         """
         Decrements stock for a matched product and its inventory components.
+        If the sale's Transaction is given, also writes its COGS ledger entries.
         
         Returns dict with details of what was updated.
         """
@@ -83,6 +97,7 @@ class SalesService:
             select(ProductComponent).where(ProductComponent.product_id == product.id)
         ).all()
         
+        cost_lines = []  # (inventory_item_id, units, unit_cost)
         if components:
             for comp in components:
                 inv_item = session.get(InventoryItem, comp.inventory_item_id)
@@ -91,15 +106,176 @@ class SalesService:
                     old_stock = inv_item.stock
                     inv_item.stock = max(inv_item.stock - units_to_deduct, 0)
                     session.add(inv_item)
+                    cost_lines.append((inv_item.id, units_to_deduct, inv_item.supplier_price or 0.0))
                     result["inventory_updates"].append({
+                        "item_id": inv_item.id,
                         "item_name": inv_item.name,
                         "old_stock": old_stock,
                         "new_stock": inv_item.stock,
                         "deducted": units_to_deduct
                     })
+        else:
+            # Produto simples - usar supplier_price do próprio produto
+            cost_lines.append((None, quantity, product.supplier_price or 0.0))
+        
+        # 3. COGS ledger (snapshot do custo no momento da venda)
+        if txn is not None:
+            result["cogs"] = self._record_cogs(txn, product.id, cost_lines, session)
         
         return result
 
+    def _record_cogs(
+        self,
+        txn: Transaction,
+        product_id: int,
+        cost_lines: List[Tuple[Optional[int], int, float]],
+        session: Session
+    ) -> float:
+        """Adds one CogsEntry per cost line. Returns the transaction's total COGS."""
+        total = 0.0
+        for inventory_item_id, units, unit_cost in cost_lines:
+            entry = CogsEntry(
+                transaction=txn,
+                product_id=product_id,
+                inventory_item_id=inventory_item_id,
+                units=units,
+                unit_cost=unit_cost,
+                total_cost=units * unit_cost,
+                date=txn.date,
+                user_id=txn.user_id
+            )
+            session.add(entry)
+            total += entry.total_cost
+        return total
+
+    def sync_cogs_entries(self, txn: Transaction, session: Session):
+        """Keeps ledger rows consistent after a transaction is edited."""
+        if txn.type == "INCOME" and not txn.cogs_entries:
+            # EXPENSE -> INCOME: as linhas foram apagadas na ida, recria como o backfill
+            self._rebuild_cogs(txn, session)
+            return
+        for entry in txn.cogs_entries:
+            if txn.type != "INCOME":
+                session.delete(entry)
+            else:
+                entry.date = txn.date
+                session.add(entry)
+
+    @staticmethod
+    def _cost_lines(
+        product: Product, quantity: int, inventory: Dict[int, InventoryItem]
+    ) -> List[Tuple[Optional[int], int, float]]:
+        """(inventory_item_id, units, unit_cost) for a sale, at the CURRENT supplier prices."""
+        if product.components:
+            return [
+                (comp.inventory_item_id, quantity * (comp.quantity or 1),
+                 inventory[comp.inventory_item_id].supplier_price or 0.0)
+                for comp in product.components
+                if comp.inventory_item_id in inventory
+            ]
+        return [(None, quantity, product.supplier_price or 0.0)]
+
+    def _rebuild_cogs(self, txn: Transaction, session: Session) -> float:
+        """Ledger entries for one sale without any (same rules as backfill_cogs). Does not commit."""
+        if not txn.product_id or not txn.quantity:
+            return 0.0
+        product = session.exec(
+            select(Product).options(selectinload(Product.components)).where(Product.id == txn.product_id)
+        ).first()
+        if not product:
+            return 0.0
+        item_ids = [comp.inventory_item_id for comp in product.components]
+        inventory = {
+            i.id: i for i in session.exec(select(InventoryItem).where(InventoryItem.id.in_(item_ids))).all()
+        } if item_ids else {}
+        return self._record_cogs(txn, product.id, self._cost_lines(product, txn.quantity, inventory), session)
+
+    def backfill_cogs(self, session: Session, user_id: Optional[int] = None) -> int:
+        """
+        Creates ledger entries for INCOME transactions that have none yet,
+        using the CURRENT supplier prices (no historical snapshot exists).
+        Returns the number of transactions backfilled.
+        """
+        filters = [
+            Transaction.type == "INCOME",
+            Transaction.product_id.isnot(None),
+            CogsEntry.id.is_(None)
+        ]
+        if user_id is not None:
+            filters.append(Transaction.user_id == user_id)
+        pending = session.exec(
+            select(Transaction)
+            .outerjoin(CogsEntry, CogsEntry.transaction_id == Transaction.id)
+            .where(*filters)
+        ).all()
+        if not pending:
+            return 0
+
+        # Indexes em memória: 1 query para produtos+componentes, 1 para inventário
+        products = {
+            p.id: p for p in session.exec(
+                select(Product).options(selectinload(Product.components))
+            ).all()
+        }
+        inventory = {i.id: i for i in session.exec(select(InventoryItem)).all()}
+
+        count = 0
+        for txn in pending:
+            product = products.get(txn.product_id)
+            if not product or not txn.quantity:
+                continue
+            self._record_cogs(txn, product.id, self._cost_lines(product, txn.quantity, inventory), session)
+            count += 1
+
+        session.commit()
+        return count
+
+    @staticmethod
+    def _to_datetime(date) -> Optional[datetime]:
+        """Normalizes upload dates (str / Timestamp / datetime) — None if empty."""
+        if date is None or date == "":
+            return None
+        parsed = pd.to_datetime(date)
+        if pd.isna(parsed):
+            return None
+        return parsed.to_pydatetime() if hasattr(parsed, "to_pydatetime") else parsed
+
+    @staticmethod
+    def _dedup_key(date: Optional[datetime], description: str, amount: float) -> Tuple:
+        """(day, description, amount in cents) — the identity of a sale line."""
+        day = date.date() if date is not None else None
+        return (day, description, round(float(amount or 0.0), 2))
+
+    def load_duplicate_keys(
+        self,
+        dates: List[Optional[datetime]],
+        user_id: int,
+        session: Session
+    ) -> Set[Tuple]:
+        """
+        Pre-loads the dedup keys of every INCOME transaction in the batch's date
+        range with ONE query (served by ix_transaction_dedup).
+        """
+        days = [d for d in dates if d is not None]
+        conditions = []
+        if days:
+            start = datetime.combine(min(days).date(), time.min)
+            end = datetime.combine(max(days).date(), time.max)
+            conditions.append(and_(Transaction.date >= start, Transaction.date <= end))
+        if len(days) < len(dates):
+            conditions.append(Transaction.date.is_(None))
+        if not conditions:
+            return set()
+
+        rows = session.exec(
+            select(Transaction.date, Transaction.description, Transaction.amount).where(
+                Transaction.user_id == user_id,
+                Transaction.type == "INCOME",
+                or_(*conditions)
+            )
+        ).all()
+        return {self._dedup_key(d, desc, amt) for d, desc, amt in rows}
+
     def check_duplicate(
         self, 
         date, 
@@ -111,42 +287,12 @@ class SalesService:
         """
         Check if a transaction with the same date, description, and amount already exists.
         Returns True if duplicate found.
+
+        Single-line check; batches should use load_duplicate_keys() instead.
         """
-        import pandas as pd
-        from datetime import datetime
-        
-        # Normalize date
-        if isinstance(date, str):
-            date = pd.to_datetime(date)
-        
-        existing = session.exec(
-            select(Transaction).where(
-                Transaction.user_id == user_id,
-                Transaction.description == description,
-                Transaction.amount == amount,
-                Transaction.type == "INCOME"
-            )
-        ).all()
-        
-        if not existing:
-            return False
-        
-        # Check if any existing transaction has the same date (day-level)
-        for txn in existing:
-            txn_date = txn.date
-            if isinstance(txn_date, datetime):
-                txn_date = txn_date.date()
-            
-            check_date = date
-            if isinstance(check_date, datetime):
-                check_date = check_date.date()
-            elif hasattr(check_date, 'date'):
-                check_date = check_date.date()
-                
-            if txn_date == check_date:
-                return True
-        
-        return False
+        date = self._to_datetime(date)
+        keys = self.load_duplicate_keys([date], user_id, session)
+        return self._dedup_key(date, description, amount) in keys
 
     def process_income_batch(
         self,
@@ -167,25 +313,33 @@ class SalesService:
         matched = []
         unmatched = []
         duplicated = []
+
+        # Índice de títulos montado uma vez por lote
+        matcher = self.get_matcher(user_id, session)
+
+        # Datas normalizadas uma vez; chaves já existentes carregadas numa única query
+        parsed_dates = [self._to_datetime(sale.get("date")) for sale in sales_data]
+        seen_keys = self.load_duplicate_keys(parsed_dates, user_id, session)
         
-        for sale in sales_data:
+        for sale, parsed_date in zip(sales_data, parsed_dates):
             description = sale.get("product", sale.get("description", "Venda"))
             amount = float(sale.get("amount", 0))
             quantity = int(sale.get("quantity", 1))
             date = sale.get("date")
             
-            # 1. Check duplicates
-            if self.check_duplicate(date, description, amount, user_id, session):
+            # 1. Check duplicates (no banco ou repetida no próprio arquivo)
+            key = self._dedup_key(parsed_date, description, amount)
+            if key in seen_keys:
                 duplicated.append({"description": description, "amount": amount, "date": str(date)})
                 continue
+            seen_keys.add(key)
             
             # 2. Match product
-            product = self.match_product(description, user_id, session)
+            product = self.match_product(description, user_id, session, matcher=matcher)
             
             # 3. Create transaction
-            import pandas as pd
             txn = Transaction(
-                date=pd.to_datetime(date) if date else None,
+                date=parsed_date,
                 type="INCOME",
                 category="Sale",
                 description=description,
@@ -196,9 +350,9 @@ class SalesService:
             )
             session.add(txn)
             
-            # 4. Update stock if matched
+            # 4. Update stock (and COGS ledger) if matched
             if product:
-                stock_result = self.process_sale(product, quantity, session)
+                stock_result = self.process_sale(product, quantity, session, txn=txn)
                 matched.append({
                     "description": description,
                     "amount": amount,
@@ -214,6 +368,16 @@ class SalesService:
                 })
         
         session.commit()
+        session.close()
+
+        if matched or unmatched:
+            event_bus.publish(
+                SALES_INGESTED, user_id=user_id,
+                product_ids=sorted({m["product_id"] for m in matched}),
+            )
+        item_ids = sorted({u["item_id"] for m in matched for u in m["inventory_updates"]})
+        if item_ids:
+            event_bus.publish(INVENTORY_CHANGED, user_id=user_id, item_ids=item_ids)
         
         return {
             "success": True,
@@ -7,25 +7,49 @@ tarefas acionaveis baseadas no estado real dos dados:
   - Estoque baixo
   - Dados de concorrencia desatualizados
   - Fim de mes (relatorio pendente)
+
+As regras rodam por EVENTOS (core/events.py), so para as entidades afetadas:
+  - SALES_INGESTED     -> resolve a tarefa de upload de vendas
+  - INVENTORY_CHANGED  -> avalia estoque minimo so dos itens alterados
+  - COMPETITORS_SAVED  -> reavalia a concorrencia do produto (busca, mesmo sem resultados, ou limpeza)
+  - PRODUCTS_ADDED     -> produtos novos ganham a tarefa de primeira varredura
+  - DAILY_TICK         -> regras de tempo (uploads/concorrencia atrasados, fim de mes)
+Renderizar a tab de tarefas e so leitura indexada.
 """
 
-from datetime import datetime, timedelta
-from typing import List, Optional
-from sqlmodel import Session, select, func
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import update
+from sqlmodel import Session, select, func, or_
+from core.database.engine import get_session
 from core.database.models import Task, Transaction, InventoryItem, CompetitorListing, Product
+from core.events import (
+    event_bus, SALES_INGESTED, INVENTORY_CHANGED, COMPETITORS_SAVED, PRODUCTS_ADDED, DAILY_TICK
+)
 
 
 class TaskEngine:
     """Engine that scans DB state and generates/updates practical tasks."""
 
+    _last_daily_scan: Dict[int, date] = {}  # user_id -> dia (UTC) do ultimo DAILY_TICK bem-sucedido neste processo
+    _daily_running: Set[int] = set()
+    _daily_lock = threading.Lock()
+
     @staticmethod
     def scan_and_generate(session: Session, user_id: int) -> List[Task]:
-        """Run all checks and return newly created tasks."""
+        """Run all checks and return newly created tasks.
+
+        Dedup uses Task.dedup_key: the pending keys are loaded once and each
+        check skips keys already present, so a scan costs a fixed number of
+        queries regardless of catalog size.
+        """
+        existing = TaskEngine._pending_keys(session, user_id)
         new_tasks: List[Task] = []
-        new_tasks.extend(TaskEngine._check_sales_upload(session, user_id))
-        new_tasks.extend(TaskEngine._check_inventory(session, user_id))
-        new_tasks.extend(TaskEngine._check_competitors(session, user_id))
-        new_tasks.extend(TaskEngine._check_end_of_month(session, user_id))
+        new_tasks.extend(TaskEngine._check_sales_upload(session, user_id, existing))
+        new_tasks.extend(TaskEngine._check_inventory(session, user_id, existing))
+        new_tasks.extend(TaskEngine._check_competitors(session, user_id, existing))
+        new_tasks.extend(TaskEngine._check_end_of_month(session, user_id, existing))
         if new_tasks:
             for t in new_tasks:
                 session.add(t)
@@ -75,102 +99,253 @@ class TaskEngine:
         return result or 0
 
     @staticmethod
-    def _task_exists(session: Session, user_id: int, title_contains: str) -> bool:
-        """Check if a pending task with similar title already exists."""
-        stmt = (
-            select(Task)
-            .where(
+    def _pending_keys(session: Session, user_id: int) -> Set[str]:
+        """dedup_key of every pending task (one indexed query)."""
+        return set(session.exec(
+            select(Task.dedup_key).where(
                 Task.user_id == user_id,
                 Task.is_completed == False,
-                Task.title.like(f"%{title_contains}%"),
+                Task.dedup_key.is_not(None),
             )
-        )
-        return session.exec(stmt).first() is not None
+        ).all())
 
     @staticmethod
-    def _check_sales_upload(session: Session, user_id: int) -> List[Task]:
+    def _claim(existing: Set[str], key: str) -> bool:
+        """True if no pending task has this key yet (and reserves it for this scan)."""
+        if key in existing:
+            return False
+        existing.add(key)
+        return True
+
+    @staticmethod
+    def _check_sales_upload(session: Session, user_id: int, existing: Set[str]) -> List[Task]:
         """Check if last upload was > 7 days ago."""
         last_date = session.exec(
             select(func.max(Transaction.date))
             .where(Transaction.user_id == user_id)
         ).one()
         if last_date is None:
-            if not TaskEngine._task_exists(session, user_id, "Upload"):
+            if TaskEngine._claim(existing, "sales_upload"):
                 return [Task(
                     title="\U0001f4e4 Primeiro upload de vendas",
                     description="Nenhuma venda registrada. Faca upload da planilha do Seller Center.",
                     category="vendas", priority=1, target_tab="financeiro", user_id=user_id,
+                    dedup_key="sales_upload",
                 )]
             return []
         days_since = (datetime.utcnow() - last_date).days
         if days_since >= 7:
-            if not TaskEngine._task_exists(session, user_id, "Upload"):
+            if TaskEngine._claim(existing, "sales_upload"):
                 return [Task(
                     title="\U0001f4e4 Upload de vendas pendente",
                     description=f"Ultimo upload ha **{days_since} dias**. Faca upload da planilha mais recente.",
                     category="vendas", priority=2, target_tab="financeiro", user_id=user_id,
+                    dedup_key="sales_upload",
                 )]
         return []
 
     @staticmethod
-    def _check_inventory(session: Session, user_id: int) -> List[Task]:
-        """Check for items below minimum stock."""
+    def _check_inventory(
+        session: Session, user_id: int, existing: Set[str], item_ids: Optional[Iterable[int]] = None
+    ) -> List[Task]:
+        """Check for items below minimum stock (only `item_ids`, if given)."""
         stmt = select(InventoryItem).where(
             InventoryItem.user_id == user_id,
             InventoryItem.stock < InventoryItem.min_stock,
         )
+        if item_ids is not None:
+            stmt = stmt.where(InventoryItem.id.in_(list(item_ids)))
         new_tasks = []
         for item in session.exec(stmt).all():
-            if not TaskEngine._task_exists(session, user_id, item.name[:30]):
+            key = f"restock:{item.id}"
+            if TaskEngine._claim(existing, key):
                 urgency = 2 if item.stock <= item.min_stock // 2 else 3
                 new_tasks.append(Task(
                     title=f"\U0001f4e6 Repor estoque: {item.name}",
                     description=f"**Estoque atual:** {item.stock} un. | **Minimo:** {item.min_stock} un.",
                     category="estoque", priority=urgency, target_tab="anuncios", user_id=user_id,
+                    dedup_key=key,
                 ))
         return new_tasks
 
     @staticmethod
-    def _check_competitors(session: Session, user_id: int) -> List[Task]:
-        """Check for products without recent competitor data."""
-        products = list(session.exec(
-            select(Product).where(Product.user_id == user_id)
-        ).all())
+    def _check_competitors(
+        session: Session, user_id: int, existing: Set[str], product_ids: Optional[Iterable[int]] = None
+    ) -> List[Task]:
+        """Check for products without recent competitor data (only `product_ids`, if given).
+
+        One grouped LEFT JOIN (covered by ix_competitorlisting_product_checked)
+        returns only the products never searched or stale for 5+ days. A search
+        that found nothing still counts (Product.competitors_searched_at).
+        """
         five_days_ago = datetime.utcnow() - timedelta(days=5)
+        # Mesma regra de CompetitorService.last_searched_expr (sem importar os scrapers aqui)
+        latest_check = func.coalesce(Product.competitors_searched_at, func.max(CompetitorListing.last_checked_at))
+        stmt = (
+            select(Product.id, Product.title, latest_check)
+            .outerjoin(CompetitorListing, CompetitorListing.product_id == Product.id)
+            .where(Product.user_id == user_id)
+            .group_by(Product.id, Product.title, Product.competitors_searched_at)
+            .having(or_(latest_check.is_(None), latest_check < five_days_ago))
+        )
+        if product_ids is not None:
+            stmt = stmt.where(Product.id.in_(list(product_ids)))
+        stale = session.exec(stmt).all()
+
         new_tasks = []
-        for product in products:
-            latest_check = session.exec(
-                select(func.max(CompetitorListing.last_checked_at))
-                .where(CompetitorListing.product_id == product.id)
-            ).one()
-            short = product.title[:50]
-            if latest_check is None:
-                if not TaskEngine._task_exists(session, user_id, "Concorrencia"):
+        for product_id, title, last_checked in stale:
+            short = title[:50]
+            if last_checked is None:
+                key = f"competitor_missing:{product_id}"
+                if TaskEngine._claim(existing, key):
                     new_tasks.append(Task(
                         title=f"\U0001f50d Concorrencia: {short}",
                         description="Produto sem dados de concorrencia. Faca a primeira varredura de precos.",
                         category="concorrencia", priority=1, target_tab="concorrencia", user_id=user_id,
+                        dedup_key=key,
                     ))
-            elif latest_check < five_days_ago:
-                if not TaskEngine._task_exists(session, user_id, "Atualizar concorrencia"):
-                    days_stale = (datetime.utcnow() - latest_check).days
+            else:
+                key = f"competitor_stale:{product_id}"
+                if TaskEngine._claim(existing, key):
+                    days_stale = (datetime.utcnow() - last_checked).days
                     new_tasks.append(Task(
                         title=f"\U0001f50d Atualizar concorrencia: {short}",
                         description=f"Dados desatualizados ha **{days_stale} dias**. Verifique os precos.",
                         category="concorrencia", priority=3, target_tab="concorrencia", user_id=user_id,
+                        dedup_key=key,
                     ))
         return new_tasks
 
     @staticmethod
-    def _check_end_of_month(session: Session, user_id: int) -> List[Task]:
+    def _check_end_of_month(session: Session, user_id: int, existing: Set[str]) -> List[Task]:
         """Check if month-end report is needed."""
         now = datetime.utcnow()
         if now.day < 26:
             return []
-        if TaskEngine._task_exists(session, user_id, "Relatorio Mensal"):
+        key = f"monthly_report:{now.strftime('%Y-%m')}"
+        if not TaskEngine._claim(existing, key):
             return []
         return [Task(
             title="\U0001f4ca Relatorio mensal pendente",
             description=f"Fim de mes chegando ({now.day}/{(now.month % 12) + 1}). Gere o relatorio mensal.",
             category="relatorio", priority=3, target_tab="resumo", user_id=user_id,
+            dedup_key=key,
         )]
+
+    # ------------------------------------------------------------------
+    # Event handlers (core/events.py)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _resolve(session: Session, user_id: int, keys: Iterable[str]) -> int:
+        """Completes pending tasks whose condition no longer holds."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        result = session.execute(
+            update(Task)
+            .where(Task.user_id == user_id, Task.is_completed == False, Task.dedup_key.in_(keys))
+            .values(is_completed=True, completed_at=datetime.utcnow())
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def run_daily(user_id: int) -> bool:
+        """
+        Publishes DAILY_TICK once per UTC day per user (called on every render, cheap).
+        The day only counts as done when every handler succeeded; otherwise the
+        next render tries again.
+        """
+        today = datetime.utcnow().date()
+        with TaskEngine._daily_lock:
+            if TaskEngine._last_daily_scan.get(user_id) == today or user_id in TaskEngine._daily_running:
+                return False
+            TaskEngine._daily_running.add(user_id)
+        succeeded = False
+        try:
+            ok = event_bus.publish(DAILY_TICK, user_id=user_id)
+            succeeded = ok == event_bus.handler_count(DAILY_TICK)
+        finally:
+            with TaskEngine._daily_lock:
+                TaskEngine._daily_running.discard(user_id)
+                if succeeded:
+                    TaskEngine._last_daily_scan[user_id] = today
+        return succeeded
+
+    @staticmethod
+    def on_daily_tick(user_id: int):
+        """Time-based rules: only a clock can make data 'stale'."""
+        session = next(get_session())
+        try:
+            TaskEngine.scan_and_generate(session, user_id)
+        finally:
+            session.close()
+
+    @staticmethod
+    def on_sales_ingested(user_id: int, product_ids: Optional[Iterable[int]] = None):
+        session = next(get_session())
+        try:
+            if TaskEngine._resolve(session, user_id, ["sales_upload"]):
+                session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def on_inventory_changed(user_id: int, item_ids: Iterable[int]):
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        session = next(get_session())
+        try:
+            existing = TaskEngine._pending_keys(session, user_id)
+            for task in TaskEngine._check_inventory(session, user_id, existing, item_ids):
+                session.add(task)
+            restocked = session.exec(
+                select(InventoryItem.id).where(
+                    InventoryItem.id.in_(item_ids),
+                    InventoryItem.stock >= InventoryItem.min_stock,
+                )
+            ).all()
+            TaskEngine._resolve(session, user_id, [f"restock:{item_id}" for item_id in restocked])
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def _reevaluate_competitors(user_id: int, product_ids: Iterable[int]):
+        """Completes the competitor tasks of these products that are no longer due and raises the new ones."""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        session = next(get_session())
+        try:
+            due = TaskEngine._check_competitors(session, user_id, set(), product_ids)
+            due_keys = {task.dedup_key for task in due}
+            keys = [f"{kind}:{pid}" for pid in product_ids for kind in ("competitor_missing", "competitor_stale")]
+            TaskEngine._resolve(session, user_id, [k for k in keys if k not in due_keys])
+            existing = TaskEngine._pending_keys(session, user_id)
+            for task in due:
+                if TaskEngine._claim(existing, task.dedup_key):
+                    session.add(task)
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def on_competitors_saved(user_id: int, product_id: int):
+        TaskEngine._reevaluate_competitors(user_id, [product_id])
+
+    @staticmethod
+    def on_products_added(user_id: int, product_ids: Iterable[int]):
+        TaskEngine._reevaluate_competitors(user_id, product_ids)
+
+    @staticmethod
+    def subscribe():
+        event_bus.subscribe(DAILY_TICK, TaskEngine.on_daily_tick)
+        event_bus.subscribe(SALES_INGESTED, TaskEngine.on_sales_ingested)
+        event_bus.subscribe(INVENTORY_CHANGED, TaskEngine.on_inventory_changed)
+        event_bus.subscribe(COMPETITORS_SAVED, TaskEngine.on_competitors_saved)
+        event_bus.subscribe(PRODUCTS_ADDED, TaskEngine.on_products_added)
+
+
+# Regras de tarefas ligadas ao barramento assim que o engine é importado
+TaskEngine.subscribe()
@@ -165,6 +165,9 @@ def render_sidebar(user):
             unsafe_allow_html=True,
         )
 
+        # Regras de tempo das tarefas: uma vez por dia (o resto vem por eventos)
+        TaskEngine.run_daily(user.id)
+
         # Show pending task count in sidebar
         _session = next(get_session())
         _pending_count = TaskEngine.count_pending(_session, user.id)
@@ -2,7 +2,10 @@ import re
 
 import streamlit as st
 import pandas as pd
+import plotly.express as px
+from core.config import Config
 from core.competitor_service import competitor_service, MARKETPLACES, MARKETPLACE_LABELS
+from core.price_monitor import get_last_run
 from agents.product_agent import ProductAgent
 
 
@@ -37,18 +40,47 @@ def render_competitor_page(user_id: int):
         format_func=lambda x: re.sub(r':material/\w+:\s*', '', MARKETPLACE_LABELS.get(x, x)),
     )
 
+    bypass_cache = st.checkbox(
+        "Ignorar cache (buscar dados novos)", value=False,
+        help="Buscas repetidas nas últimas horas vêm do cache local, sem gastar créditos de API."
+    )
+
+    last_run = get_last_run()
+    if last_run:
+        run_status = {"running": "em andamento", "done": "concluída", "failed": "falhou"}.get(last_run.status, last_run.status)
+        st.caption(
+            f":material/schedule: Monitor automático: última rodada {last_run.started_at.strftime('%d/%m/%Y %H:%M')} "
+            f"({run_status}, {last_run.products_done}/{last_run.products_total} produtos)"
+        )
+    else:
+        st.caption(":material/schedule: Monitor automático inativo — rode `python -m core.price_monitor` para atualizar os preços em segundo plano.")
+
     if search_clicked:
         if not search_keyword.strip():
             st.warning("Insira um termo de busca.")
         elif not marketplaces_sel:
             st.warning("Selecione pelo menos um marketplace.")
         else:
-            with st.spinner("Buscando preços nos marketplaces... Isso pode levar alguns minutos."):
-                status_placeholder = st.empty()
-                for mp in marketplaces_sel:
-                    status_placeholder.info(f":material/search: Buscando em {MARKETPLACE_LABELS.get(mp, mp)}...")
-                results = competitor_service.search_competitors(selected_product_id, marketplaces_sel, keyword=search_keyword.strip())
-                status_placeholder.empty()
+            with st.status("Buscando preços nos marketplaces...", expanded=True) as search_status:
+                done = []
+
+                # Atualiza a tela conforme cada loja responde (busca em paralelo)
+                def _on_progress(mp, status, count):
+                    label = re.sub(r':material/\w+:\s*', '', MARKETPLACE_LABELS.get(mp, mp))
+                    if status == "ok":
+                        st.write(f":material/check_circle: {label}: {count} resultados")
+                    elif status == "timeout":
+                        st.write(f":material/timer_off: {label}: tempo esgotado")
+                    else:
+                        st.write(f":material/error: {label}: erro na busca")
+                    done.append(mp)
+                    search_status.update(label=f"Buscando preços... {len(done)}/{len(marketplaces_sel)} lojas")
+
+                results = competitor_service.search_competitors(
+                    selected_product_id, marketplaces_sel, keyword=search_keyword.strip(), on_progress=_on_progress,
+                    use_cache=not bypass_cache
+                )
+                search_status.update(label="Busca concluída", state="complete", expanded=False)
                 if results:
                     st.success(f"{len(results)} resultados encontrados!", icon=":material/check_circle:")
                 else:
@@ -101,6 +133,36 @@ def render_competitor_page(user_id: int):
             df = pd.DataFrame(table_data)
             st.dataframe(df, use_container_width=True, hide_index=True)
 
+        # Tendência: lê só os rollups diários (uma consulta indexada)
+        trend = competitor_service.get_price_trend(selected_product_id)
+        if trend:
+            st.divider()
+            st.markdown(f'<div class="card-title"><span class="material-symbols-rounded">show_chart</span> Tendência de Preços ({Config.PRICE_TREND_DAYS} dias)</div>', unsafe_allow_html=True)
+            trend_df = pd.DataFrame(trend)
+            trend_df["Marketplace"] = trend_df["marketplace"].map(
+                lambda mp: re.sub(r':material/\w+:\s*', '', MARKETPLACE_LABELS.get(mp, mp))
+            )
+            fig_trend = px.line(
+                trend_df, x="day", y="avg_price", color="Marketplace", markers=True,
+                hover_data={"min_price": ":.2f", "max_price": ":.2f", "samples": True, "avg_price": ":.2f", "day": False},
+                labels={"avg_price": "Média", "min_price": "Mínimo", "max_price": "Máximo", "samples": "Amostras"},
+                height=320,
+            )
+            if our_price > 0:
+                fig_trend.add_hline(y=our_price, line_dash="dash", line_color="#818CF8",
+                                    annotation_text="Nosso preço", annotation_font_color="#94A3B8")
+            fig_trend.update_layout(
+                margin=dict(l=0, r=0, t=10, b=0),
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='#94A3B8', size=11),
+                hovermode='x unified',
+                legend_title_text='',
+            )
+            fig_trend.update_xaxes(gridcolor='#334155', title_text='')
+            fig_trend.update_yaxes(gridcolor='#334155', title_text='', tickprefix='R$')
+            st.plotly_chart(fig_trend, use_container_width=True)
+
         st.divider()
         st.markdown('<div class="card-title"><span class="material-symbols-rounded">check_circle</span> Confirmar Matches</div>', unsafe_allow_html=True)
 
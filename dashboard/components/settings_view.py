@@ -104,6 +104,25 @@ def render_settings_page():
         with st.expander("Ver detalhes da resposta"):
             st.code(st.session_state.last_test_response)
 
+    # 5. Provider health (cadeia de fallback + circuit breaker)
+    st.divider()
+    st.subheader("Saúde dos Provedores")
+    st.caption("Ordem de uso: provedor selecionado primeiro, depois os demais configurados. "
+               "Um provedor com falhas seguidas fica em pausa (circuito aberto) por alguns segundos.")
+    state_labels = {"ok": "🟢 ok", "meio-aberto": "🟡 em teste", "aberto": "🔴 em pausa"}
+    health_rows = []
+    for row in llm_client.get_provider_stats():
+        health_rows.append({
+            "Provedor": row["provider"],
+            "Configurado": "Sim" if row["configured"] else "Não",
+            "Estado": state_labels.get(row["state"], row["state"]),
+            "Chamadas": row["calls"],
+            "Sucesso (%)": f"{row['success_rate']:.0f}" if row["success_rate"] is not None else "—",
+            "Latência média (ms)": f"{row['avg_latency_ms']:.0f}" if row["avg_latency_ms"] is not None else "—",
+            "Último erro": row["last_error"] or "",
+        })
+    st.dataframe(health_rows, use_container_width=True, hide_index=True)
+
     # ── Admin / Dev Tools (moved from sidebar) ──
     st.divider()
     with st.expander(":material/build: Ferramentas de Admin / Dev"):
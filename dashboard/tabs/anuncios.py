@@ -6,7 +6,7 @@ import streamlit as st
 import pandas as pd
 import re
 from core.config import Config
-from core.database.engine import get_session
+from core.product_analytics import product_analytics
 from dashboard.components.metric_card import metric_card
 
 
@@ -21,102 +21,13 @@ def render(user, agents):
     products = product_agent.get_all_products(user.id)
     inventory_items = product_agent.get_all_inventory_items(user.id)
 
-    # -- LÓGICA DE AGREGAÇÃO UNIFICADA --
-    total_potes_vendidos = 0
-    total_cogs_vendas = 0.0
-    total_variantes_vendidas = 0
-    total_receita_real = 0.0  # Receita real (valor recebido após taxas/cupons)
-    product_groups = {}
-    vendidos_por_item = {item.id: 0 for item in inventory_items} if inventory_items else {}
-
-    # Carregar receitas (INCOME) vinculadas a produtos para calcular receita real
-    from core.database.models import Transaction
-    from sqlmodel import select
-    session_txn = next(get_session())
-    income_transactions = session_txn.exec(
-        select(Transaction).where(
-            Transaction.user_id == user.id,
-            Transaction.type == "INCOME"
-        )
-    ).all()
-
-    # Mapa: product_id -> soma de receita e soma de quantidade vendida
-    receita_por_produto = {}
-    vendas_por_produto = {}
-    for txn in income_transactions:
-        if txn.product_id:
-            receita_por_produto[txn.product_id] = receita_por_produto.get(txn.product_id, 0.0) + txn.amount
-            vendas_por_produto[txn.product_id] = vendas_por_produto.get(txn.product_id, 0) + (txn.quantity or 1)
-
-
-    if products:
-        for p in products:
-            base_name = re.sub(r' - \d+x$', '', p.title.strip()).strip()
-
-            # Quantidade vendida agora vem das transações
-            pkgs_sold = vendas_por_produto.get(p.id, 0)
-
-            total_variantes_vendidas += pkgs_sold
-            ad_potes_sold = 0
-            ad_cogs = 0.0
-            ad_stock_kits = 0
-            unit_cogs = 0.0
-
-            if hasattr(p, 'components') and p.components:
-                # O estoque do kit é limitado pelo item físico com menor disponibilidade proporcional
-                kit_capacity = []
-                for comp in p.components:
-                    inv_item = next((i for i in inventory_items if i.id == comp.inventory_item_id), None)
-                    if inv_item:
-                        qty_per_kit = comp.quantity or 1
-                        item_units_sold = pkgs_sold * qty_per_kit
-                        item_cogs = item_units_sold * (inv_item.supplier_price or 0.0)
-
-                        ad_potes_sold += item_units_sold
-                        ad_cogs += item_cogs
-                        unit_cogs += qty_per_kit * (inv_item.supplier_price or 0.0)
-
-                        # Calcular capacidade baseada no estoque físico atual
-                        kit_capacity.append(inv_item.stock // qty_per_kit)
-
-                        if comp.inventory_item_id in vendidos_por_item:
-                            vendidos_por_item[comp.inventory_item_id] += item_units_sold
-
-                ad_stock_kits = min(kit_capacity) if kit_capacity else 0
-            else:
-                # Fallback caso não tenha componentes mapeados
-                ad_potes_sold = pkgs_sold
-                ad_cogs = pkgs_sold * (p.supplier_price or 0.0)
-                unit_cogs = p.supplier_price or 0.0
-                ad_stock_kits = p.stock
-
-            # Receita real deste produto (do financeiro)
-            ad_receita = receita_por_produto.get(p.id, 0.0)
-            ad_lucro = ad_receita - ad_cogs
-            ad_margem = (ad_lucro / ad_receita * 100) if ad_receita > 0 else 0.0
-
-            # Margem Estimada baseada no preço de tabela e custo unitário
-            potential_profit = (p.price or 0.0) - unit_cogs
-            potential_margin = (potential_profit / p.price * 100) if p.price and p.price > 0 else 0.0
-
-
-            if base_name not in product_groups:
-                product_groups[base_name] = {"units": 0, "cogs": 0.0, "receita": 0.0, "lucro": 0.0, "variations": []}
-
-            product_groups[base_name]["units"] += ad_potes_sold
-            product_groups[base_name]["cogs"] += ad_cogs
-            product_groups[base_name]["receita"] += ad_receita
-            product_groups[base_name]["lucro"] += ad_lucro
-            product_groups[base_name]["variations"].append({
-                "id": p.id, "title": p.title, "pkgs": pkgs_sold, "stock": ad_stock_kits, 
-                "units": ad_potes_sold, "cogs": ad_cogs, "receita": ad_receita,
-                "lucro": ad_lucro, "margem": ad_margem, "preco_tabela": p.price,
-                "unit_cogs": unit_cogs, "potential_margin": potential_margin
-            })
-
-            total_potes_vendidos += ad_potes_sold
-            total_cogs_vendas += ad_cogs
-            total_receita_real += ad_receita
+    # -- LÓGICA DE AGREGAÇÃO UNIFICADA (core/product_analytics.py, cacheada por versão dos dados) --
+    analytics = product_analytics.get_analytics(user.id)
+    total_potes_vendidos = analytics.units_sold
+    total_cogs_vendas = analytics.cogs
+    total_variantes_vendidas = analytics.kits_sold
+    total_receita_real = analytics.receita  # Receita real (valor recebido após taxas/cupons)
+    vendidos_por_item = analytics.units_by_item
 
     sub_tab_vendas, sub_tab_estoque, sub_tab_calc = st.tabs([":material/analytics: Desempenho de Vendas", ":material/store: Estoque de Potes", ":material/calculate: Calculadora de Preços"])
 
@@ -145,31 +56,29 @@ def render(user, agents):
 
             st.divider()
 
-            for base_name, data in product_groups.items():
-                grp_margem = (data['lucro'] / data['receita'] * 100) if data['receita'] > 0 else 0.0
-                margem_color = "green" if grp_margem >= 20 else ("orange" if grp_margem >= 10 else "red")
+            for group in analytics.groups:
+                grp_margem = group.margem
 
-                if data['receita'] > 0:
-                    label = f":material/inventory_2: {base_name} **:green[Vendidos: {data['units']} un.]** &nbsp;|&nbsp; Receita: **R$ {data['receita']:,.2f}** &nbsp;|&nbsp; **:green[Margem: {grp_margem:.1f}%]**"
+                if group.receita > 0:
+                    label = f":material/inventory_2: {group.base_name} **:green[Vendidos: {group.units} un.]** &nbsp;|&nbsp; Receita: **R$ {group.receita:,.2f}** &nbsp;|&nbsp; **:green[Margem: {grp_margem:.1f}%]**"
                 else:
-                    label = f":material/inventory_2: {base_name} **:green[Vendidos: {data['units']} un.]** &nbsp;|&nbsp; :red[Custo: R$ {data['cogs']:,.2f}]**"
+                    label = f":material/inventory_2: {group.base_name} **:green[Vendidos: {group.units} un.]** &nbsp;|&nbsp; :red[Custo: R$ {group.cogs:,.2f}]**"
 
                 with st.expander(label):
-                    for v in data["variations"]:
-                        m = re.search(r'- (\d+)x$', v['title'])
+                    for v in group.variations:
+                        m = re.search(r'- (\d+)x$', v.title)
                         n = m.group(1) if m else "1"
                         txt = f"{n} Frasco" if n == "1" else f"{n} Frascos"
 
                         # Preços e Margens
-                        preco_tabela = v.get('preco_tabela', 0)
-                        unit_cogs = v.get('unit_cogs', 0)
-                        receita_v = v.get('receita', 0)
-                        pkgs_v = v.get('pkgs', 0)
+                        preco_tabela = v.preco_tabela
+                        receita_v = v.receita
+                        pkgs_v = v.pkgs
 
                         # Info de Venda Real
                         if pkgs_v > 0:
                             preco_medio_real = receita_v / pkgs_v
-                            margem_v = v.get('margem', 0)
+                            margem_v = v.margem
                             margem_color = '#4CAF50' if margem_v >= 20 else ('#FF9800' if margem_v >= 10 else '#F44336')
 
                             desconto_pct = ((preco_tabela - preco_medio_real) / preco_tabela * 100) if preco_tabela > 0 else 0
@@ -182,7 +91,7 @@ def render(user, agents):
                             )
                         else:
                             # Info Estimada (Potencial)
-                            p_margem = v.get('potential_margin', 0)
+                            p_margem = v.potential_margin
                             p_color = '#81C784' if p_margem >= 20 else ('#FFB74D' if p_margem >= 10 else '#E57373')
                             result_info = (
                                 f"<span style='color: #9E9E9E;'>Sem vendas</span> &nbsp;|&nbsp; "
@@ -192,11 +101,11 @@ def render(user, agents):
                         st.markdown(f"""
     <div style='display: flex; justify-content: space-between; border-bottom: 1px solid #ffffff1e; padding: 8px 0; flex-wrap: wrap; align-items: center;'>
     <div style='flex: 1; min-width: 150px;'>
-    <span style='font-size: 0.9em; color: #9E9E9E;'>{v['title']}</span><br>
+    <span style='font-size: 0.9em; color: #9E9E9E;'>{v.title}</span><br>
     <b>{txt}</b> &nbsp;|&nbsp; Tabela: <span style='color: #64B5F6;'>R$ {preco_tabela:,.2f}</span>
     </div>
     <div style='flex: 2; text-align: right; min-width: 250px;'>
-    <span style='font-size: 0.85em;'>Estoque: <b>{v['stock']} kits</b></span><br>
+    <span style='font-size: 0.85em;'>Estoque: <b>{v.stock} kits</b></span><br>
     {result_info}
     </div>
     </div>
@@ -246,27 +155,10 @@ def render(user, agents):
         if not isinstance(start_date, datetime):
             start_date = datetime.combine(start_date, datetime.min.time())
 
-        # Filtrar transações do período
-        period_transactions = [t for t in income_transactions 
-                               if t.date and start_date <= t.date < end_date]
-
-        # Calcular métricas do período
-        period_potes_vendidos = 0
-        period_cogs = 0.0
-
-        for txn in period_transactions:
-            if txn.product_id:
-                product = next((p for p in products if p.id == txn.product_id), None)
-                if product and hasattr(product, 'components') and product.components:
-                    for comp in product.components:
-                        inv_item = next((i for i in inventory_items if i.id == comp.inventory_item_id), None)
-                        if inv_item:
-                            potes = txn.quantity * (comp.quantity or 1)
-                            period_potes_vendidos += potes
-                            period_cogs += potes * (inv_item.supplier_price or 0.0)
-                elif product:
-                    period_potes_vendidos += txn.quantity
-                    period_cogs += txn.quantity * (product.supplier_price or 0.0)
+        # Métricas do período (um SUM agrupado, sem varrer as transações em Python)
+        period = product_analytics.get_period(user.id, start_date, end_date)
+        period_potes_vendidos = period.units_sold
+        period_cogs = period.cogs
 
         if inventory_items:
             display_start = start_date.date() if isinstance(start_date, datetime) else start_date
@@ -277,17 +169,7 @@ def render(user, agents):
             with c3: metric_card("Potes Vendidos (Total)", f"{total_potes_vendidos} un.")
             with c4: metric_card("COGS (Total)", f"R$ {total_cogs_vendas:,.2f}")
 
-            # Calcular potes vendidos por item no período
-            potes_por_item_periodo = {item.id: 0 for item in inventory_items}
-            for txn in period_transactions:
-                if txn.product_id:
-                    product = next((p for p in products if p.id == txn.product_id), None)
-                    if product and hasattr(product, 'components') and product.components:
-                        for comp in product.components:
-                            if comp.inventory_item_id in potes_por_item_periodo:
-                                potes_por_item_periodo[comp.inventory_item_id] += txn.quantity * (comp.quantity or 1)
-                    elif product:
-                        potes_por_item_periodo[product.id if product.id in potes_por_item_periodo else 0] += txn.quantity
+            potes_por_item_periodo = period.units_by_item
 
             df_inv = pd.DataFrame([{
                 "ID": item.id,
@@ -332,11 +214,11 @@ def render(user, agents):
             ni_cost = col_i2.number_input("Custo", min_value=0.0, key="ni_cost_inp")
             ni_min = col_i3.number_input("Mínimo", min_value=0, value=5, step=1, key="ni_min_inp")
             if st.button("Adicionar Item"):
-                from core.database.models import InventoryItem
-                with Session(engine) as session:
-                    session.add(InventoryItem(name=ni_name, supplier_price=ni_cost, stock=600, initial_stock=600, min_stock=ni_min, user_id=user.id))
-                    session.commit()
-                st.success("Adicionado!"); st.rerun()
+                add_res = product_agent.add_inventory_item(ni_name, ni_cost, ni_min, user.id)
+                if add_res["success"]:
+                    st.success("Adicionado!"); st.rerun()
+                else:
+                    st.error(f"Erro: {add_res['message']}")
 
     with sub_tab_calc:
         st.markdown('<div class="card-title"><span class="material-symbols-rounded">calculate</span> Simulador de Precificação e Lucro</div>', unsafe_allow_html=True)
@@ -475,9 +357,12 @@ def render(user, agents):
 
             if st.button("Gerar Anúncio", icon=":material/auto_awesome:", type="primary", key="btn_manual"):
                 if p_name and p_ben:
-                    with st.spinner("Analisando e criando copy..."):
-                        listing = product_agent.generate_listing(p_name, p_ben, p_ing)
-                        st.session_state.last_generated_res = listing
+                    # Copy aparece enquanto é gerada; depois é separada em título/descrição/keywords
+                    stream_area = st.empty()
+                    with stream_area.container():
+                        raw_listing = st.write_stream(product_agent.stream_listing(p_name, p_ben, p_ing))
+                    stream_area.empty()
+                    st.session_state.last_generated_res = product_agent.parse_listing(raw_listing)
                 else:
                     st.warning("Preencha o Nome e os Benefícios.")
 
@@ -23,9 +23,12 @@ def render(user, agents):
 
         if st.button("Gerar Resposta", icon=":material/edit:"):
             if msg:
-                with st.spinner("Escrevendo..."):
-                    reply = customer_agent.generate_response(msg, tone)
-                    st.session_state.generated_reply = reply
+                # Mostra os tokens conforme chegam; o texto final vai para o campo editável abaixo
+                stream_area = st.empty()
+                with stream_area.container():
+                    reply = st.write_stream(customer_agent.stream_response(msg, tone))
+                stream_area.empty()
+                st.session_state.generated_reply = reply
             else:
                 st.warning("Cole a mensagem do cliente primeiro.")
 
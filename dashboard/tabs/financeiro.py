@@ -6,7 +6,26 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from core.config import Config
-from core.database.engine import get_session
+
+
+def _render_health_advice(finance_agent, user_id, stats):
+    """Conselho do Guardião Financeiro, calculado em background.
+    Enquanto não fica pronto, só este fragmento é re-executado (polling leve).
+    run_every é fixado na definição do fragmento: quando o conselho chega, um
+    st.rerun() redefine o fragmento já sem polling."""
+    ready = finance_agent.get_health_advice(user_id, stats) is not None
+
+    @st.fragment(run_every=None if ready else "2s")
+    def _advice_card():
+        advice = finance_agent.get_health_advice(user_id, stats)
+        if advice is None:
+            st.caption(":material/hourglass_top: Guardião Financeiro analisando seus números...")
+        elif not ready:
+            st.rerun()  # Uma vez: a próxima execução define o fragmento com run_every=None
+        else:
+            st.info(advice, icon=":material/shield:")
+
+    _advice_card()
 
 
 def render(user, agents):
@@ -16,44 +35,20 @@ def render(user, agents):
     ads_agent = agents["ads_agent"]
     customer_agent = agents["customer_agent"]
 
-    # Carregar Estatísticas e Produtos
-    analysis = finance_agent.analyze_health(user.id)
-    stats = analysis["stats"]
-    all_transactions = [{"ID": t.id, "Data": t.date, "Desc": t.description, "Valor": t.amount, "Tipo": t.type, "Categoria": t.category} for t in stats["raw_data"]]
-    df_all = pd.DataFrame(all_transactions)
+    # Carregar Estatísticas (agregadas no SQL) e totais diários para os gráficos
+    # O conselho do LLM roda em background (ver _render_health_advice) — nunca bloqueia o render
+    stats = finance_agent.get_financial_stats(user.id)
+    daily_totals = finance_agent.get_daily_totals(user.id)
+    df_all = pd.DataFrame(daily_totals)
 
-    # Carregar produtos para os dropdowns e calcular COGS
+    # Carregar produtos para os dropdowns
     from agents.product_agent import ProductAgent
     if 'pa_fin' not in st.session_state: st.session_state.pa_fin = ProductAgent()
     products_list = st.session_state.pa_fin.get_all_products(user.id)
 
-    # Calcular COGS (Custo dos Produtos Vendidos) a partir das transações de venda
-    from core.database.models import Transaction, Product, InventoryItem, ProductComponent
-    from sqlmodel import select
+    # COGS (Custo dos Produtos Vendidos) — SUM indexado no ledger CogsEntry
     from dashboard.components.metric_card import metric_card
-    session_cogs = next(get_session())
-    income_txns = session_cogs.exec(
-        select(Transaction).where(
-            Transaction.user_id == user.id,
-            Transaction.type == "INCOME"
-        )
-    ).all()
-
-    total_cogs = 0.0
-    for txn in income_txns:
-        if txn.product_id and txn.quantity:
-            product = session_cogs.get(Product, txn.product_id)
-            if product:
-                if hasattr(product, 'components') and product.components:
-                    # Produto é um kit - calcular custo baseado nos componentes físicos
-                    for comp in product.components:
-                        inv_item = session_cogs.get(InventoryItem, comp.inventory_item_id)
-                        if inv_item:
-                            unidades = txn.quantity * (comp.quantity or 1)
-                            total_cogs += unidades * (inv_item.supplier_price or 0.0)
-                else:
-                    # Produto simples - usar supplier_price do próprio produto
-                    total_cogs += txn.quantity * (product.supplier_price or 0.0)
+    total_cogs = finance_agent.get_cogs(user.id)
 
     # Recalcular lucro real com COGS
     fat_bruto = stats['total_revenue']
@@ -73,9 +68,11 @@ def render(user, agents):
         with k3: metric_card("COGS", f"R$ {total_cogs:,.2f}")
         with k4: metric_card("Lucro Real", f"R$ {lucro_real:,.2f}",
                             delta=f"{margem_real:.1f}%")
+        _render_health_advice(finance_agent, user.id, stats)
         if not df_all.empty:
-            df_tmp = df_all.copy()
-            df_tmp['Date'] = pd.to_datetime(df_tmp['Data'])
+            # Uma linha por (dia, tipo, categoria) — não por transação
+            df_tmp = df_all.rename(columns={'type': 'Tipo', 'category': 'Categoria', 'total': 'Valor'})
+            df_tmp['Date'] = pd.to_datetime(df_tmp['day'])
             # ── Period type (lido do session_state, definido pelo radio dentro do card) ──
             period_type = st.session_state.get('finance_period_type', 'Anual')
             # ── Period grouping ──
@@ -260,23 +257,21 @@ def render(user, agents):
                     periodo_clicado = sel_points[0].get("x") if isinstance(sel_points[0], dict) else getattr(sel_points[0], "x", None)
                     detail = df_tmp[df_tmp['Período'] == periodo_clicado]
                     if not detail.empty:
+                        # Linhas brutas só do período clicado (carregadas sob demanda)
+                        period_start = detail['Date'].min().to_pydatetime()
+                        period_end = (detail['Date'].max() + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)).to_pydatetime()
+                        detail_txns = finance_agent.get_transactions(
+                            user.id, page_size=None, start_date=period_start, end_date=period_end
+                        )
+                        df_detail = pd.DataFrame(
+                            [{"ID": t.id, "Data": t.date, "Desc": t.description, "Valor": t.amount, "Tipo": t.type, "Categoria": t.category} for t in detail_txns],
+                            columns=["ID", "Data", "Desc", "Valor", "Tipo", "Categoria"]
+                        )
                         st.markdown("---")
                         st.markdown(f'<span style="color:#94A3B8;font-size:0.85rem;font-weight:500"><span class="material-symbols-rounded" style="font-size:1rem;vertical-align:middle">content_paste</span> Detalhamento: {periodo_clicado}</span>', unsafe_allow_html=True)
                         det_fat = detail[detail['Tipo'] == 'INCOME']['Valor'].sum()
                         det_sai = detail[detail['Tipo'] == 'EXPENSE']['Valor'].sum()
-                        det_income_ids = set(detail[detail['Tipo'] == 'INCOME']['ID'].tolist())
-                        det_cogs = 0.0
-                        for txn in income_txns:
-                            if txn.id in det_income_ids and txn.product_id and txn.quantity:
-                                product = session_cogs.get(Product, txn.product_id)
-                                if product:
-                                    if hasattr(product, 'components') and product.components:
-                                        for comp in product.components:
-                                            inv_item = session_cogs.get(InventoryItem, comp.inventory_item_id)
-                                            if inv_item:
-                                                det_cogs += txn.quantity * (comp.quantity or 1) * (inv_item.supplier_price or 0.0)
-                                    else:
-                                        det_cogs += txn.quantity * (product.supplier_price or 0.0)
+                        det_cogs = finance_agent.get_cogs(user.id, period_start, period_end)
                         det_lucro = det_fat - det_sai - det_cogs
                         det_margem = (det_lucro / det_fat * 100) if det_fat > 0 else 0
                         kd1, kd2, kd3, kd4 = st.columns(4)
@@ -288,8 +283,6 @@ def render(user, agents):
                         income_detail = detail[detail['Tipo'] == 'INCOME']
                         if not income_detail.empty:
                             with st.expander(":material/inventory_2: Produtos Vendidos", expanded=True):
-                                period_start = income_detail['Date'].min().to_pydatetime()
-                                period_end = income_detail['Date'].max().to_pydatetime()
                                 col_tv, col_tp = st.columns(2)
                                 with col_tv:
                                     st.markdown("**:material/emoji_events: Top Vendas**")
@@ -317,14 +310,23 @@ def render(user, agents):
                                         st.info("Nenhum produto no período.")
                         with st.expander(":material/description: Todas as Transações", expanded=False):
                             st.dataframe(
-                                detail[['Data', 'Desc', 'Valor', 'Tipo', 'Categoria']].sort_values('Data'),
+                                df_detail[['Data', 'Desc', 'Valor', 'Tipo', 'Categoria']].sort_values('Data'),
                                 hide_index=True, use_container_width=True
                             )
         else:
             st.info("Nenhuma transação financeira encontrada.")
         with st.expander(":material/edit_note: Gerenciar Histórico de Transações"):
-            all_transactions_with_id = [{"ID": t.id, "Data": t.date, "Desc": t.description, "Valor": t.amount, "Tipo": t.type, "Categoria": t.category} for t in stats["raw_data"]]
-            df_edit = pd.DataFrame(all_transactions_with_id).sort_values(by="Data", ascending=False)
+            # Editor paginado — carrega só uma página de linhas por vez
+            page_size = finance_agent.finance_service.PAGE_SIZE
+            n_pages = max((stats["transaction_count"] - 1) // page_size + 1, 1)
+            pg1, pg2 = st.columns([1, 4], vertical_alignment="center")
+            with pg1:
+                page = st.number_input("Página", min_value=1, max_value=n_pages, value=1, step=1, key="txn_editor_page") - 1
+            with pg2:
+                st.caption(f"{stats['transaction_count']} transações · página {page + 1} de {n_pages}")
+            page_txns = finance_agent.get_transactions(user.id, page=page, page_size=page_size)
+            all_transactions_with_id = [{"ID": t.id, "Data": t.date, "Desc": t.description, "Valor": t.amount, "Tipo": t.type, "Categoria": t.category} for t in page_txns]
+            df_edit = pd.DataFrame(all_transactions_with_id, columns=["ID", "Data", "Desc", "Valor", "Tipo", "Categoria"]).sort_values(by="Data", ascending=False)
             edited_df = st.data_editor(
                 df_edit,
                 column_config={
@@ -334,7 +336,7 @@ def render(user, agents):
                     "Tipo": st.column_config.SelectboxColumn("Tipo", options=["INCOME", "EXPENSE"]),
                     "Categoria": st.column_config.SelectboxColumn("Categoria", options=["Sale", "Ads", "Custo Produto", "Assinatura", "Outros"]),
                 },
-                hide_index=True, num_rows="dynamic", key="transaction_editor", use_container_width=True
+                hide_index=True, num_rows="dynamic", key=f"transaction_editor_{page}", use_container_width=True
             )
             if st.button("Salvar Alterações", type="primary"):
                 original_ids = set(df_edit["ID"])
@@ -361,9 +363,8 @@ def render(user, agents):
                 "lucro_real": lucro_real,
                 "margem_real": margem_real
             }
-            with st.spinner("Analisando padrões financeiros..."):
-                report = finance_agent.generate_deep_analysis(user.id, context_insights)
-                st.markdown(report)
+            # Relatório renderizado conforme os tokens chegam (sem esperar a resposta inteira)
+            st.write_stream(finance_agent.stream_deep_analysis(user.id, context_insights))
             with st.expander(":material/warning: Zona de Perigo"):
                 st.warning("Estas ações NÃO podem ser desfeitas.")
                 col_z1, col_z2 = st.columns(2)
@@ -431,18 +432,19 @@ def render(user, agents):
                 else: st.error(res["message"])
     with sub_tab_upload:
         st.markdown('<div class="card-title"><span class="material-symbols-rounded">folder_open</span> Importar Planilha de Vendas</div>', unsafe_allow_html=True)
-        st.markdown("Suba o arquivo XML/XLSX da Shopee ou um CSV próprio. Nossa IA irá processar os dados e vincular aos anúncios.")
+        st.markdown("Suba o arquivo XML/XLSX da Shopee ou um CSV próprio. Exportações da Shopee são lidas direto; outros formatos são interpretados pela IA.")
         uploaded_file = st.file_uploader("Arraste o arquivo aqui", type=["csv", "xlsx"], key="income_upload_new")
         if uploaded_file and "upload_preview" not in st.session_state:
-            if st.button("Processar com IA", type="primary"):
+            if st.button("Processar Planilha", type="primary"):
                 with st.spinner("Interpretando dados da planilha..."):
                     result = finance_agent.process_upload(uploaded_file, user.id)
                     if result["success"]:
                         st.session_state["upload_preview"] = result["data"]
+                        st.session_state["upload_message"] = result["message"]
                         st.rerun()
                     else: st.error(result["message"])
         if "upload_preview" in st.session_state:
-            st.info("Revise as transações identificadas pela IA antes de salvar.")
+            st.info(f"{st.session_state.get('upload_message', '')} Revise as transações antes de salvar.")
             df_preview = pd.DataFrame(st.session_state["upload_preview"])
             edited_preview = st.data_editor(df_preview, use_container_width=True, hide_index=True)
             cp1, cp2 = st.columns(2)
@@ -10,8 +10,8 @@ from dashboard.components.metric_card import metric_card
 
 def render(user, agents):
     """Render the tab with pending and completed tasks."""
+    # Só leitura: as tarefas são criadas/resolvidas por eventos (core/events.py)
     session = next(get_session())
-    TaskEngine.scan_and_generate(session, user.id)
     pending = TaskEngine.get_pending(session, user.id)
     completed = TaskEngine.get_completed(session, user.id)
 
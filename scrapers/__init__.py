@@ -6,18 +6,18 @@ from scrapers.web_scraper import WebScraper
 
 # Subclasses de WebScraper com marketplace fixo
 class MercadoLivreScraper(WebScraper):
-    def __init__(self):
-        super().__init__("mercadolivre")
+    def __init__(self, use_cache: bool = True):
+        super().__init__("mercadolivre", use_cache=use_cache)
 
 
 class MagaluScraper(WebScraper):
-    def __init__(self):
-        super().__init__("magalu")
+    def __init__(self, use_cache: bool = True):
+        super().__init__("magalu", use_cache=use_cache)
 
 
 class SheinScraper(WebScraper):
-    def __init__(self):
-        super().__init__("shein")
+    def __init__(self, use_cache: bool = True):
+        super().__init__("shein", use_cache=use_cache)
 
 
 # Marketplace que usam scrapers dedicados (HTTP/Tavily)
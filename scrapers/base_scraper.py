@@ -1,16 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional
 import httpx
-import random
-import time
+from core.cache import search_cache
+from scrapers.http_client import http_pool
 
 
 class BaseScraper(ABC):
     marketplace: str = "base"
 
-    def __init__(self):
-        self._request_count = 0
-        self._max_requests = 50
+    def __init__(self, use_cache: bool = True):
+        self.use_cache = use_cache  # False = sempre consulta a API (e atualiza o cache)
 
     @abstractmethod
     def search(self, keyword: str, limit: int = 20) -> List[Dict]:
@@ -20,31 +19,39 @@ class BaseScraper(ABC):
     def get_product_details(self, url: str) -> Optional[Dict]:
         pass
 
-    def _http_get(self, url: str, headers: Optional[Dict] = None, cookies: Optional[Dict] = None, timeout: int = 30) -> Optional[httpx.Response]:
-        self._rate_limit()
-        default_headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        }
+    _default_headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+        "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    }
+
+    def _merge_headers(self, headers: Optional[Dict]) -> Dict:
+        merged = dict(self._default_headers)
         if headers:
-            default_headers.update(headers)
-        try:
-            with httpx.Client(timeout=timeout, follow_redirects=True) as client:
-                resp = client.get(url, headers=default_headers, cookies=cookies)
-                self._request_count += 1
-                return resp
-        except Exception as e:
-            print(f"❌ Erro HTTP GET {url}: {e}")
-            return None
-
-    def _rate_limit(self):
-        delay = random.uniform(2.0, 5.0)
-        time.sleep(delay)
-        if self._request_count >= self._max_requests:
-            print(f"⚠️ [{self.marketplace}] Limite de requests atingido. Cooldown...")
-            time.sleep(random.uniform(30, 60))
-            self._request_count = 0
+            merged.update(headers)
+        return merged
+
+    def _http_get(self, url: str, headers: Optional[Dict] = None, cookies: Optional[Dict] = None,
+                  timeout: Optional[float] = None, params: Optional[Dict] = None) -> Optional[httpx.Response]:
+        """GET via the shared connection pool, throttled by the per-domain token bucket."""
+        return http_pool.get(url, headers=self._merge_headers(headers), cookies=cookies,
+                             params=params, timeout=timeout)
+
+    async def _ahttp_get(self, url: str, headers: Optional[Dict] = None, cookies: Optional[Dict] = None,
+                         timeout: Optional[float] = None, params: Optional[Dict] = None) -> Optional[httpx.Response]:
+        """Async variant of _http_get (same pool, same retries, same rate limit)."""
+        return await http_pool.aget(url, headers=self._merge_headers(headers), cookies=cookies,
+                                    params=params, timeout=timeout)
+
+    def _cached_search(self, provider: str, query: str, params: Dict, fetch: Callable[[], Any]) -> Any:
+        """
+        Runs a paid search call through the disk cache, keyed by
+        (provider, marketplace, normalized query, params).
+        fetch() must return JSON-serializable data; errors are not cached.
+        """
+        normalized = " ".join(query.lower().split())
+        key = search_cache.make_key(provider, self.marketplace, normalized, **params)
+        return search_cache.get_or_set(key, fetch, bypass=not self.use_cache)
 
     def _parse_price(self, price_str: str) -> float:
         if not price_str:
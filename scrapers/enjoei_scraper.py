@@ -1,4 +1,3 @@
-import httpx
 import json
 from typing import List, Dict, Optional
 from scrapers.base_scraper import BaseScraper
@@ -29,7 +28,7 @@ class EnjoeiScraper(BaseScraper):
             "Referer": f"{self.BASE_URL}/busca?q={keyword}",
         }
 
-        resp = self._http_get(url, headers=headers)
+        resp = self._http_get(url, headers=headers, params=params)
         if not resp or resp.status_code != 200:
             return []
 
@@ -49,7 +48,7 @@ class EnjoeiScraper(BaseScraper):
     def _search_html(self, keyword: str, limit: int = 20) -> List[Dict]:
         """Fallback: usa Tavily para busca no Enjoei."""
         from scrapers.web_scraper import WebScraper
-        ws = WebScraper("enjoei")
+        ws = WebScraper("enjoei", use_cache=self.use_cache)
         return ws.search(keyword, limit)
 
     def _parse_api_product(self, product: Dict) -> Optional[Dict]:
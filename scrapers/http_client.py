@@ -0,0 +1,155 @@
+"""
+HttpClientPool — Shared pooled HTTP clients for all scrapers.
+
+One long-lived httpx client per host (keep-alive, per-host connection limits,
+HTTP/2 when the `h2` package is installed) instead of a new client — and a new
+TCP+TLS handshake — per request. Exposes:
+1. aget() — async API: waits for the per-domain token bucket
+   (scrapers/rate_limiter.py), then retries transport errors and 429/5xx
+   with exponential backoff, honoring Retry-After when the server sends it
+2. get()  — sync facade over aget(), used by BaseScraper._http_get
+All clients live on the process-wide loop of core/async_runtime, so the
+per-host connection limits hold across every scraper thread.
+"""
+import asyncio
+import importlib.util
+import random
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+from core.config import Config
+from core.async_runtime import async_runtime
+from scrapers.rate_limiter import rate_limiter
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 30.0  # Nunca espera mais que isso por um Retry-After
+
+
+class HttpClientPool:
+    def __init__(self):
+        # host -> AsyncClient; só é tocado de dentro do loop de core/async_runtime
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    # ------------------------------------------------------------------
+    # Client factory
+    # ------------------------------------------------------------------
+    def _client_kwargs(self) -> dict:
+        return {
+            "limits": httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            "timeout": httpx.Timeout(Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT),
+            "follow_redirects": True,
+            "http2": HTTP2_AVAILABLE,
+        }
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def _client_for(self, url: str) -> httpx.AsyncClient:
+        host = self._host(url)
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**self._client_kwargs())
+            self._clients[host] = client
+        return client
+
+    # ------------------------------------------------------------------
+    # Retry policy
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _build_headers(headers: Optional[Dict], cookies: Optional[Dict]) -> Dict:
+        merged = dict(headers or {})
+        if cookies:
+            # Cookies por request no header: o cliente é compartilhado entre scrapers
+            merged["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+        return merged
+
+    @staticmethod
+    def _backoff(attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), MAX_RETRY_AFTER)
+        return Config.HTTP_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 0.5)
+
+    async def aget(
+        self,
+        url: str,
+        headers: Optional[Dict] = None,
+        cookies: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> Optional[httpx.Response]:
+        """Rate-limited async GET with retries. Returns the last response, or None on transport failure."""
+        return await async_runtime.on_loop(self._aget(url, headers, cookies, params, timeout, retries))
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[Dict] = None,
+        cookies: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> Optional[httpx.Response]:
+        """Sync facade over aget() (blocks the calling thread)."""
+        return async_runtime.run(self._aget(url, headers, cookies, params, timeout, retries))
+
+    async def _aget(
+        self,
+        url: str,
+        headers: Optional[Dict],
+        cookies: Optional[Dict],
+        params: Optional[Dict],
+        timeout: Optional[float],
+        retries: Optional[int],
+    ) -> Optional[httpx.Response]:
+        retries = Config.HTTP_MAX_RETRIES if retries is None else retries
+        client = self._client_for(url)
+        request_headers = self._build_headers(headers, cookies)
+
+        for attempt in range(retries + 1):
+            # Cada tentativa (inclusive retries) consome um token do domínio
+            await rate_limiter.aacquire(url)
+            try:
+                resp = await client.get(url, headers=request_headers, params=params,
+                                        timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    print(f"❌ Erro HTTP GET {url}: {e}")
+                    return None
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if resp.status_code in RETRY_STATUS and attempt < retries:
+                print(f"🔁 HTTP {resp.status_code} em {url} — tentativa {attempt + 2}/{retries + 1}")
+                await asyncio.sleep(self._backoff(attempt, resp))
+                continue
+            return resp
+        return None
+
+    # ------------------------------------------------------------------
+    # Shutdown
+    # ------------------------------------------------------------------
+    def close(self):
+        async_runtime.run(self.aclose())
+
+    async def aclose(self):
+        async def _close():
+            clients = list(self._clients.values())
+            self._clients.clear()
+            for client in clients:
+                await client.aclose()
+
+        await async_runtime.on_loop(_close())
+
+
+# Singleton — compartilhado por todos os scrapers
+http_pool = HttpClientPool()
@@ -0,0 +1,98 @@
+"""
+RateLimiter — Process-wide token buckets keyed by marketplace domain.
+
+Replaces the fixed 2–5s sleep before every request and the per-instance
+request counter (reset each time search_competitors built a new scraper).
+1. Each domain gets a bucket refilled at `rpm` requests/minute, up to `burst`
+2. Requests with a token available go out immediately
+3. Otherwise the caller RESERVES the next slot under a lock (the bucket goes
+   negative), so N concurrent callers get N staggered waits — never a stampede
+4. A random jitter is added only to throttled requests
+
+Limits come from Config (RATE_LIMIT_DEFAULT_RPM / _BURST / _JITTER and
+per-domain overrides in RATE_LIMITS="amazon.com.br=12/2,enjoei.com.br=30/5").
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+from core.config import Config
+
+
+class TokenBucket:
+    MIN_RPM = 0.1  # rpm <= 0 (ex.: RATE_LIMIT_DEFAULT_RPM=0) viraria divisão por zero em reserve()
+
+    def __init__(self, rpm: float, burst: int, jitter: float = 0.0):
+        self.rate = max(rpm, self.MIN_RPM) / 60.0  # tokens por segundo
+        self.capacity = float(max(burst, 1))
+        self.jitter = max(jitter, 0.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes one token (possibly borrowing from the future). Returns the wait in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            wait = -self._tokens / self.rate
+        return wait + random.uniform(0, self.jitter)
+
+
+class RateLimiter:
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def domain_of(url_or_domain: str) -> str:
+        """'https://www.amazon.com.br/s?k=x' -> 'amazon.com.br'."""
+        host = urlsplit(url_or_domain).netloc if "://" in url_or_domain else url_or_domain
+        host = host.lower().split(":")[0]
+        return host[4:] if host.startswith("www.") else host
+
+    @staticmethod
+    def _limits_for(domain: str) -> Tuple[float, int]:
+        overrides = Config.rate_limits()
+        for key, limits in overrides.items():
+            if domain == key or domain.endswith("." + key):
+                return limits
+        return Config.RATE_LIMIT_DEFAULT_RPM, Config.RATE_LIMIT_DEFAULT_BURST
+
+    def bucket(self, url_or_domain: str) -> TokenBucket:
+        domain = self.domain_of(url_or_domain)
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                rpm, burst = self._limits_for(domain)
+                bucket = TokenBucket(rpm, burst, Config.RATE_LIMIT_JITTER)
+                self._buckets[domain] = bucket
+            return bucket
+
+    def acquire(self, url_or_domain: str) -> float:
+        """Blocks until the domain allows one more request. Returns the time waited."""
+        wait = self.bucket(url_or_domain).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, url_or_domain: str) -> float:
+        wait = self.bucket(url_or_domain).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def reset(self):
+        """Drops all buckets (e.g. after changing the limits in Config)."""
+        with self._lock:
+            self._buckets.clear()
+
+
+# Singleton — compartilhado por todos os scrapers do processo
+rate_limiter = RateLimiter()
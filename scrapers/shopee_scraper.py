@@ -38,6 +38,29 @@ def _get_firecrawl():
     return FirecrawlApp(api_key=k) if k else None
 
 
+def _firecrawl_search(app, query: str, params: Dict) -> List[Dict]:
+    """Firecrawl Search -> lista de dicts (objetos do SDK não vão para o cache)."""
+    fc_result = app.search(query=query, **params)
+    return [
+        {
+            "url": getattr(item, 'url', '') or '',
+            "title": getattr(item, 'title', '') or '',
+            "description": getattr(item, 'description', '') or '',
+        }
+        for item in getattr(fc_result, 'web', None) or []
+    ]
+
+
+def _scrape_content(app, url: str) -> str:
+    """Firecrawl scrape -> markdown/conteúdo como string."""
+    result = app.scrape_url(url, formats=["markdown"])
+    if hasattr(result, 'markdown') and result.markdown:
+        return result.markdown
+    if hasattr(result, 'content') and result.content:
+        return result.content
+    return ""
+
+
 def _extract_price(text: str) -> Optional[float]:
     """Extrai o primeiro preço em reais de um texto."""
     if not text:
@@ -140,11 +163,11 @@ class ShopeeScraper(BaseScraper):
         client = _get_tavily()
         if client:
             try:
-                resp = client.search(
-                    query=f'site:shopee.com.br "{keyword}"',
-                    search_depth="advanced",
-                    max_results=min(limit + 5, 15),
-                    include_raw_content=True,
+                query = f'site:shopee.com.br "{keyword}"'
+                params = {"search_depth": "advanced", "max_results": min(limit + 5, 15), "include_raw_content": True}
+                resp = self._cached_search(
+                    "tavily", query, params,
+                    lambda: client.search(query=query, **params),
                 )
                 for item in resp.get("results") or []:
                     url = item.get("url", "")
@@ -166,19 +189,19 @@ class ShopeeScraper(BaseScraper):
             app = _get_firecrawl()
             if app:
                 try:
-                    fc_result = app.search(
-                        query=f"vitamina {keyword} shopee",
-                        include_domains=["shopee.com.br"],
-                        limit=min(limit, 5),
-                    )
-                    web_items = getattr(fc_result, 'web', [])
+                    fc_query = f"vitamina {keyword} shopee"
+                    fc_params = {"include_domains": ["shopee.com.br"], "limit": min(limit, 5)}
+                    web_items = self._cached_search(
+                        "firecrawl", fc_query, fc_params,
+                        lambda: _firecrawl_search(app, fc_query, fc_params),
+                    ) or []
                     for item in web_items:
-                        url = getattr(item, 'url', getattr(item, 'url', ''))
+                        url = item.get('url', '')
                         if url in seen_urls:
                             continue
                         seen_urls.add(url)
-                        title = getattr(item, 'title', '')
-                        desc = getattr(item, 'description', '') or ''
+                        title = item.get('title', '')
+                        desc = item.get('description', '') or ''
                         parsed = _parse_to_schema(title=title, url=url, content=desc)
                         if parsed and parsed["competitor_price"] > 0:
                             results.append(parsed)
@@ -193,12 +216,10 @@ class ShopeeScraper(BaseScraper):
         app = _get_firecrawl()
         if app:
             try:
-                result = app.scrape_url(url, formats=["markdown"])
-                content = ""
-                if hasattr(result, 'markdown') and result.markdown:
-                    content = result.markdown
-                elif hasattr(result, 'content') and result.content:
-                    content = result.content
+                content = self._cached_search(
+                    "firecrawl_scrape", url, {"formats": ["markdown"]},
+                    lambda: _scrape_content(app, url),
+                ) or ""
 
                 if content and "Página indisponível" in content:
                     print("⚠️ Shopee bloqueou Firecrawl scrape (login necessário)")
@@ -26,6 +26,12 @@ def _get_firecrawl():
     return FirecrawlApp(api_key=k) if k else None
 
 
+def _scrape_markdown(app, url: str) -> str:
+    """Firecrawl scrape -> markdown (string, para caber no cache em disco)."""
+    result = app.scrape_url(url, formats=["markdown"])
+    return result.markdown if hasattr(result, 'markdown') and result.markdown else ""
+
+
 def _extract_price(text: str) -> Optional[float]:
     if not text:
         return None
@@ -64,11 +70,11 @@ class WebScraper(BaseScraper):
     marketplace deve ser uma das chaves de MARKETPLACE_DOMAINS.
     """
 
-    def __init__(self, marketplace: str):
+    def __init__(self, marketplace: str, use_cache: bool = True):
         self.marketplace = marketplace
         self.domain = MARKETPLACE_DOMAINS.get(marketplace, marketplace)
         self.label = MARKETPLACE_LABELS.get(marketplace, marketplace)
-        super().__init__()
+        super().__init__(use_cache=use_cache)
 
     def search(self, keyword: str, limit: int = 20) -> List[Dict]:
         client = _get_tavily()
@@ -77,12 +83,11 @@ class WebScraper(BaseScraper):
             return []
 
         search_query = f"site:{self.domain} \"{keyword}\""
+        params = {"search_depth": "advanced", "max_results": min(limit, 10), "include_raw_content": True}
         try:
-            resp = client.search(
-                query=search_query,
-                search_depth="advanced",
-                max_results=min(limit, 10),
-                include_raw_content=True,
+            resp = self._cached_search(
+                "tavily", search_query, params,
+                lambda: client.search(query=search_query, **params),
             )
         except Exception as e:
             print(f"❌ Tavily/{self.label} error: {e}")
@@ -97,10 +102,11 @@ class WebScraper(BaseScraper):
         # Fallback: busca sem site:
         if len(results) < 3:
             try:
-                resp2 = client.search(
-                    query=f"\"{keyword}\" {self.label}",
-                    search_depth="basic",
-                    max_results=min(limit, 5),
+                fallback_query = f"\"{keyword}\" {self.label}"
+                fallback_params = {"search_depth": "basic", "max_results": min(limit, 5)}
+                resp2 = self._cached_search(
+                    "tavily", fallback_query, fallback_params,
+                    lambda: client.search(query=fallback_query, **fallback_params),
                 )
                 for item in resp2.get("results", []):
                     parsed = self._parse_result(item)
@@ -160,8 +166,10 @@ class WebScraper(BaseScraper):
         if not app:
             return None
         try:
-            result = app.scrape_url(url, formats=["markdown"])
-            content = result.markdown if hasattr(result, 'markdown') and result.markdown else ""
+            content = self._cached_search(
+                "firecrawl_scrape", url, {"formats": ["markdown"]},
+                lambda: _scrape_markdown(app, url),
+            ) or ""
             title = ""
             m = re.search(r'^#\s*(.+)$', content, re.MULTILINE)
             if m:
@@ -0,0 +1,14 @@
+"""Fixtures compartilhadas: SQLite em memória com todas as tabelas do app."""
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine
+from core.database import models
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
@@ -0,0 +1,47 @@
+"""Parser de exportações de vendas (core/sales_parser.py)."""
+import pandas as pd
+from core.sales_parser import SalesExportParser
+
+parser = SalesExportParser()
+
+
+def test_money_formats():
+    parsed = parser._parse_money(pd.Series(["R$ 1.234,56", "1.234", "59,90", "1234.56", "12.5", "-1.000", "abc"]))
+    assert parsed.iloc[:6].tolist() == [1234.56, 1234.0, 59.9, 1234.56, 12.5, -1000.0]
+    assert pd.isna(parsed.iloc[6])
+
+
+def test_numeric_money_column_passes_through():
+    assert parser._parse_money(pd.Series([10, 2.5])).tolist() == [10.0, 2.5]
+
+
+def test_layout_without_status_is_not_recognized():
+    df = pd.DataFrame({"Data": ["01/03/2025"], "Produto": ["X"], "Valor": ["10,00"]})
+    assert parser.detect_columns(df) is None
+    assert parser.parse(df) is None
+
+
+def test_parse_keeps_only_completed_rows():
+    df = pd.DataFrame({
+        "Status do pedido": ["Concluído", "Cancelado", "Concluído", "Concluído"],
+        "Data de criação do pedido": ["2025-03-01 10:00", "2025-03-02 11:00", "05/03/2025", ""],
+        "Nome do Produto": ["Melatonina - 3x", "Melatonina - 1x", "Creatina", "Sem data"],
+        "Quantidade": ["2", "1", "", "1"],
+        "Subtotal do produto": ["1.234,50", "30,00", "1.234", "10,00"],
+    })
+    assert parser.parse(df) == [
+        {"date": "2025-03-01", "product": "Melatonina - 3x", "amount": 1234.5, "quantity": 2, "status": "Concluído"},
+        {"date": "2025-03-05", "product": "Creatina", "amount": 1234.0, "quantity": 1, "status": "Concluído"},
+    ]
+
+
+def test_unit_price_times_quantity_when_no_line_total():
+    df = pd.DataFrame({
+        "Order Status": ["Completed"],
+        "Order Date": ["2025-03-01"],
+        "Product Name": ["Melatonina"],
+        "Quantity": [3],
+        "Deal Price": ["19,90"],
+    })
+    [row] = parser.parse(df)
+    assert (row["amount"], row["quantity"]) == (59.7, 3)
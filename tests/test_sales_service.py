@@ -0,0 +1,152 @@
+"""Deduplicação de vendas e ledger de COGS (core/sales_service.py)."""
+from datetime import datetime
+from core.database.models import Product, ProductComponent, InventoryItem, Transaction
+from core.sales_service import SalesService
+
+service = SalesService()
+
+
+def _txn(description: str, amount: float, date: datetime, type: str = "INCOME", user_id: int = 1, **kwargs):
+    return Transaction(date=date, type=type, category="Sale", description=description,
+                       amount=amount, user_id=user_id, **kwargs)
+
+
+def _kit(session, unit_cost: float = 10.0):
+    """Anúncio "Melatonina - 3x" = 3 potes físicos."""
+    pote = InventoryItem(name="Pote Melatonina", supplier_price=unit_cost, stock=100, user_id=1)
+    product = Product(title="Melatonina - 3x", description="", price=90.0, stock=50, user_id=1)
+    session.add_all([pote, product])
+    session.commit()
+    session.add(ProductComponent(product_id=product.id, inventory_item_id=pote.id, quantity=3))
+    session.commit()
+    return product, pote
+
+
+def _sale(product: Product, quantity: int = 2) -> Transaction:
+    return _txn(product.title, 180.0, datetime(2025, 3, 1, 14), product_id=product.id, quantity=quantity)
+
+
+# ----------------------------------------------------------------------
+# Dedup
+# ----------------------------------------------------------------------
+def test_dedup_key_ignores_time_of_day_and_float_noise():
+    key = service._dedup_key(datetime(2025, 3, 1, 9, 30), "Melatonina - 3x", 59.9)
+    assert key == service._dedup_key(datetime(2025, 3, 1, 18), "Melatonina - 3x", 59.900000001)
+    assert key != service._dedup_key(datetime(2025, 3, 2, 9, 30), "Melatonina - 3x", 59.9)
+    assert key != service._dedup_key(datetime(2025, 3, 1, 9, 30), "Melatonina - 3x", 59.91)
+    assert key != service._dedup_key(datetime(2025, 3, 1, 9, 30), "Melatonina - 1x", 59.9)
+
+
+def test_dedup_key_without_date_or_amount():
+    assert service._dedup_key(None, "X", None) == (None, "X", 0.0)
+
+
+def test_load_duplicate_keys_covers_only_the_batch_days(session):
+    session.add_all([
+        _txn("A", 10.0, datetime(2025, 3, 1, 10)),
+        _txn("B", 20.0, datetime(2025, 3, 3, 23, 59)),           # último dia inteiro entra
+        _txn("C", 30.0, datetime(2025, 3, 4, 0, 0)),             # fora do intervalo
+        _txn("D", 40.0, datetime(2025, 3, 2), type="EXPENSE"),   # só INCOME
+        _txn("E", 50.0, datetime(2025, 3, 2), user_id=2),        # outro usuário
+    ])
+    session.commit()
+
+    keys = service.load_duplicate_keys([datetime(2025, 3, 3, 8), datetime(2025, 3, 1, 12)], 1, session)
+    assert keys == {
+        service._dedup_key(datetime(2025, 3, 1), "A", 10.0),
+        service._dedup_key(datetime(2025, 3, 3), "B", 20.0),
+    }
+    assert service.load_duplicate_keys([], 1, session) == set()
+
+
+def test_check_duplicate_accepts_upload_strings(session):
+    session.add(_txn("A", 10.0, datetime(2025, 3, 1, 14, 30)))
+    session.commit()
+
+    assert service.check_duplicate("2025-03-01", "A", 10.0, 1, session)
+    assert not service.check_duplicate("2025-03-01", "A", 10.5, 1, session)
+    assert not service.check_duplicate("2025-03-02", "A", 10.0, 1, session)
+
+
+# ----------------------------------------------------------------------
+# COGS ledger
+# ----------------------------------------------------------------------
+def test_process_sale_snapshots_unit_cost(session):
+    product, pote = _kit(session)
+    txn = _sale(product, quantity=2)
+    session.add(txn)
+    result = service.process_sale(product, 2, session, txn=txn)
+    session.commit()
+
+    assert result["cogs"] == 60.0
+    assert pote.stock == 94
+    [entry] = txn.cogs_entries
+    assert (entry.inventory_item_id, entry.units, entry.unit_cost, entry.total_cost) == (pote.id, 6, 10.0, 60.0)
+
+    # Preço novo do fornecedor não reescreve vendas passadas
+    pote.supplier_price = 12.0
+    session.add(pote)
+    session.commit()
+    session.refresh(entry)
+    assert entry.total_cost == 60.0
+
+
+def test_ledger_follows_date_edits(session):
+    product, _ = _kit(session)
+    txn = _sale(product)
+    session.add(txn)
+    service.process_sale(product, 2, session, txn=txn)
+    session.commit()
+
+    txn.date = datetime(2025, 4, 10)
+    service.sync_cogs_entries(txn, session)
+    session.commit()
+    session.refresh(txn)
+    assert [e.date for e in txn.cogs_entries] == [datetime(2025, 4, 10)]
+
+
+def test_ledger_rebuilt_after_income_expense_round_trip(session):
+    product, _ = _kit(session)
+    txn = _sale(product, quantity=2)
+    session.add(txn)
+    service.process_sale(product, 2, session, txn=txn)
+    session.commit()
+
+    txn.type = "EXPENSE"
+    service.sync_cogs_entries(txn, session)
+    session.commit()
+    session.refresh(txn)
+    assert txn.cogs_entries == []
+
+    txn.type = "INCOME"
+    service.sync_cogs_entries(txn, session)
+    session.commit()
+    session.refresh(txn)
+    assert [(e.units, e.total_cost, e.date) for e in txn.cogs_entries] == [(6, 60.0, txn.date)]
+
+
+def test_backfill_uses_current_prices_and_skips_ledgered_sales(session):
+    product, pote = _kit(session)
+    simple = Product(title="Creatina", description="", price=50.0, supplier_price=20.0, user_id=1)
+    session.add(simple)
+    session.commit()
+
+    ledgered = _sale(product, quantity=1)
+    session.add(ledgered)
+    service.process_sale(product, 1, session, txn=ledgered)
+    legacy_kit = _sale(product, quantity=2)
+    legacy_simple = _txn("Creatina", 100.0, datetime(2025, 3, 2), product_id=simple.id, quantity=2)
+    session.add_all([legacy_kit, legacy_simple])
+    session.commit()
+
+    pote.supplier_price = 11.0
+    session.add(pote)
+    session.commit()
+
+    assert service.backfill_cogs(session) == 2
+    assert service.backfill_cogs(session) == 0
+    for txn in (ledgered, legacy_kit, legacy_simple):
+        session.refresh(txn)
+    assert sum(e.total_cost for e in ledgered.cogs_entries) == 30.0       # snapshot original
+    assert sum(e.total_cost for e in legacy_kit.cogs_entries) == 66.0     # 2 kits x 3 potes x 11
+    assert [(e.inventory_item_id, e.units, e.total_cost) for e in legacy_simple.cogs_entries] == [(None, 2, 40.0)]
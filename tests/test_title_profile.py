@@ -0,0 +1,43 @@
+"""Pré-filtro local do matching de concorrentes (core/competitor_service.py)."""
+from core.competitor_service import competitor_service, title_profile
+
+
+def _mismatch(ours: str, theirs: str):
+    return competitor_service._prefilter_mismatch(title_profile(ours), theirs)
+
+
+def test_thousands_dot_is_not_a_decimal_point():
+    assert title_profile("Vitamina C 1.000mg")[1] == {"mg": {1000.0}}
+    assert title_profile("Vitamina D3 2.000 UI")[1] == {"ui": {2000.0}}
+    assert title_profile("Omega 3 1.000.000 UI")[1] == {"ui": {1000000.0}}
+
+
+def test_comma_is_the_decimal_point():
+    assert title_profile("Creatina 0,3kg")[1] == {"g": {300.0}}
+    assert title_profile("Colágeno 1,5 kg")[1] == {"g": {1500.0}}
+
+
+def test_ambiguous_dot_decimal_is_ignored():
+    # "1.5l" não é milhar nem decimal BR: sem medida, nada é descartado por ela
+    assert title_profile("Suco 1.5l")[1] == {}
+
+
+def test_pack_size():
+    assert title_profile("Kit 3 Melatonina 60 caps")[2] == 3
+    assert title_profile("Melatonina 60 caps 2x")[2] == 2
+    assert title_profile("Melatonina 60 caps")[2] is None
+
+
+def test_thousands_dot_matches_plain_number():
+    assert _mismatch("Vitamina C 1.000mg", "Vitamina C 1000mg 60 caps") is None
+    assert _mismatch("Vitamina D3 2000 UI", "Vitamina D3 2.000 UI") is None
+
+
+def test_pack_total_matches_either_way():
+    assert _mismatch("Kit 2 Melatonina 60 caps", "Melatonina 120 caps") is None
+    assert _mismatch("Melatonina 120 caps", "Kit 2 Melatonina 60 caps") is None
+
+
+def test_clear_mismatch_is_discarded():
+    assert _mismatch("Vitamina C 500mg", "Vitamina C 1.000mg") == "mg diferente"
+    assert _mismatch("Melatonina 60 caps", "Melatonina 90 caps") == "caps diferente"